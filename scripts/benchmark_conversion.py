@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Benchmark the conversion engine on synthetic compositions of growing size.
+
+For every size a composition is generated with generate_composition.py and
+these phases are measured: parsing, scan_unknown_position_effects,
+adjust_composition (parse, convert and write) and update_file_paths on an
+already parsed document. Each phase reports its best wall time over
+--repeat runs and its peak traced memory (from a separate tracemalloc run,
+so tracing does not inflate the timings). The results are printed as JSON.
+
+Usage: python scripts/benchmark_conversion.py [--sizes small,medium,large]
+       [--repeat N] [--effects N] [--no-memory] [--output FILE.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "src"))
+sys.path.insert(0, os.path.join(ROOT_DIR, "scripts"))
+
+from conversion_engine import (  # noqa: E402
+    adjust_composition, clear_composition_cache, scan_unknown_position_effects,
+    update_file_paths,
+)
+from generate_composition import (  # noqa: E402
+    DEFAULT_MEDIA_ROOT, PRESETS, create_media_files, generate_composition,
+)
+from xml_backend import parse_xml, resolve_backend  # noqa: E402
+
+
+def _phases(composition: str, output_file: str, media_dir: str, xml_backend: str | None) -> dict:
+    """The measured phases, as callables that do one run each."""
+    parsed = {}
+
+    def setup_parsed():
+        parsed["root"] = parse_xml(composition, xml_backend).getroot()
+
+    return {
+        "parse": (None, lambda: parse_xml(composition, xml_backend)),
+        "scan_unknown_position_effects": (
+            None, lambda: scan_unknown_position_effects(composition, {}, xml_backend)),
+        "adjust_composition": (
+            None, lambda: adjust_composition(
+                composition, output_file, DEFAULT_MEDIA_ROOT, media_dir,
+                xml_backend=xml_backend)),
+        # Paths are rewritten in place, so every run gets a freshly parsed root
+        "update_file_paths": (
+            setup_parsed, lambda: update_file_paths(parsed["root"], DEFAULT_MEDIA_ROOT, media_dir)),
+    }
+
+
+def _measure(setup, run, repeat: int, memory: bool) -> dict:
+    best = None
+    for _ in range(max(1, repeat)):
+        if setup:
+            setup()
+        clear_composition_cache()
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    result = {"seconds": round(best, 4)}
+
+    if memory:
+        if setup:
+            setup()
+        clear_composition_cache()
+        tracemalloc.start()
+        try:
+            run()
+            result["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def benchmark_size(name: str, sizes: dict, temp_dir: str, repeat: int, effects: int,
+                   memory: bool, xml_backend: str | None) -> dict:
+    composition = os.path.join(temp_dir, f"{name}.avc")
+    output_file = os.path.join(temp_dir, f"{name}_converted.avc")
+    media_dir = os.path.join(temp_dir, "media")
+    info = generate_composition(composition, effects=effects, **sizes)
+    create_media_files(media_dir, info["options"].get("media_files", 100))
+
+    result = {
+        "size": name,
+        "bytes": info["bytes"],
+        "elements": info["elements"],
+        "clips": info["clips"],
+        "phases": {},
+    }
+    for phase, (setup, run) in _phases(composition, output_file, media_dir, xml_backend).items():
+        # The engine reports its progress on stdout; keep the JSON clean
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            result["phases"][phase] = _measure(setup, run, repeat, memory)
+        print(f"{name:<8} {phase:<31} {result['phases'][phase]}", file=sys.stderr)
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="small,medium,large",
+                        help=f"Comma-separated sizes out of {', '.join(PRESETS)}")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per phase; the best is kept")
+    parser.add_argument("--effects", type=int, default=1, help="Extra effects per clip")
+    parser.add_argument("--xml-backend", choices=("lxml", "etree"), help="XML backend (default: automatic)")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc runs")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.sizes.split(",") if name.strip()]
+    unknown = [name for name in names if name not in PRESETS]
+    if unknown:
+        parser.error(f"unknown size(s): {', '.join(unknown)}")
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        backend = resolve_backend(args.xml_backend)
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "xml_backend": backend,
+        "repeat": args.repeat,
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name in names:
+            report["results"].append(benchmark_size(
+                name, PRESETS[name], temp_dir, args.repeat, args.effects,
+                not args.no_memory, backend))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Benchmark the media folder crawler on slow (network) storage.
+
+A synthetic media tree (--depth levels of --fanout subfolders, --files
+files per folder) is created in a temporary folder. Every filesystem call
+the crawler makes (os.stat, os.scandir and DirEntry.stat) is then delayed
+by --latency milliseconds, which is what listing a share over SMB or NFS
+costs, and the tree is crawled with each number of --workers: once in full
+and once incrementally (nothing changed, so every folder is only stat'ed).
+All runs must find the same folders and files.
+
+Usage: python scripts/benchmark_media_crawler.py [--depth N] [--fanout N]
+       [--files N] [--latency MS] [--workers 1,4,16] [--repeat N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "src"))
+
+import media_crawler  # noqa: E402
+
+
+def create_tree(root: str, depth: int, fanout: int, files: int) -> int:
+    """Create the synthetic tree; returns the number of folders including root."""
+    folders = [root]
+    level = [root]
+    for _ in range(depth):
+        next_level = []
+        for parent in level:
+            for index in range(fanout):
+                path = os.path.join(parent, f"folder{index:02d}")
+                os.mkdir(path)
+                next_level.append(path)
+        folders.extend(next_level)
+        level = next_level
+    for folder in folders:
+        for index in range(files):
+            with open(os.path.join(folder, f"clip{index:03d}.mov"), "wb") as f:
+                f.write(b"\0" * index)
+    return len(folders)
+
+
+class _SlowEntry:
+    """A DirEntry whose stat() waits like a call to the file server."""
+
+    def __init__(self, entry, latency: float):
+        self._entry = entry
+        self._latency = latency
+        self._stat = None
+        self.name = entry.name
+        self.path = entry.path
+
+    def is_dir(self, follow_symlinks: bool = True) -> bool:
+        return self._entry.is_dir(follow_symlinks=follow_symlinks)
+
+    def is_file(self, follow_symlinks: bool = True) -> bool:
+        return self._entry.is_file(follow_symlinks=follow_symlinks)
+
+    def stat(self, follow_symlinks: bool = True):
+        if self._stat is None:
+            time.sleep(self._latency)
+            self._stat = self._entry.stat(follow_symlinks=follow_symlinks)
+        return self._stat
+
+
+@contextlib.contextmanager
+def injected_latency(latency: float):
+    """Delay os.stat, os.scandir and DirEntry.stat by latency seconds."""
+    real_stat, real_scandir = os.stat, os.scandir
+
+    def slow_stat(path, *args, **kwargs):
+        time.sleep(latency)
+        return real_stat(path, *args, **kwargs)
+
+    @contextlib.contextmanager
+    def slow_scandir(path):
+        time.sleep(latency)
+        with real_scandir(path) as entries:
+            yield (_SlowEntry(entry, latency) for entry in entries)
+
+    os.stat, os.scandir = slow_stat, slow_scandir
+    try:
+        yield
+    finally:
+        os.stat, os.scandir = real_stat, real_scandir
+
+
+def _crawl(root: str, workers: int, known: dict | None) -> tuple[float, dict]:
+    start = time.perf_counter()
+    listing = {}
+    for directory in media_crawler.crawl(root, known, workers):
+        listing[directory.relpath] = directory
+    return time.perf_counter() - start, listing
+
+
+def _known_state(listing: dict) -> dict:
+    """The known argument of crawl() for a tree crawled into listing."""
+    return {relpath: (directory.mtime_ns, [child for child, _mtime in directory.subdirectories])
+            for relpath, directory in listing.items()}
+
+
+def _contents(listing: dict) -> set:
+    return {(relpath, name) for relpath, directory in listing.items() for name, _size, _mtime in directory.files}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--depth", type=int, default=4, help="Levels of subfolders (default: 4)")
+    parser.add_argument("--fanout", type=int, default=4, help="Subfolders per folder (default: 4)")
+    parser.add_argument("--files", type=int, default=10, help="Files per folder (default: 10)")
+    parser.add_argument("--latency", type=float, default=2.0,
+                        help="Milliseconds added to every filesystem call (default: 2)")
+    parser.add_argument("--workers", default=f"1,4,{media_crawler.DEFAULT_WORKERS}",
+                        help="Comma-separated worker counts to compare (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per worker count; the best is kept")
+    args = parser.parse_args()
+
+    worker_counts = [int(value) for value in args.workers.split(",")]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        root = os.path.join(temp_dir, "media")
+        os.mkdir(root)
+        folders = create_tree(root, args.depth, args.fanout, args.files)
+        _elapsed, reference = _crawl(root, 1, None)
+        expected = _contents(reference)
+        known = _known_state(reference)
+        print(f"{folders} folders, {len(expected)} files, {args.latency:g} ms per filesystem call")
+
+        header = f"{'Workers':>7} {'Full s':>8} {'Speedup':>8} {'Incremental s':>14} {'Speedup':>8}"
+        print(header)
+        print("-" * len(header))
+        baseline = None
+        mismatches = 0
+        with injected_latency(args.latency / 1000):
+            for workers in worker_counts:
+                full = incremental = None
+                for _ in range(max(1, args.repeat)):
+                    elapsed, listing = _crawl(root, workers, None)
+                    full = elapsed if full is None else min(full, elapsed)
+                    if _contents(listing) != expected or len(listing) != folders:
+                        mismatches += 1
+                    elapsed, listing = _crawl(root, workers, known)
+                    incremental = elapsed if incremental is None else min(incremental, elapsed)
+                    if len(listing) != folders or any(directory.listed for directory in listing.values()):
+                        mismatches += 1
+                if baseline is None:
+                    baseline = (full, incremental)
+                print(f"{workers:>7} {full:>8.3f} {baseline[0] / full:>7.1f}x "
+                      f"{incremental:>14.3f} {baseline[1] / incremental:>7.1f}x")
+
+    if mismatches:
+        print(f"{mismatches} crawl(s) did not find the whole tree", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Compare the XML backends (lxml and ElementTree) on composition files.
+
+For every file and every installed backend this reports the time spent
+parsing, converting and writing, and checks that all backends write
+byte-identical output.
+
+Usage: python scripts/benchmark_xml_backends.py [FILE.avc ...] [--repeat N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import filecmp
+import glob
+import os
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "src"))
+
+from conversion_engine import CompositionConverter  # noqa: E402
+from xml_backend import available_backends, parse_xml, write_xml  # noqa: E402
+
+
+def _time_backend(path: str, backend: str, output_file: str) -> tuple[float, float, float]:
+    start = time.perf_counter()
+    tree = parse_xml(path, backend)
+    parsed = time.perf_counter()
+    CompositionConverter().convert(tree.getroot())
+    converted = time.perf_counter()
+    write_xml(tree, output_file)
+    written = time.perf_counter()
+    return parsed - start, converted - parsed, written - converted
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("files", nargs="*", help="Compositions to benchmark (default: test-data/*.avc)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per file and backend; the best is kept")
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob(os.path.join(ROOT_DIR, "test-data", "*.avc")))
+    backends = available_backends()
+    if len(backends) == 1:
+        print("lxml is not installed; only ElementTree is benchmarked.")
+
+    header = f"{'File':<40} {'Backend':<8} {'MB':>7} {'Parse s':>8} {'Convert s':>10} {'Write s':>8} {'Total s':>8}"
+    print(header)
+    print("-" * len(header))
+
+    mismatches = 0
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for path in files:
+            size_mb = os.path.getsize(path) / (1024 * 1024)
+            outputs = {}
+            for backend in backends:
+                output_file = os.path.join(temp_dir, f"{backend}.avc")
+                best = None
+                for _ in range(max(1, args.repeat)):
+                    timings = _time_backend(path, backend, output_file)
+                    if best is None or sum(timings) < sum(best):
+                        best = timings
+                outputs[backend] = output_file
+                parse_s, convert_s, write_s = best
+                print(f"{os.path.basename(path)[:40]:<40} {backend:<8} {size_mb:>7.1f} "
+                      f"{parse_s:>8.3f} {convert_s:>10.3f} {write_s:>8.3f} {sum(best):>8.3f}")
+
+            reference = outputs[backends[-1]]
+            for backend, output_file in outputs.items():
+                if not filecmp.cmp(reference, output_file, shallow=False):
+                    mismatches += 1
+                    print(f"  MISMATCH: {backend} output differs from {backends[-1]}")
+
+    if mismatches:
+        print(f"\n{mismatches} output mismatch(es) between backends.")
+        return 1
+    if len(backends) > 1:
+        print("\nAll backends produced identical output.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
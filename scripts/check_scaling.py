@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Check that conversion time grows linearly with the size of a composition.
+
+Synthetic compositions (generate_composition.py) are converted at growing
+sizes: every step multiplies the number of decks, and with them the
+clips, and the number of media files in the new media folder. For each
+scenario the best time over --repeat runs is taken per step and a power
+law time = a * size^k is fitted (least squares in log-log space) over the
+--fit-steps largest steps, where fixed costs and timer noise no longer
+dominate. A scenario fails when its exponent k exceeds --max-exponent,
+which catches accidental quadratic behavior (a directory listing or a
+findall() per clip) long before users notice it. Timings are printed to
+stderr, the report as JSON on stdout; the exit code is 1 when any
+scenario fails.
+
+The default sizes make every step of the fastest scenario take tens of
+milliseconds; at a few milliseconds scheduler and cache noise alone can
+move the exponent past the limit.
+
+Usage: python scripts/check_scaling.py [--steps 8,16,32,64] [--layers N]
+       [--columns N] [--repeat N] [--fit-steps N] [--max-exponent K]
+       [--scenarios NAME,...] [--output FILE.json]
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "src"))
+sys.path.insert(0, os.path.join(ROOT_DIR, "scripts"))
+
+from conversion_engine import adjust_composition, clear_composition_cache, update_file_paths  # noqa: E402
+from generate_composition import DEFAULT_MEDIA_ROOT, create_media_files, generate_composition  # noqa: E402
+from media_index import clear_directory_indexes  # noqa: E402
+from xml_backend import parse_xml  # noqa: E402
+
+# Linear work measured on a small machine fits k < 1.1; quadratic work fits k > 1.5
+DEFAULT_MAX_EXPONENT = 1.25
+DEFAULT_STEPS = "8,16,32,64"
+DEFAULT_REPEAT = 5
+# The exponent is fitted over this many of the largest steps
+DEFAULT_FIT_STEPS = 3
+
+# Media files are renamed to .mp4 for the ignore_extensions scenarios, so
+# every path has to be matched by base name instead of being rebased
+RENAMED_EXTENSIONS = {".mov": ".mp4"}
+
+
+def _scenarios(composition: str, output_file: str, media_dir: str, renamed_dir: str) -> dict:
+    """name: (setup, run) pairs; setup prepares state that is not timed."""
+    parsed = {}
+
+    def parse():
+        parsed["root"] = parse_xml(composition).getroot()
+
+    return {
+        "adjust_composition": (None, lambda: adjust_composition(
+            composition, output_file, DEFAULT_MEDIA_ROOT, media_dir)),
+        "adjust_composition_ignore_extensions": (None, lambda: adjust_composition(
+            composition, output_file, DEFAULT_MEDIA_ROOT, renamed_dir, ignore_extensions=True)),
+        # Paths are rewritten in place, so every run gets a freshly parsed root
+        "update_file_paths": (parse, lambda: update_file_paths(
+            parsed["root"], DEFAULT_MEDIA_ROOT, media_dir)),
+        "update_file_paths_ignore_extensions": (parse, lambda: update_file_paths(
+            parsed["root"], DEFAULT_MEDIA_ROOT, renamed_dir, ignore_extensions=True)),
+    }
+
+
+def _best_time(setup, run, repeat: int) -> float:
+    """
+    Best wall time of run(). Like timeit, the garbage collector is paused
+    while timing: its full collections scan the whole heap and would make
+    any allocation-heavy code look superlinear.
+    """
+    best = None
+    for _ in range(max(1, repeat)):
+        if setup:
+            setup()
+        clear_composition_cache()
+        clear_directory_indexes()
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def fit_exponent(sizes: list[float], seconds: list[float]) -> float:
+    """Slope of log(seconds) over log(size): 1 for linear, 2 for quadratic growth."""
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(max(value, 1e-9)) for value in seconds]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    spread = sum((x - mean_x) ** 2 for x in xs)
+    if spread == 0:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / spread
+
+
+def measure(steps: list[int], layers: int, columns: int, repeat: int, names: list[str]) -> list[dict]:
+    rows = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for step in steps:
+            step_dir = os.path.join(temp_dir, str(step))
+            composition = os.path.join(step_dir, "composition.avc")
+            media_dir = os.path.join(step_dir, "media")
+            renamed_dir = os.path.join(step_dir, "media_renamed")
+            clips = step * layers * columns
+            # One media name per two clips, so the folder grows with the composition
+            media_files = max(1, clips // 2)
+            os.makedirs(step_dir)
+            info = generate_composition(composition, decks=step, layers=layers, columns=columns,
+                                        media_files=media_files)
+            create_media_files(media_dir, media_files)
+            create_media_files(renamed_dir, media_files, RENAMED_EXTENSIONS)
+
+            row = {"step": step, "clips": info["clips"], "media_files": 2 * media_files,
+                   "bytes": info["bytes"], "seconds": {}}
+            scenarios = _scenarios(composition, os.path.join(step_dir, "converted.avc"),
+                                   media_dir, renamed_dir)
+            for name in names:
+                setup, run = scenarios[name]
+                row["seconds"][name] = round(_best_time(setup, run, repeat), 5)
+                print(f"step {step:<3} clips {info['clips']:<6} {name:<38} "
+                      f"{row['seconds'][name]:.4f}s", file=sys.stderr)
+            rows.append(row)
+    return rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--steps", default=DEFAULT_STEPS,
+                        help="Size multipliers (number of decks), comma-separated (default: %(default)s)")
+    parser.add_argument("--layers", type=int, default=6, help="Layers per composition (default: 6)")
+    parser.add_argument("--columns", type=int, default=16, help="Columns per deck (default: 16)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="Timed runs per step; the best is kept (default: %(default)s)")
+    parser.add_argument("--fit-steps", type=int, default=DEFAULT_FIT_STEPS,
+                        help="Fit the exponent over this many of the largest steps (default: %(default)s)")
+    parser.add_argument("--max-exponent", type=float, default=DEFAULT_MAX_EXPONENT,
+                        help=f"Largest accepted growth exponent (default: {DEFAULT_MAX_EXPONENT})")
+    parser.add_argument("--scenarios", help="Comma-separated subset of the scenarios to run")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    try:
+        steps = sorted({int(step) for step in args.steps.split(",") if step.strip()})
+    except ValueError:
+        parser.error("--steps must be comma-separated integers")
+    if len(steps) < 2 or steps[0] < 1:
+        parser.error("--steps needs at least two positive sizes")
+    if args.fit_steps < 2:
+        parser.error("--fit-steps must be at least 2")
+    known = list(_scenarios("", "", "", ""))
+    names = [name.strip() for name in args.scenarios.split(",")] if args.scenarios else known
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}; choose from {', '.join(known)}")
+
+    rows = measure(steps, args.layers, args.columns, args.repeat, names)
+    fitted = rows[-args.fit_steps:]
+    clips = [row["clips"] for row in fitted]
+    results = {}
+    for name in names:
+        exponent = fit_exponent(clips, [row["seconds"][name] for row in fitted])
+        results[name] = {"exponent": round(exponent, 3), "ok": exponent <= args.max_exponent}
+        status = "ok" if results[name]["ok"] else "SUPERLINEAR"
+        print(f"{name:<38} exponent {exponent:.2f}  {status}", file=sys.stderr)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "max_exponent": args.max_exponent,
+        "fitted_steps": [row["step"] for row in fitted],
+        "steps": rows,
+        "scenarios": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0 if all(result["ok"] for result in results.values()) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
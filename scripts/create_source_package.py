@@ -81,6 +81,25 @@ def create_source_package():
     # Source files to copy
     src_files = [
         "resolume_gui.py",
+        "conversion_engine.py",
+        "streaming_converter.py",
+        "splice_writer.py",
+        "resolume_cli.py",
+        "multi_target.py",
+        "parallel_decks.py",
+        "xml_backend.py",
+        "conversion_log.py",
+        "conversion_metrics.py",
+        "conversion_profiler.py",
+        "conversion_cancel.py",
+        "conversion_progress.py",
+        "prometheus_metrics.py",
+        "memory_budget.py",
+        "media_index.py",
+        "media_crawler.py",
+        "media_library.py",
+        "media_audit.py",
+        "path_mapping.py",
         "runtime_hook.py",
         "convert_manual_simple.py",
         "update_checker.py",
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Generate synthetic Resolume compositions for benchmarks and scaling tests.
+
+The compositions are built from the elements of test-data/UpscaleComp.avc:
+its layers, decks, columns and clips (video, image, text generator,
+generator with envelopes) are copied, renumbered and filled in, so the
+result has the same structure Resolume writes, just bigger.
+
+Usage: python scripts/generate_composition.py OUTPUT.avc [--decks N] [--layers N]
+       [--columns N] [--clips-per-slot N] [--effects N] [--text-ratio R]
+       [--envelope-ratio R] [--image-ratio R] [--media-files N]
+       [--media-root PATH] [--media-dir DIR] [--seed N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import itertools
+import os
+import random
+import xml.etree.ElementTree as ET
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATE_FILE = os.path.join(ROOT_DIR, "test-data", "UpscaleComp.avc")
+
+# Clips of the template used as prototypes, by uniqueId
+VIDEO_CLIP_ID = "1742049200283"
+IMAGE_CLIP_ID = "1742049200278"
+EFFECT_CLIP_ID = "1742049200270"
+TEXT_CLIP_IDS = ("1742049200279", "1742049200281")
+ENVELOPE_CLIP_ID = "1742049200281"
+
+DEFAULT_MEDIA_ROOT = "/Users/vj/Media/Show"
+VIDEO_EXTENSION = ".mov"
+IMAGE_EXTENSION = ".png"
+
+# Named sizes used by the benchmark suite and the scaling tests
+PRESETS = {
+    "small": {"decks": 1, "layers": 3, "columns": 9},
+    "medium": {"decks": 4, "layers": 6, "columns": 16},
+    "large": {"decks": 8, "layers": 10, "columns": 32},
+    "xlarge": {"decks": 16, "layers": 12, "columns": 48},
+}
+
+
+def _find_clip(root: ET.Element, unique_id: str) -> ET.Element:
+    for clip in root.iter("Clip"):
+        if clip.get("uniqueId") == unique_id:
+            return clip
+    raise ValueError(f"Template clip {unique_id} not found in {TEMPLATE_FILE}")
+
+
+def _clip_effect_chain(clip: ET.Element) -> ET.Element:
+    return clip.find("VideoTrack/RenderPass")
+
+
+def _media_name(number: int, extension: str) -> str:
+    return f"media_{number:05d}{extension}"
+
+
+class CompositionGenerator:
+    """Builds one synthetic composition from the template's elements."""
+
+    def __init__(self, seed: int = 0):
+        self.random = random.Random(seed)
+        self.template = ET.parse(TEMPLATE_FILE).getroot()
+        self.ids = itertools.count(2000000000000)
+
+        template = self.template
+        self.video_clip = _find_clip(template, VIDEO_CLIP_ID)
+        self.image_clip = _find_clip(template, IMAGE_CLIP_ID)
+        self.text_clips = [_find_clip(template, unique_id) for unique_id in TEXT_CLIP_IDS]
+        self.envelope_clip = _find_clip(template, ENVELOPE_CLIP_ID)
+        # Every effect of the effect clip except its own transform
+        self.effects = list(_clip_effect_chain(_find_clip(template, EFFECT_CLIP_ID)))[1:]
+        self.layer = template.find("Layer")
+        self.deck = template.find("Deck")
+        self.column = self.deck.find("Column")
+
+    def _copy(self, elem: ET.Element) -> ET.Element:
+        elem = copy.deepcopy(elem)
+        for child in elem.iter():
+            if "uniqueId" in child.attrib:
+                child.set("uniqueId", str(next(self.ids)))
+        return elem
+
+    def _set_media(self, clip: ET.Element, path: str) -> None:
+        for source in clip.iter("VideoFormatReaderSource"):
+            source.set("fileName", path)
+        for preload in clip.iter("PreloadData"):
+            for video_file in preload.iter("VideoFile"):
+                video_file.set("value", path)
+
+    def _make_clip(self, layer: int, column: int, settings: dict) -> ET.Element:
+        roll = self.random.random()
+        if roll < settings["text_ratio"]:
+            clip = self._copy(self.random.choice(self.text_clips))
+        elif roll < settings["text_ratio"] + settings["envelope_ratio"]:
+            clip = self._copy(self.envelope_clip)
+        else:
+            is_image = self.random.random() < settings["image_ratio"]
+            clip = self._copy(self.image_clip if is_image else self.video_clip)
+            number = self.random.randrange(settings["media_files"])
+            name = _media_name(number, IMAGE_EXTENSION if is_image else VIDEO_EXTENSION)
+            self._set_media(clip, settings["media_root"].rstrip("/") + "/" + name)
+
+        chain = _clip_effect_chain(clip)
+        if chain is not None and self.effects:
+            for number in range(settings["effects"]):
+                chain.append(self._copy(self.effects[number % len(self.effects)]))
+
+        clip.set("layerIndex", str(layer))
+        clip.set("columnIndex", str(column))
+        return clip
+
+    def generate(self, decks: int = 1, layers: int = 3, columns: int = 9,
+                 clips_per_slot: int = 1, effects: int = 0, text_ratio: float = 0.1,
+                 envelope_ratio: float = 0.05, image_ratio: float = 0.2,
+                 media_files: int = 100, media_root: str = DEFAULT_MEDIA_ROOT) -> ET.ElementTree:
+        settings = {
+            "effects": effects,
+            "text_ratio": text_ratio,
+            "envelope_ratio": envelope_ratio,
+            "image_ratio": image_ratio,
+            "media_files": max(1, media_files),
+            "media_root": media_root,
+        }
+        root = copy.deepcopy(self.template)
+
+        # Replace the template's layers and decks, keeping their position
+        children = list(root)
+        layer_position = children.index(root.find("Layer"))
+        for child in children:
+            if child.tag in ("Layer", "Deck"):
+                root.remove(child)
+
+        for number in range(layers):
+            layer = self._copy(self.layer)
+            layer.set("layerIndex", str(number))
+            root.insert(layer_position + number, layer)
+
+        deck_position = list(root).index(root.find("TempoController")) + 1
+        for deck_number in range(decks):
+            deck = self._copy(self.deck)
+            for child in list(deck):
+                if child.tag in ("Column", "Clip"):
+                    deck.remove(child)
+            for column in range(columns):
+                column_elem = self._copy(self.column)
+                column_elem.set("columnIndex", str(column))
+                deck.append(column_elem)
+            for layer in range(layers):
+                for column in range(columns):
+                    for _ in range(clips_per_slot):
+                        deck.append(self._make_clip(layer, column, settings))
+            deck.set("deckIndex", str(deck_number))
+            deck.set("numLayers", str(layers))
+            deck.set("numColumns", str(columns))
+            deck.set("numLayersWithContent", str(layers))
+            deck.set("numColumnsWithContent", str(columns))
+            root.insert(deck_position + deck_number, deck)
+
+        root.set("numDecks", str(decks))
+        root.set("numLayers", str(layers))
+        root.set("numColumns", str(columns))
+        ET.indent(root, space="\t")
+        return ET.ElementTree(root)
+
+
+def create_media_files(media_dir: str, media_files: int, extension_map: dict | None = None) -> None:
+    """
+    Create empty media files named like the generated references, so path
+    remapping finds matches. extension_map can rename extensions (for
+    example {".mov": ".mp4"}) to exercise ignore_extensions matching.
+    """
+    extension_map = extension_map or {}
+    os.makedirs(media_dir, exist_ok=True)
+    for number in range(max(1, media_files)):
+        for extension in (VIDEO_EXTENSION, IMAGE_EXTENSION):
+            name = _media_name(number, extension_map.get(extension, extension))
+            with open(os.path.join(media_dir, name), "wb"):
+                pass
+
+
+def generate_composition(output_file: str, seed: int = 0, **options) -> dict:
+    """
+    Write a synthetic composition to output_file. options are the keyword
+    arguments of CompositionGenerator.generate(). Returns a short description
+    (element, clip and byte counts).
+    """
+    tree = CompositionGenerator(seed).generate(**options)
+    tree.write(output_file, encoding="utf-8", xml_declaration=True)
+    root = tree.getroot()
+    return {
+        "file": output_file,
+        "bytes": os.path.getsize(output_file),
+        "elements": sum(1 for _ in root.iter()),
+        "clips": sum(1 for _ in root.iter("Clip")),
+        "options": dict(options, seed=seed),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("output", help="Composition file to write")
+    parser.add_argument("--preset", choices=sorted(PRESETS), help="Start from a named size")
+    parser.add_argument("--decks", type=int)
+    parser.add_argument("--layers", type=int)
+    parser.add_argument("--columns", type=int)
+    parser.add_argument("--clips-per-slot", type=int, default=1)
+    parser.add_argument("--effects", type=int, default=0, help="Extra effects per clip")
+    parser.add_argument("--text-ratio", type=float, default=0.1, help="Share of text generator clips")
+    parser.add_argument("--envelope-ratio", type=float, default=0.05, help="Share of clips with envelopes")
+    parser.add_argument("--image-ratio", type=float, default=0.2, help="Share of media clips that are images")
+    parser.add_argument("--media-files", type=int, default=100, help="Number of distinct media files referenced")
+    parser.add_argument("--media-root", default=DEFAULT_MEDIA_ROOT, help="Folder the media references point to")
+    parser.add_argument("--media-dir", help="Also create empty media files with matching names here")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sizes = dict(PRESETS["small"])
+    if args.preset:
+        sizes.update(PRESETS[args.preset])
+    for key in ("decks", "layers", "columns"):
+        if getattr(args, key) is not None:
+            sizes[key] = getattr(args, key)
+
+    info = generate_composition(
+        args.output, seed=args.seed, clips_per_slot=args.clips_per_slot,
+        effects=args.effects, text_ratio=args.text_ratio,
+        envelope_ratio=args.envelope_ratio, image_ratio=args.image_ratio,
+        media_files=args.media_files, media_root=args.media_root, **sizes)
+    if args.media_dir:
+        create_media_files(args.media_dir, args.media_files)
+    print(f"Wrote {info['file']}: {info['clips']} clips, {info['elements']} elements, "
+          f"{info['bytes'] / (1024 * 1024):.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
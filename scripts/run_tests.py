@@ -0,0 +1,1024 @@
+#!/usr/bin/env python3
+"""
+Golden-output regression tests over the compositions in test-data/.
+
+Every fixture re-runs adjust_composition on an input file with recorded
+parameters and compares the result structurally with a golden file: same
+elements in the same order, same attributes (numbers compared with a small
+tolerance, so 9600 and 9600.0 are equal) and same text. Each fixture runs
+once per conversion path (full DOM, streaming, splice writer, parallel
+decks), so all of them are checked for equivalence in the same run.
+
+Fixtures also carry a time budget (wall time of one conversion) and a
+memory budget (peak traced by tracemalloc during a second, separate
+conversion, so tracing does not distort the timing). An optimization that
+changes the output or blows a budget makes the run fail with exit code 1.
+
+After the fixtures a few focused checks run: the media audit report and
+the Prometheus textfile of the batch command line (compared with their
+golden files in test-data/), path mapping tables, the change manifest,
+multi-target conversion, and behavior a golden file cannot show (what is
+still in memory when a conversion falls back, what a cancelled conversion
+leaves on disk, the bytes the splice backend leaves alone, the progress
+events). Everything runs with an empty, temporary config folder, so the
+saved effect position policy and media library are neither used nor
+changed.
+
+Usage: python scripts/run_tests.py [--fixtures NAME,...] [--variants NAME,...]
+       [--checks NAME,...] [--budget-scale FACTOR] [--output FILE.json] [--verbose]
+"""
+
+from __future__ import annotations
+
+import argparse
+import collections
+import difflib
+import gc
+import json
+import math
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import weakref
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import unescape
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_DATA_DIR = os.path.join(ROOT_DIR, "test-data")
+sys.path.insert(0, os.path.join(ROOT_DIR, "src"))
+
+import conversion_engine  # noqa: E402
+from conversion_cancel import CancellationToken, ConversionCancelled  # noqa: E402
+from conversion_engine import adjust_composition, clear_composition_cache, update_file_paths  # noqa: E402
+from conversion_log import configure_logging  # noqa: E402
+from conversion_progress import PROGRESS_INTERVAL, ProgressReporter  # noqa: E402
+from media_index import clear_directory_indexes  # noqa: E402
+from media_library import MediaLibrary  # noqa: E402
+from memory_budget import MemoryBudget, MemoryBudgetExceeded  # noqa: E402
+from multi_target import convert_targets  # noqa: E402
+from path_mapping import PathMapping, load_path_mapping  # noqa: E402
+from resolume_cli import parse_target  # noqa: E402
+
+RECORDED_MEDIA_ROOT = "/Users/tijn/Documents/Resolume Arena/Recorded"
+DOWNLOADS_MEDIA_ROOT = "/Users/tijn/Downloads/SOULKITCHEN"
+
+
+def _moved(old: str, new: str) -> list[tuple[str, str, str]]:
+    """Golden overrides for a media path that moved: the source and its preload data."""
+    return [(f".//*[@fileName='{old}']", "fileName", new), (f".//*[@value='{old}']", "value", new)]
+
+
+# Parameters and expectations of every fixture:
+#   input, golden   file names in test-data/
+#   options         keyword arguments for adjust_composition; "{media}" in a
+#                   value stands for a temporary media folder holding the
+#                   (empty) files listed in media, which may be in subfolders
+#   path_map        optional old,new rows: written to a CSV file and read
+#                   with load_path_mapping as the path_mapping option
+#   golden_overrides  (ElementPath, attribute, value) edits applied to the
+#                   golden tree before comparing, for behavior that changed
+#                   on purpose after the golden file was recorded. Values are
+#                   formatted with media (the media folder) and sep (os.sep).
+#                   Every path must match at least one element.
+#   time_budget     seconds for one conversion
+#   memory_budget   peak traced allocation of one conversion, in MB
+FIXTURES = [
+    {
+        "name": "upscale_defaults",
+        "input": "UpscaleComp.avc",
+        "golden": "UpscaleComp_converted.avc",
+        "options": {"resolution_factor": 2.0, "framerate_factor": 2.4},
+        # The golden file predates the scaling of group VideoTracks
+        "golden_overrides": [
+            ("./Group/VideoTrack/Params/ParamRange[@name='Width']", "value", "3840"),
+            ("./Group/VideoTrack/Params/ParamRange[@name='Height']", "value", "2160"),
+        ],
+        "time_budget": 2.0,
+        "memory_budget": 8,
+    },
+    {
+        # Already converted, so the factors are 1: only the media paths move.
+        # The .jpg, .png and .dxv references must find the files of the same
+        # type with another extension; Test Movie has no match and is rebased.
+        "name": "ignore_extensions",
+        "input": "UpscaleComp_extension_test.avc",
+        "golden": "UpscaleComp_extension_test.avc",
+        "media": [
+            "slice scale test 2025-02-12 at 14.21.43.png",
+            "hyperspace-jump-through-the-stars-to-a-distant-space.mp4",
+            "38169.jpg",
+        ],
+        "options": {
+            "resolution_factor": 1.0,
+            "framerate_factor": 1.0,
+            "old_path": RECORDED_MEDIA_ROOT,
+            "new_path": "{media}",
+            "ignore_extensions": True,
+        },
+        "golden_overrides": [
+            (f".//*[@fileName='{RECORDED_MEDIA_ROOT}/slice scale test 2025-02-12 at 14.21.43.jpg']",
+             "fileName", "{media}{sep}slice scale test 2025-02-12 at 14.21.43.png"),
+            (f".//*[@value='{RECORDED_MEDIA_ROOT}/slice scale test 2025-02-12 at 14.21.43.jpg']",
+             "value", "{media}{sep}slice scale test 2025-02-12 at 14.21.43.png"),
+            (f".//*[@fileName='{RECORDED_MEDIA_ROOT}/MP4 HD/hyperspace-jump-through-the-stars-to-a-distant-space.dxv']",
+             "fileName", "{media}{sep}hyperspace-jump-through-the-stars-to-a-distant-space.mp4"),
+            (f".//*[@value='{RECORDED_MEDIA_ROOT}/MP4 HD/hyperspace-jump-through-the-stars-to-a-distant-space.dxv']",
+             "value", "{media}{sep}hyperspace-jump-through-the-stars-to-a-distant-space.mp4"),
+            (".//*[@fileName='/Users/tijn/Downloads/SOULKITCHEN/Soul Pict/fashion-chinese-ying-yang-with-fish/38169.png']",
+             "fileName", "{media}{sep}38169.jpg"),
+            (".//*[@value='/Users/tijn/Downloads/SOULKITCHEN/Soul Pict/fashion-chinese-ying-yang-with-fish/38169.png']",
+             "value", "{media}{sep}38169.jpg"),
+            (f".//*[@fileName='{RECORDED_MEDIA_ROOT}/MP4 HD/Test Movie.mov']",
+             "fileName", "{media}/MP4 HD/Test Movie.mov"),
+            (f".//*[@value='{RECORDED_MEDIA_ROOT}/MP4 HD/Test Movie.mov']",
+             "value", "{media}/MP4 HD/Test Movie.mov"),
+        ],
+        "time_budget": 2.0,
+        "memory_budget": 8,
+    },
+    {
+        # Three media folders, one nested in another: the longest wins
+        "name": "path_mapping",
+        "input": "UpscaleComp_extension_test.avc",
+        "golden": "UpscaleComp_extension_test.avc",
+        "path_map": [
+            (RECORDED_MEDIA_ROOT, "{media}/recorded"),
+            (f"{RECORDED_MEDIA_ROOT}/MP4 HD", "{media}/video"),
+            (DOWNLOADS_MEDIA_ROOT, "{media}/soulkitchen"),
+        ],
+        "options": {"resolution_factor": 1.0, "framerate_factor": 1.0},
+        "golden_overrides": [
+            *_moved(f"{RECORDED_MEDIA_ROOT}/slice scale test 2025-02-12 at 14.21.43.jpg",
+                    "{media}/recorded/slice scale test 2025-02-12 at 14.21.43.jpg"),
+            *_moved(f"{RECORDED_MEDIA_ROOT}/MP4 HD/hyperspace-jump-through-the-stars-to-a-distant-space.dxv",
+                    "{media}/video/hyperspace-jump-through-the-stars-to-a-distant-space.dxv"),
+            *_moved(f"{RECORDED_MEDIA_ROOT}/MP4 HD/Test Movie.mov", "{media}/video/Test Movie.mov"),
+            *_moved(f"{DOWNLOADS_MEDIA_ROOT}/Soul Pict/fashion-chinese-ying-yang-with-fish/38169.png",
+                    "{media}/soulkitchen/Soul Pict/fashion-chinese-ying-yang-with-fish/38169.png"),
+        ],
+        "time_budget": 2.0,
+        "memory_budget": 8,
+    },
+    {
+        # Media that moved into subfolders is found through the media
+        # library; of two Test Movies the one in a folder named like the
+        # old one wins. The .dxv is where the rebased path points and the
+        # SOULKITCHEN file is outside old_path, so neither is searched.
+        "name": "search_subfolders",
+        "input": "UpscaleComp_extension_test.avc",
+        "golden": "UpscaleComp_extension_test.avc",
+        "media": [
+            "archive/2025/Test Movie.mov",
+            "shows/MP4 HD/Test Movie.mov",
+            "stills/slice scale test 2025-02-12 at 14.21.43.jpg",
+            "MP4 HD/hyperspace-jump-through-the-stars-to-a-distant-space.dxv",
+        ],
+        "options": {
+            "resolution_factor": 1.0,
+            "framerate_factor": 1.0,
+            "old_path": RECORDED_MEDIA_ROOT,
+            "new_path": "{media}",
+            "search_subfolders": True,
+        },
+        "golden_overrides": [
+            *_moved(f"{RECORDED_MEDIA_ROOT}/slice scale test 2025-02-12 at 14.21.43.jpg",
+                    "{media}{sep}stills{sep}slice scale test 2025-02-12 at 14.21.43.jpg"),
+            *_moved(f"{RECORDED_MEDIA_ROOT}/MP4 HD/hyperspace-jump-through-the-stars-to-a-distant-space.dxv",
+                    "{media}/MP4 HD/hyperspace-jump-through-the-stars-to-a-distant-space.dxv"),
+            *_moved(f"{RECORDED_MEDIA_ROOT}/MP4 HD/Test Movie.mov",
+                    "{media}{sep}shows{sep}MP4 HD{sep}Test Movie.mov"),
+        ],
+        "time_budget": 2.0,
+        "memory_budget": 8,
+    },
+]
+
+# Conversion paths every fixture runs through; all must match the golden file
+VARIANTS = {
+    "dom": {},
+    "streaming": {"streaming": True},
+    "splice": {"output_backend": "splice"},
+    "decks": {"deck_workers": 2},
+}
+
+# Relative tolerance for numeric attribute values
+NUMBER_TOLERANCE = 1e-9
+# Differences listed per failing comparison
+MAX_REPORTED_DIFFERENCES = 10
+
+
+def _number(value: str):
+    try:
+        number = float(value)
+    except ValueError:
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _values_equal(actual: str, expected: str) -> bool:
+    if actual == expected:
+        return True
+    actual_number, expected_number = _number(actual), _number(expected)
+    if actual_number is None or expected_number is None:
+        return False
+    return math.isclose(actual_number, expected_number, rel_tol=NUMBER_TOLERANCE, abs_tol=NUMBER_TOLERANCE)
+
+
+def _label(elem: ET.Element, index: int) -> str:
+    name = elem.get("name")
+    label = f"{elem.tag}[{index}]"
+    return f"{label}[@name={name!r}]" if name is not None else label
+
+
+def compare_trees(actual: ET.Element, expected: ET.Element, limit: int = MAX_REPORTED_DIFFERENCES) -> list[str]:
+    """
+    Structural differences between two element trees, as readable lines
+    with the element path, at most limit of them.
+    """
+    differences = []
+    pending = [(actual, expected, expected.tag)]
+    while pending and len(differences) < limit:
+        got, want, path = pending.pop()
+        if got.tag != want.tag:
+            differences.append(f"{path}: element <{got.tag}>, expected <{want.tag}>")
+            continue
+        for key in sorted(set(got.attrib) | set(want.attrib)):
+            if key not in got.attrib:
+                differences.append(f"{path}: missing attribute {key}={want.get(key)!r}")
+            elif key not in want.attrib:
+                differences.append(f"{path}: unexpected attribute {key}={got.get(key)!r}")
+            elif not _values_equal(got.get(key), want.get(key)):
+                differences.append(f"{path}: {key}={got.get(key)!r}, expected {want.get(key)!r}")
+        if (got.text or "").strip() != (want.text or "").strip():
+            differences.append(f"{path}: text {got.text!r}, expected {want.text!r}")
+        got_children, want_children = list(got), list(want)
+        if len(got_children) != len(want_children):
+            differences.append(f"{path}: {len(got_children)} children, expected {len(want_children)}")
+        pairs = list(zip(got_children, want_children))
+        # Depth first, in document order
+        for index, (got_child, want_child) in reversed(list(enumerate(pairs))):
+            pending.append((got_child, want_child, f"{path}/{_label(want_child, index)}"))
+    return differences[:limit]
+
+
+def _format_option(value, media_dir: str):
+    return value.format(media=media_dir, sep=os.sep) if isinstance(value, str) else value
+
+
+def load_golden(fixture: dict, media_dir: str) -> ET.Element:
+    """The golden tree of a fixture with its overrides applied."""
+    root = ET.parse(os.path.join(TEST_DATA_DIR, fixture["golden"])).getroot()
+    for path, attribute, value in fixture.get("golden_overrides", ()):
+        matches = root.findall(path)
+        if not matches:
+            raise ValueError(f"golden override matches nothing: {path}")
+        for elem in matches:
+            elem.set(attribute, _format_option(value, media_dir))
+    return root
+
+
+def _convert(input_file: str, output_file: str, options: dict, trace_memory: bool) -> tuple[float, float]:
+    """Run one conversion; returns (seconds, peak traced MB or 0)."""
+    clear_composition_cache()
+    clear_directory_indexes()
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        adjust_composition(input_file, output_file, **options)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else 0
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024)
+
+
+def prepare_fixture(fixture: dict, work_dir: str) -> tuple[str, dict]:
+    """
+    The input file and adjust_composition options of a fixture, after
+    creating its media folder and path mapping table in work_dir.
+    """
+    media_dir = os.path.join(work_dir, "media")
+    os.makedirs(media_dir, exist_ok=True)
+    for name in fixture.get("media", ()):
+        path = os.path.join(media_dir, *name.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, "wb").close()
+
+    options = {key: _format_option(value, media_dir) for key, value in fixture["options"].items()}
+    if "path_map" in fixture:
+        path_map_file = os.path.join(work_dir, "path_map.csv")
+        with open(path_map_file, "w", encoding="utf-8", newline="") as f:
+            f.write("old,new\n")
+            for old, new in fixture["path_map"]:
+                f.write(f"{old},{_format_option(new, media_dir)}\n")
+        options["path_mapping"] = load_path_mapping(path_map_file)
+    return os.path.join(TEST_DATA_DIR, fixture["input"]), options
+
+
+def _fixture(name: str) -> dict:
+    return next(fixture for fixture in FIXTURES if fixture["name"] == name)
+
+
+def run_fixture(fixture: dict, variant: str, budget_scale: float, work_dir: str) -> dict:
+    result = {"fixture": fixture["name"], "variant": variant, "ok": False, "errors": []}
+    media_dir = os.path.join(work_dir, "media")
+    output_file = os.path.join(work_dir, "converted.avc")
+
+    try:
+        input_file, options = prepare_fixture(fixture, work_dir)
+        options.update(VARIANTS[variant])
+        seconds, _ = _convert(input_file, output_file, options, trace_memory=False)
+        differences = compare_trees(ET.parse(output_file).getroot(), load_golden(fixture, media_dir))
+        # Worker processes are not traced, so the memory run stays in this process
+        memory_options = dict(options, deck_workers=1)
+        _, peak_mb = _convert(input_file, output_file, memory_options, trace_memory=True)
+    except Exception as exc:
+        result["errors"].append(f"{type(exc).__name__}: {exc}")
+        return result
+
+    time_budget = fixture["time_budget"] * budget_scale
+    memory_budget = fixture["memory_budget"] * budget_scale
+    result.update(seconds=round(seconds, 4), peak_mb=round(peak_mb, 2),
+                  time_budget=time_budget, memory_budget=memory_budget)
+    result["errors"].extend(differences)
+    if seconds > time_budget:
+        result["errors"].append(f"took {seconds:.3f}s, budget {time_budget:.3f}s")
+    if peak_mb > memory_budget:
+        result["errors"].append(f"peak memory {peak_mb:.1f} MB, budget {memory_budget:.1f} MB")
+    result["ok"] = not result["errors"]
+    return result
+
+
+def check_memory_fallback_frees_tree(work_dir: str) -> list[str]:
+    """
+    A parse stopped by the memory budget must not keep its partial tree
+    alive while the file is streamed instead.
+    """
+    fixture = FIXTURES[0]
+    input_file = os.path.join(TEST_DATA_DIR, fixture["input"])
+    output_file = os.path.join(work_dir, "converted.avc")
+    partial = []
+    alive = []
+    parse_file, stream_file = conversion_engine._parse_file, conversion_engine._stream_file
+
+    def parse_until_exceeded(input_file, *args):
+        tree = ET.parse(input_file)
+        partial.append(weakref.ref(tree.getroot()))
+        raise MemoryBudgetExceeded("stopped the parse")
+
+    def stream_after_fallback(*args):
+        alive.append(partial[0]() is not None)
+        return stream_file(*args)
+
+    conversion_engine._parse_file = parse_until_exceeded
+    conversion_engine._stream_file = stream_after_fallback
+    try:
+        budget = MemoryBudget(1 << 40)
+        adjust_composition(input_file, output_file, memory_budget=budget, **fixture["options"])
+    finally:
+        conversion_engine._parse_file = parse_file
+        conversion_engine._stream_file = stream_file
+
+    errors = []
+    if alive != [False]:
+        errors.append("the partial tree was still alive when streaming started" if alive
+                      else "the conversion did not fall back to streaming")
+    if budget.strategy != "streaming":
+        errors.append(f"strategy {budget.strategy!r}, expected 'streaming'")
+    errors.extend(compare_trees(ET.parse(output_file).getroot(), load_golden(fixture, work_dir)))
+    return errors
+
+
+# The composition converted by the batch checks and their golden files
+BATCH_INPUT = "UpscaleComp_extension_test.avc"
+BATCH_REPORT_GOLDEN = "UpscaleComp_extension_test_batch.txt"
+BATCH_METRICS_GOLDEN = "UpscaleComp_extension_test_batch.prom"
+# The first bytes of a QuickTime movie
+QUICKTIME_HEADER = b"\0\0\0\x14ftypqt  \0\0\0\0"
+# Media of the batch: a good movie, an empty one and an image file holding
+# a movie; the SOULKITCHEN file is missing
+BATCH_MEDIA = {
+    "MP4 HD/Test Movie.mov": QUICKTIME_HEADER,
+    "MP4 HD/hyperspace-jump-through-the-stars-to-a-distant-space.dxv": b"",
+    "slice scale test 2025-02-12 at 14.21.43.jpg": QUICKTIME_HEADER,
+}
+# Samples of the textfile that depend on timing, compared by name only
+_TIMING_SAMPLE_RE = re.compile(
+    r"^(resolume_converter_(?:file_duration_seconds_(?:bucket\{[^}]*\}|sum)|last_batch_\w+)) \S+$",
+    re.MULTILINE)
+
+
+def _text_differences(actual: str, expected: str, name: str) -> list[str]:
+    diff = difflib.unified_diff(expected.splitlines(), actual.splitlines(),
+                                f"{name} (golden)", name, lineterm="")
+    return list(diff)[:MAX_REPORTED_DIFFERENCES]
+
+
+def _run_batch(work_dir: str, *arguments: str) -> subprocess.CompletedProcess:
+    """Run the command line on BATCH_INPUT in one process with factors of 1 and arguments."""
+    command = [sys.executable, os.path.join(ROOT_DIR, "src", "resolume_cli.py"),
+               os.path.join(TEST_DATA_DIR, BATCH_INPUT), "--output-dir", os.path.join(work_dir, "out"),
+               "--resolution", "1", "--framerate", "1", "--workers", "1", *arguments]
+    return subprocess.run(command, capture_output=True, text=True, timeout=120)
+
+
+def check_batch_audit(work_dir: str) -> list[str]:
+    """
+    A command line run with a path mapping table and --audit: the report of
+    the path mapping rules and the media audit, compared with its golden
+    file. Temporary paths, timings and the operating system's error
+    messages are replaced by placeholders first.
+    """
+    work = work_dir.replace(os.sep, "/")
+    media = f"{work}/media"
+    for name, content in BATCH_MEDIA.items():
+        path = os.path.join(work_dir, "media", *name.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(content)
+    path_map_file = os.path.join(work_dir, "path_map.csv")
+    with open(path_map_file, "w", encoding="utf-8", newline="") as f:
+        f.write(f"{RECORDED_MEDIA_ROOT},{media}\n{DOWNLOADS_MEDIA_ROOT},{media}/soul\n")
+
+    run = _run_batch(work_dir, "--path-map", path_map_file, "--audit")
+    # The audit finds problems, which is exit code 1
+    if run.returncode != 1:
+        return [f"exit code {run.returncode}, expected 1", *run.stderr.splitlines()[-5:]]
+
+    start = run.stdout.find("Path mapping rules used:")
+    report = run.stdout[start:] if start >= 0 else run.stdout
+    report = report.replace("\\", "/").replace(work, "{work}")
+    report = re.sub(r" in \d+\.\d+s:", " in {seconds}s:", report)
+    report = re.sub(r": missing \([^)]*\)", ": missing ({reason})", report)
+    with open(os.path.join(TEST_DATA_DIR, BATCH_REPORT_GOLDEN), "r", encoding="utf-8") as f:
+        return _text_differences(report, f.read(), "report")
+
+
+def check_batch_metrics(work_dir: str) -> list[str]:
+    """
+    The Prometheus textfile of two command line runs, compared with its
+    golden file: counters and histograms add up over the runs, gauges
+    describe the last one. Timings are replaced by placeholders first.
+    """
+    metrics_file = os.path.join(work_dir, "batch.prom")
+    for _ in range(2):
+        run = _run_batch(work_dir, "--metrics-file", metrics_file)
+        if run.returncode != 0:
+            return [f"exit code {run.returncode}", *run.stderr.splitlines()[-5:]]
+
+    with open(metrics_file, "r", encoding="utf-8") as f:
+        metrics = _TIMING_SAMPLE_RE.sub(r"\1 {seconds}", f.read())
+    with open(os.path.join(TEST_DATA_DIR, BATCH_METRICS_GOLDEN), "r", encoding="utf-8") as f:
+        # The size of the input depends on the line endings of the checkout
+        size = os.path.getsize(os.path.join(TEST_DATA_DIR, BATCH_INPUT))
+        expected = f.read().replace("{input_bytes}", str(2 * size))
+    return _text_differences(metrics, expected, "metrics")
+
+
+def check_path_mapping_trie(work_dir: str) -> list[str]:
+    """Longest prefix, case folding, mixed separators, roots and duplicates."""
+    mapping = PathMapping([
+        ("/Media", "/Volumes/New"),
+        ("/Media/Shows", "D:\\Shows"),
+        ("C:\\Footage", "/Volumes/Footage"),
+        ("Media", "Relative"),
+    ])
+    cases = [
+        ("/Media/a.mov", "/Volumes/New/a.mov", "/Media"),
+        ("/media/SHOWS/2025/b.mov", "D:\\Shows\\2025\\b.mov", "/Media/Shows"),
+        ("/Media/Shows", "D:\\Shows", "/Media/Shows"),
+        ("c:/footage\\Sub/c.png", "/Volumes/Footage/Sub/c.png", "C:\\Footage"),
+        ("\\Media\\d.mov", "/Volumes/New/d.mov", "/Media"),
+        ("Media/e.mov", "Relative/e.mov", "Media"),
+        ("/MediaX/f.mov", "/MediaX/f.mov", None),
+        ("/Other/Media/g.mov", "/Other/Media/g.mov", None),
+        ("//Media/h.mov", "//Media/h.mov", None),
+    ]
+    errors = []
+    for path, expected_path, expected_rule in cases:
+        new_path, rule = mapping.resolve(path)
+        rule_old = rule.old if rule is not None else None
+        if (new_path, rule_old) != (expected_path, expected_rule):
+            errors.append(f"{path!r}: {new_path!r} by rule {rule_old!r}, "
+                          f"expected {expected_path!r} by rule {expected_rule!r}")
+    for rules in ([("/Media", "/a"), ("/media/", "/b")], [("C:\\Media", "/a"), ("c:/MEDIA", "/b")],
+                  [("/", "/a"), ("", "/b")], [(".", "/a")], [("/Media", "")]):
+        try:
+            PathMapping(rules)
+        except ValueError:
+            continue
+        errors.append(f"{rules!r}: no ValueError")
+    return errors
+
+
+def check_path_mapping_loader(work_dir: str) -> list[str]:
+    """Valid JSON and CSV tables load; invalid ones raise ValueError."""
+    valid = {
+        "object.json": '{"/Media": "/New", "/Media/Shows": "/Shows"}',
+        "list.json": '[{"old": "/Media", "new": "/New"}, ["/Media/Shows", "/Shows"]]',
+        "table.csv": "\ufeffold,new\n# comment\n\n/Media,/New\n /Media/Shows , /Shows \n",
+    }
+    invalid = {
+        "truncated.json": '{"/Media": "/New"',
+        "number.json": "3",
+        "value.json": '{"/Media": 1}',
+        "missing_new.json": '[{"old": "/Media"}]',
+        "pair.json": '[["/Media", "/New", "/Other"]]',
+        "duplicate.json": '{"/Media": "/New", "/media/": "/Other"}',
+        "columns.csv": "/Media,/New,/Other\n",
+        "single.csv": "/Media\n",
+        "empty_new.csv": "/Media,\n",
+    }
+    errors = []
+    for name, content in {**valid, **invalid}.items():
+        path = os.path.join(work_dir, name)
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(content)
+        try:
+            mapping = load_path_mapping(path)
+        except ValueError:
+            if name in valid:
+                errors.append(f"{name}: ValueError")
+            continue
+        except Exception as exc:
+            errors.append(f"{name}: {type(exc).__name__}: {exc}, expected ValueError")
+            continue
+        if name in invalid:
+            errors.append(f"{name}: no ValueError")
+        elif [(rule.old, rule.new) for rule in mapping.rules] != [("/Media", "/New"), ("/Media/Shows", "/Shows")]:
+            errors.append(f"{name}: rules {[rule.label for rule in mapping.rules]}")
+    return errors
+
+
+def check_library_refreshed_once(work_dir: str) -> list[str]:
+    """
+    Conversions list a media library root once per process, whichever entry
+    point they use; files added later are found after an explicit refresh.
+    """
+    media_dir = os.path.join(work_dir, "media")
+    os.makedirs(os.path.join(media_dir, "archive"))
+    open(os.path.join(media_dir, "archive", "Test Movie.mov"), "wb").close()
+    input_file = os.path.join(TEST_DATA_DIR, "UpscaleComp_extension_test.avc")
+    output_file = os.path.join(work_dir, "converted.avc")
+    options = {"resolution_factor": 1.0, "framerate_factor": 1.0, "old_path": RECORDED_MEDIA_ROOT,
+               "new_path": media_dir, "search_subfolders": True}
+    refreshed = []
+    refresh = MediaLibrary.refresh
+
+    def counted_refresh(self, root, *args, **kwargs):
+        refreshed.append(root)
+        return refresh(self, root, *args, **kwargs)
+
+    def relinked():
+        """The media files the output refers to that exist (rebased paths do not)."""
+        root = ET.parse(output_file).getroot()
+        return sorted(os.path.relpath(elem.get("fileName"), media_dir)
+                      for elem in root.iter("VideoFormatReaderSource") if os.path.isfile(elem.get("fileName")))
+
+    MediaLibrary.refresh = counted_refresh
+    try:
+        adjust_composition(input_file, output_file, **options)
+        adjust_composition(input_file, output_file, streaming=True, **options)
+        root = ET.parse(input_file).getroot()
+        update_file_paths(root, RECORDED_MEDIA_ROOT, media_dir, search_subfolders=True)
+        errors = [f"{len(refreshed)} refreshes for three conversions, expected 1"] if len(refreshed) != 1 else []
+        movie = os.path.join("archive", "Test Movie.mov")
+        if relinked() != [movie, movie]:
+            errors.append(f"relinked {relinked()}, expected {[movie, movie]}")
+
+        os.makedirs(os.path.join(media_dir, "stills"))
+        open(os.path.join(media_dir, "stills", "slice scale test 2025-02-12 at 14.21.43.jpg"), "wb").close()
+        with MediaLibrary() as library:
+            library.refresh(media_dir)
+        adjust_composition(input_file, output_file, **options)
+        still = os.path.join("stills", "slice scale test 2025-02-12 at 14.21.43.jpg")
+        if len(refreshed) != 2:
+            errors.append(f"{len(refreshed)} refreshes after refresh(), expected 2")
+        if still not in relinked():
+            errors.append(f"{still} not found after refresh()")
+    finally:
+        MediaLibrary.refresh = refresh
+    return errors
+
+
+def check_library_closed(work_dir: str) -> list[str]:
+    """Every media library a conversion opens is closed again, also when it fails."""
+    media_dir = os.path.join(work_dir, "media")
+    os.makedirs(media_dir)
+    input_file = os.path.join(TEST_DATA_DIR, "UpscaleComp_extension_test.avc")
+    output_file = os.path.join(work_dir, "converted.avc")
+    options = {"resolution_factor": 1.0, "framerate_factor": 1.0, "old_path": RECORDED_MEDIA_ROOT,
+               "new_path": media_dir, "search_subfolders": True}
+    opened = []
+    open_library, close_library = MediaLibrary.__init__, MediaLibrary.close
+
+    def counted_init(self, *args, **kwargs):
+        open_library(self, *args, **kwargs)
+        opened.append(self)
+
+    def counted_close(self):
+        opened.remove(self)
+        close_library(self)
+
+    conversions = {
+        "dom": lambda: adjust_composition(input_file, output_file, **options),
+        "streaming": lambda: adjust_composition(input_file, output_file, streaming=True, **options),
+        "splice": lambda: adjust_composition(input_file, output_file, output_backend="splice", **options),
+        "targets": lambda: convert_targets(input_file, [dict(options, output_file=output_file)]),
+        "failed write": lambda: adjust_composition(
+            input_file, os.path.join(work_dir, "missing", "converted.avc"), **options),
+    }
+    errors = []
+    MediaLibrary.__init__, MediaLibrary.close = counted_init, counted_close
+    try:
+        for name, convert in conversions.items():
+            try:
+                convert()
+            except OSError:
+                pass
+            if opened:
+                errors.append(f"{name}: {len(opened)} media libraries left open")
+                opened.clear()
+    finally:
+        MediaLibrary.__init__, MediaLibrary.close = open_library, close_library
+    return errors
+
+
+def _attribute_changes(before: ET.Element, after: ET.Element) -> collections.Counter:
+    """(element, name, attribute, old, new) of every attribute that differs between two trees of one shape."""
+    changes = collections.Counter()
+    for old_elem, new_elem in zip(before.iter(), after.iter()):
+        for attribute in set(old_elem.attrib) | set(new_elem.attrib):
+            old, new = old_elem.get(attribute), new_elem.get(attribute)
+            if old != new:
+                changes[(old_elem.tag, old_elem.get("name"), attribute, old, new)] += 1
+    return changes
+
+
+def check_manifest(work_dir: str) -> list[str]:
+    """
+    The change manifest holds one record per rewritten attribute, with its
+    rule and the element that owns the change (path rewrites are known by
+    their old path), and dom, streaming and splice write the same records.
+    Streaming converts section by section, so its records come in another
+    order.
+    """
+    errors = []
+    for name in ("upscale_defaults", "path_mapping"):
+        fixture_dir = os.path.join(work_dir, name)
+        input_file, options = prepare_fixture(_fixture(name), fixture_dir)
+        manifests = {}
+        for variant in ("dom", "streaming", "splice"):
+            output_file = os.path.join(fixture_dir, f"{variant}.avc")
+            manifest_file = os.path.join(fixture_dir, f"{variant}.jsonl")
+            adjust_composition(input_file, output_file, manifest_file=manifest_file,
+                               **options, **VARIANTS[variant])
+            with open(manifest_file, "r", encoding="utf-8") as f:
+                manifests[variant] = f.read().splitlines()
+
+        records = [json.loads(line) for line in manifests["dom"]]
+        before = ET.parse(input_file).getroot()
+        after = ET.parse(os.path.join(fixture_dir, "dom.avc")).getroot()
+        if sum(1 for _ in before.iter()) != sum(1 for _ in after.iter()):
+            errors.append(f"{name}: the conversion added or removed elements")
+            continue
+        changes = _attribute_changes(before, after)
+        recorded = collections.Counter((record["element"], record["name"], record["attribute"],
+                                        record["old"], record["new"]) for record in records)
+        for change in sorted(changes - recorded, key=str)[:MAX_REPORTED_DIFFERENCES]:
+            errors.append(f"{name}: change without a record: {change}")
+        for change in sorted(recorded - changes, key=str)[:MAX_REPORTED_DIFFERENCES]:
+            errors.append(f"{name}: record without a change (or a second one): {change}")
+        for record in records:
+            if not record["rule"] or (record["uniqueId"] is None and not record["rule"].startswith("file_path")):
+                errors.append(f"{name}: record without rule or owner: {record}")
+                break
+
+        if manifests["splice"] != manifests["dom"]:
+            errors.append(f"{name}: splice manifest differs from dom")
+            errors.extend(_text_differences("\n".join(manifests["splice"]), "\n".join(manifests["dom"]),
+                                            "splice manifest"))
+        if sorted(manifests["streaming"]) != sorted(manifests["dom"]):
+            errors.append(f"{name}: streaming manifest records differ from dom")
+            errors.extend(_text_differences("\n".join(sorted(manifests["streaming"])),
+                                            "\n".join(sorted(manifests["dom"])), "streaming manifest"))
+    return errors
+
+
+# An attribute in the markup; its value is group 2
+_ATTRIBUTE_RE = re.compile(r'([\w:.-]+)="([^"]*)"')
+_XML_ENTITIES = {"&quot;": '"', "&apos;": "'"}
+
+
+def check_splice_preserves_bytes(work_dir: str) -> list[str]:
+    """
+    The splice backend's output differs from the input only inside the
+    attribute values the change manifest lists: every changed line is the
+    same line with other values, and nothing else (markup, whitespace, line
+    endings) moves.
+    """
+    errors = []
+    for name in ("upscale_defaults", "path_mapping"):
+        fixture_dir = os.path.join(work_dir, name)
+        input_file, options = prepare_fixture(_fixture(name), fixture_dir)
+        output_file = os.path.join(fixture_dir, "converted.avc")
+        manifest_file = os.path.join(fixture_dir, "manifest.jsonl")
+        adjust_composition(input_file, output_file, manifest_file=manifest_file,
+                           **options, **VARIANTS["splice"])
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            expected = collections.Counter((record["attribute"], record["old"], record["new"])
+                                           for record in map(json.loads, f))
+        with open(input_file, "rb") as f:
+            before = f.read().decode("utf-8").splitlines(keepends=True)
+        with open(output_file, "rb") as f:
+            after = f.read().decode("utf-8").splitlines(keepends=True)
+
+        changed = collections.Counter()
+        matcher = difflib.SequenceMatcher(None, before, after, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                continue
+            if i2 - i1 != j2 - j1:
+                errors.append(f"{name}: lines {i1 + 1}-{i2} became {j2 - j1} lines")
+                continue
+            for number, old_line, new_line in zip(range(i1 + 1, i2 + 1), before[i1:i2], after[j1:j2]):
+                if _ATTRIBUTE_RE.sub(r'\1=""', old_line) != _ATTRIBUTE_RE.sub(r'\1=""', new_line):
+                    errors.append(f"{name}: line {number} changed outside attribute values")
+                    continue
+                for old, new in zip(_ATTRIBUTE_RE.finditer(old_line), _ATTRIBUTE_RE.finditer(new_line)):
+                    if old.group(2) != new.group(2):
+                        changed[(old.group(1), unescape(old.group(2), _XML_ENTITIES),
+                                 unescape(new.group(2), _XML_ENTITIES))] += 1
+        for change in sorted(changed - expected, key=str)[:MAX_REPORTED_DIFFERENCES]:
+            errors.append(f"{name}: value changed without a manifest record: {change}")
+        for change in sorted(expected - changed, key=str)[:MAX_REPORTED_DIFFERENCES]:
+            errors.append(f"{name}: manifest record not in the output: {change}")
+    return errors[:MAX_REPORTED_DIFFERENCES]
+
+
+# --target options of the multi-target check, converted with --framerate 1
+TARGETS = ("_4k=1920:3840@25:60", "_1440=1920:2560")
+
+
+def check_multi_target(work_dir: str) -> list[str]:
+    """
+    Every target of one parse (convert_targets, serially and in forked
+    workers, and the command line's --target) writes the same file and
+    summary as adjust_composition called with that target's factors.
+    """
+    fixture = _fixture("path_mapping")
+    input_file, options = prepare_fixture(fixture, work_dir)
+    out_dir = os.path.join(work_dir, "out")
+    os.makedirs(out_dir)
+    stem = os.path.splitext(fixture["input"])[0]
+    targets = []
+    expected = {}
+    for spec in TARGETS:
+        # The target's factors replace those of the fixture
+        target = dict(options, **parse_target(spec, 1.0))
+        name = stem + target.pop("suffix")
+        output_file = os.path.join(out_dir, name + ".avc")
+        target["new_name"] = name
+        summary = adjust_composition(input_file, output_file, **target)
+        with open(output_file, "rb") as f:
+            expected[output_file] = (f.read(), summary)
+        targets.append(dict(target, output_file=output_file))
+
+    errors = []
+
+    def compare(label, output_file, summary=None):
+        with open(output_file, "rb") as f:
+            data = f.read()
+        os.remove(output_file)
+        name = os.path.basename(output_file)
+        if data != expected[output_file][0]:
+            errors.append(f"{label} {name}: output differs from adjust_composition")
+        # The phase timings that follow are only in the target's summary
+        if summary is not None and summary.split("\n\nTime per phase")[0] != expected[output_file][1]:
+            errors.append(f"{label} {name}: summary differs from adjust_composition")
+            errors.extend(_text_differences(summary, expected[output_file][1], "summary"))
+
+    for workers in (1, 2):
+        for result in convert_targets(input_file, targets, workers=workers):
+            if not result["ok"]:
+                errors.append(f"convert_targets(workers={workers}) {result['output']}: {result['error']}")
+            else:
+                compare(f"convert_targets(workers={workers})", result["output"], result["summary"])
+
+    target_arguments = [argument for spec in TARGETS for argument in ("--target", spec)]
+    command = [sys.executable, os.path.join(ROOT_DIR, "src", "resolume_cli.py"), input_file,
+               "--output-dir", out_dir, "--framerate", "1", "--workers", "2",
+               "--path-map", os.path.join(work_dir, "path_map.csv"), *target_arguments]
+    run = subprocess.run(command, capture_output=True, text=True, timeout=120)
+    if run.returncode != 0:
+        errors.append(f"command line: exit code {run.returncode}")
+        errors.extend(run.stderr.splitlines()[-5:])
+    else:
+        for output_file in expected:
+            compare("command line", output_file)
+    return errors
+
+
+def _progress_errors(events: list[dict], interval: float) -> list[str]:
+    """What is wrong with the events of one conversion: pairing, order and (with interval) their number."""
+    errors = []
+    phase = None
+    for event in events:
+        kind, name = event["event"], event["phase"]
+        if kind == "start":
+            if phase is not None:
+                errors.append(f"{name} started inside {phase}")
+            phase, done, total, started, count = name, 0, None, event["elapsed"], 0
+        elif phase != name:
+            errors.append(f"{kind} of {name} outside it (running: {phase})")
+        elif kind == "progress":
+            count += 1
+            if event["done"] < done or (total is not None and event["total"] != total):
+                errors.append(f"{name}: {event['done']}/{event['total']} after {done}/{total}")
+            if event["total"] is not None and event["done"] > event["total"]:
+                errors.append(f"{name}: {event['done']} done of {event['total']}")
+            done, total = event["done"], event["total"]
+        else:
+            # Throttled: one event per interval, plus the one at the total
+            limit = (event["elapsed"] - started) / interval + 2 if interval else None
+            if limit is not None and count > limit:
+                errors.append(f"{name}: {count} progress events, at most {int(limit)} expected")
+            phase = None
+    if phase is not None:
+        errors.append(f"{phase} never finished")
+    return errors
+
+
+def check_progress(work_dir: str) -> list[str]:
+    """
+    The progress events of every variant: starts and finishes pair up and
+    do not nest, done and total never go backwards within a phase, and
+    throttling keeps the number of events to about one per interval.
+    """
+    input_file, options = prepare_fixture(_fixture("upscale_defaults"), work_dir)
+    output_file = os.path.join(work_dir, "converted.avc")
+    errors = []
+    for variant, variant_options in VARIANTS.items():
+        for interval in (0, PROGRESS_INTERVAL):
+            events = []
+            adjust_composition(input_file, output_file, **options, **variant_options,
+                               progress=ProgressReporter(events.append, interval))
+            if not any(event["event"] == "progress" for event in events):
+                errors.append(f"{variant}: no progress events")
+            errors.extend(f"{variant} (interval {interval}s): {error}"
+                          for error in _progress_errors(events, interval))
+    return errors
+
+
+def check_cancellation(work_dir: str) -> list[str]:
+    """
+    Every variant stops with ConversionCancelled when the token is cancelled
+    part way (at the first progress event after the parse) and leaves
+    neither output nor manifest behind.
+    """
+    input_file, options = prepare_fixture(_fixture("upscale_defaults"), work_dir)
+    out_dir = os.path.join(work_dir, "out")
+    os.makedirs(out_dir)
+    errors = []
+    for variant, variant_options in VARIANTS.items():
+        cancel = CancellationToken()
+        events = []
+
+        def trip(event):
+            events.append(event)
+            if event["event"] == "progress" and event["phase"] != "parse":
+                cancel.cancel()
+
+        # Parallel deck conversion cannot write a manifest
+        manifest_file = os.path.join(out_dir, "manifest.jsonl") if variant != "decks" else None
+        try:
+            adjust_composition(input_file, os.path.join(out_dir, "converted.avc"), **options, **variant_options,
+                               manifest_file=manifest_file, cancel=cancel,
+                               progress=ProgressReporter(trip, interval=0))
+            errors.append(f"{variant}: finished, expected ConversionCancelled")
+        except ConversionCancelled:
+            pass
+        if not cancel.cancelled:
+            errors.append(f"{variant}: no progress event after the parse to cancel at")
+        if events and events[-1]["event"] != "finish":
+            errors.append(f"{variant}: last event {events[-1]['event']} {events[-1]['phase']}, expected a finish")
+        left = sorted(os.listdir(out_dir))
+        if left:
+            errors.append(f"{variant}: left {', '.join(left)}")
+            for name in left:
+                os.remove(os.path.join(out_dir, name))
+    return errors
+
+
+# Focused checks: name -> function(work_dir) returning a list of errors
+CHECKS = {
+    "batch_audit": check_batch_audit,
+    "batch_metrics": check_batch_metrics,
+    "path_mapping_trie": check_path_mapping_trie,
+    "path_mapping_loader": check_path_mapping_loader,
+    "library_refreshed_once": check_library_refreshed_once,
+    "library_closed": check_library_closed,
+    "memory_fallback_frees_tree": check_memory_fallback_frees_tree,
+    "cancellation": check_cancellation,
+    "manifest": check_manifest,
+    "splice_preserves_bytes": check_splice_preserves_bytes,
+    "multi_target": check_multi_target,
+    "progress": check_progress,
+}
+
+
+def run_check(name: str, work_dir: str) -> dict:
+    result = {"check": name, "ok": False, "errors": []}
+    clear_composition_cache()
+    clear_directory_indexes()
+    try:
+        result["errors"] = CHECKS[name](work_dir)
+    except Exception as exc:
+        result["errors"].append(f"{type(exc).__name__}: {exc}")
+    result["ok"] = not result["errors"]
+    return result
+
+
+def _select(parser: argparse.ArgumentParser, option: str, value: str | None, known: list[str]) -> list[str]:
+    names = [name.strip() for name in value.split(",") if name.strip()] if value else known
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        parser.error(f"unknown {option}: {', '.join(unknown)}; choose from {', '.join(known)}")
+    return names
+
+
+def run_all(fixtures: dict, fixture_names: list[str], variant_names: list[str],
+            check_names: list[str], budget_scale: float) -> list[dict]:
+    """Run the fixtures and checks, printing a line per result."""
+    results = []
+    for name in fixture_names:
+        for variant in variant_names:
+            with tempfile.TemporaryDirectory() as work_dir:
+                result = run_fixture(fixtures[name], variant, budget_scale, work_dir)
+            results.append(result)
+            status = "ok" if result["ok"] else "FAIL"
+            timing = (f"{result['seconds']:.3f}s/{result['time_budget']:.1f}s "
+                      f"{result['peak_mb']:.1f}/{result['memory_budget']:.0f} MB"
+                      if "seconds" in result else "")
+            print(f"{status:<4} {name:<20} {variant:<10} {timing}")
+            for error in result["errors"]:
+                print(f"     {error}")
+    for name in check_names:
+        with tempfile.TemporaryDirectory() as work_dir:
+            result = run_check(name, work_dir)
+        results.append(result)
+        print(f"{'ok' if result['ok'] else 'FAIL':<4} {name}")
+        for error in result["errors"]:
+            print(f"     {error}")
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fixtures", help="Comma-separated subset of the fixtures to run")
+    parser.add_argument("--variants", help=f"Comma-separated subset of: {', '.join(VARIANTS)}")
+    parser.add_argument("--checks", help=f"Comma-separated subset of: {', '.join(CHECKS)}")
+    parser.add_argument("--budget-scale", type=float, default=1.0,
+                        help="Multiply every time and memory budget, e.g. for slow machines (default: 1)")
+    parser.add_argument("--output", help="Also write the results as JSON to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show the converter's log output")
+    args = parser.parse_args()
+
+    fixtures = {fixture["name"]: fixture for fixture in FIXTURES}
+    fixture_names = _select(parser, "fixture(s)", args.fixtures, list(fixtures))
+    variant_names = _select(parser, "variant(s)", args.variants, list(VARIANTS))
+    check_names = _select(parser, "check(s)", args.checks, list(CHECKS))
+    if args.budget_scale <= 0:
+        parser.error("--budget-scale must be positive")
+    configure_logging(1 if args.verbose else 0)
+
+    # The effect position policy and the media library live in the user's
+    # config folder (HOME on macOS, LOCALAPPDATA on Windows, XDG_CONFIG_HOME
+    # elsewhere); worker processes inherit the temporary one
+    config_dir = tempfile.mkdtemp(prefix="rcc-tests-")
+    os.environ.update(HOME=config_dir, LOCALAPPDATA=config_dir, XDG_CONFIG_HOME=config_dir)
+    try:
+        results = run_all(fixtures, fixture_names, variant_names, check_names, args.budget_scale)
+    finally:
+        shutil.rmtree(config_dir, ignore_errors=True)
+
+    failed = sum(1 for result in results if not result["ok"])
+    print(f"{len(results) - failed} passed, {failed} failed")
+    if args.output:
+        report = {"python": platform.python_version(), "platform": platform.platform(), "results": results}
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(json.dumps(report, indent=2) + "\n")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
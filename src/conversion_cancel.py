@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# conversion_cancel.py - Cooperative cancellation of running conversions
+
+import multiprocessing
+
+
+class ConversionCancelled(Exception):
+    """Raised inside a conversion once its CancellationToken is cancelled."""
+
+    def __init__(self, message="Conversion cancelled"):
+        super().__init__(message)
+
+
+class CancellationToken:
+    """
+    Lets one thread or process stop a conversion running in another.
+
+    The engine calls check() while it reads the input, for every clip,
+    every remapped path, every deck and every chunk it writes, so a
+    cancelled conversion stops within a fraction of a second; partial
+    output files are removed on the way out.
+
+    The flag lives in shared memory: worker processes that receive the
+    token when they start (as a ProcessPoolExecutor initializer argument,
+    or by forking) see the cancellation too. cancel() only sets that flag,
+    so it is safe to call from a signal handler.
+    """
+
+    def __init__(self):
+        self._flag = multiprocessing.RawValue("b", 0)
+
+    def cancel(self):
+        self._flag.value = 1
+
+    @property
+    def cancelled(self):
+        return bool(self._flag.value)
+
+    def check(self):
+        """Raise ConversionCancelled when the token has been cancelled."""
+        if self._flag.value:
+            raise ConversionCancelled()
@@ -0,0 +1,1716 @@
+#!/usr/bin/env python
+# conversion_engine.py - Composition conversion rules for Resolume Composition Converter
+
+import xml.etree.ElementTree as ET
+import os
+import re
+import json
+import platform
+import threading
+import logging
+import gc
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager, nullcontext
+
+from conversion_cancel import ConversionCancelled
+from conversion_log import get_logger
+from conversion_metrics import no_phase
+from conversion_progress import ProgressReader
+from media_index import MediaDirectoryIndex, directory_index
+from media_library import MediaLibrary
+from memory_budget import MemoryBudgetExceeded
+from xml_backend import parse_xml, write_xml
+
+logger = get_logger("engine")
+
+def find_matching_file(old_file_path, new_directory, ignore_extensions=False, index=None):
+    """
+    Find a matching file in the new directory based on the old file path.
+    
+    Args:
+        old_file_path: Path to the original file
+        new_directory: Directory to search for matching files
+        ignore_extensions: If True, match files with different extensions
+        index: MediaDirectoryIndex of new_directory; by default the shared,
+            cached listing from media_index.directory_index() is used
+        
+    Returns:
+        Path to the matching file in the new directory, or None if no match found
+    """
+    if index is None:
+        index = directory_index(new_directory)
+    if not index.exists:
+        return None
+
+    new_file = index.match(old_file_path, ignore_extensions)
+    if new_file is None:
+        logger.debug("No match found for %s in %s", os.path.basename(old_file_path), new_directory)
+        return None
+    logger.debug("Found match for %s: %s", os.path.basename(old_file_path), new_file)
+    return os.path.join(new_directory, new_file)
+
+def _split_path_parts(path_str):
+    return [p for p in re.split(r"[\\/]", path_str) if p and p != "."]
+
+def _rebase_path(file_path, old_path, new_path):
+    if not old_path or not new_path:
+        return file_path
+
+    if old_path in file_path:
+        return file_path.replace(old_path, new_path)
+
+    file_parts = _split_path_parts(file_path)
+    old_parts = _split_path_parts(old_path)
+    new_parts = _split_path_parts(new_path)
+
+    if not old_parts:
+        return file_path
+
+    old_media_folder = old_parts[-1]
+    try:
+        idx = file_parts.index(old_media_folder)
+    except ValueError:
+        return file_path
+
+    relative_parts = file_parts[idx + 1:]
+    rebased_parts = new_parts + relative_parts
+    rebased = "/".join(rebased_parts)
+    if file_path.startswith("./"):
+        return "./" + rebased
+    return rebased
+
+def update_file_paths(root, old_path, new_path, ignore_extensions=False, search_subfolders=False,
+                      path_mapping=None, path_rules=None):
+    """
+    Update file paths in the XML tree to point to files in the new directory.
+
+    When ignore_extensions is True, match by base name and file type. If no match
+    is found, fall back to rebasing the path to the new directory. With
+    search_subfolders, a rebased path that does not exist is looked up by
+    name in the whole folder tree under the new directory (see MediaLibrary;
+    the tree is listed by the first call for it in this process, later
+    calls reuse that listing until MediaLibrary.refresh() is called again).
+
+    path_mapping (a PathMapping, see path_mapping.py) rebases paths with a
+    table of many old -> new folders instead of old_path and new_path; the
+    number of paths each rule rewrote is added to the path_rules dict.
+    """
+    if path_mapping is None and (not old_path or not new_path):
+        return 0
+
+    library = MediaLibrary() if search_subfolders and path_mapping is None else None
+    try:
+        return update_path_elements(root.findall(".//VideoFormatReaderSource"),
+                                    root.findall(".//PreloadData/VideoFile"),
+                                    old_path, new_path, ignore_extensions,
+                                    library=library.matcher(new_path) if library is not None else None,
+                                    path_mapping=path_mapping, path_rules=path_rules,
+                                    media_indexes={} if path_mapping is not None else None)
+    finally:
+        if library is not None:
+            library.close()
+
+def update_path_elements(video_sources, preload_files, old_path, new_path,
+                         ignore_extensions=False, journal=None, progress=None, cancel=None,
+                         media_index=None, library=None, path_mapping=None, path_rules=None,
+                         media_indexes=None):
+    """
+    Update already collected VideoFormatReaderSource and PreloadData/VideoFile
+    elements. Used by update_file_paths and by the single-pass engine, which
+    gathers these elements during its walk instead of searching the tree again.
+    progress (a ProgressReporter) is told how many paths are done; cancel (a
+    CancellationToken) is checked before every path. With ignore_extensions,
+    new_path is listed once (or media_index, its MediaDirectoryIndex, is
+    used) for all paths. library is an optional LibraryMatcher for new_path:
+    paths that would be rebased to a file it does not hold are matched by
+    name anywhere in its folder tree instead.
+
+    With path_mapping the longest matching old folder of the table decides
+    the new path (with ignore_extensions, the new folder is searched for the
+    base name); old_path, new_path, media_index and library are not used.
+    path_rules (a dict) counts the rewritten paths per rule label, and the
+    change manifest names the rule of every path. media_indexes (a dict of
+    folder -> MediaDirectoryIndex) keeps the new folders listed for
+    ignore_extensions; pass the same dict for every call of one conversion.
+    """
+    if path_mapping is not None:
+        return _map_path_elements(video_sources, preload_files, path_mapping, ignore_extensions,
+                                  journal, progress, cancel, path_rules, media_indexes)
+    if not old_path or not new_path:
+        return 0
+    if ignore_extensions and media_index is None:
+        media_index = directory_index(new_path)
+
+    paths_updated = 0
+
+    logger.info("=== UPDATING FILE PATHS ===")
+    logger.info("Old path: %s", old_path)
+    logger.info("New path: %s", new_path)
+    logger.info("Ignore extensions: %s", ignore_extensions)
+
+    def update_value(getter, setter):
+        nonlocal paths_updated
+        file_path = getter()
+        if not file_path:
+            return
+
+        new_file_path = matching_file = None
+        if ignore_extensions:
+            matching_file = find_matching_file(file_path, new_path, ignore_extensions=True,
+                                               index=media_index)
+            if matching_file:
+                new_file_path = matching_file
+            else:
+                new_file_path = _rebase_path(file_path, old_path, new_path)
+        else:
+            new_file_path = _rebase_path(file_path, old_path, new_path)
+        # Paths that were rebased (or, ignoring extensions, any path) but are
+        # not where the rebased path points are looked up in the whole tree
+        if (library is not None and not matching_file and
+                (ignore_extensions or new_file_path != file_path) and
+                not library.contains(new_file_path)):
+            new_file_path = library.match(file_path, ignore_extensions) or new_file_path
+
+        if new_file_path and new_file_path != file_path:
+            setter(new_file_path)
+            paths_updated += 1
+
+    total = len(video_sources) + len(preload_files)
+
+    # Update VideoFormatReaderSource paths
+    for done, video_source in enumerate(video_sources, 1):
+        if cancel is not None:
+            cancel.check()
+        update_value(lambda: video_source.get("fileName"),
+                     lambda v: _set_attr(video_source, "fileName", v, journal))
+        if progress is not None:
+            progress.advance(done, total)
+
+    # Update PreloadData paths
+    for done, preload in enumerate(preload_files, len(video_sources) + 1):
+        if cancel is not None:
+            cancel.check()
+        update_value(lambda: preload.get("value"),
+                     lambda v: _set_attr(preload, "value", v, journal))
+        if progress is not None:
+            progress.advance(done, total)
+
+    logger.info("Updated %d file paths", paths_updated)
+    return paths_updated
+
+def _path_attributes(video_sources, preload_files):
+    """(element, attribute) of every collected path, sources first."""
+    for video_source in video_sources:
+        yield video_source, "fileName"
+    for preload in preload_files:
+        yield preload, "value"
+
+def _map_path_elements(video_sources, preload_files, path_mapping, ignore_extensions=False,
+                       journal=None, progress=None, cancel=None, path_rules=None,
+                       media_indexes=None):
+    """update_path_elements with a PathMapping."""
+    logger.info("=== UPDATING FILE PATHS ===")
+    logger.info("Path mapping: %d rules", len(path_mapping))
+    logger.info("Ignore extensions: %s", ignore_extensions)
+
+    paths_updated = 0
+    unmatched = 0
+    total = len(video_sources) + len(preload_files)
+    manifest = journal if isinstance(journal, ChangeManifest) else None
+    # Every new folder is listed once; a table can name more folders than
+    # the shared directory_index() cache holds
+    if media_indexes is None:
+        media_indexes = {}
+    for done, (elem, attribute) in enumerate(_path_attributes(video_sources, preload_files), 1):
+        if cancel is not None:
+            cancel.check()
+        file_path = elem.get(attribute)
+        if file_path:
+            new_file_path, rule = path_mapping.resolve(file_path)
+            if rule is None:
+                unmatched += 1
+            elif ignore_extensions:
+                # The new folder may use the other platform's separators
+                split = max(new_file_path.rfind("/"), new_file_path.rfind("\\"))
+                if split > 0:
+                    folder = new_file_path[:split]
+                    index = media_indexes.get(folder)
+                    if index is None:
+                        index = media_indexes[folder] = MediaDirectoryIndex.scan(folder)
+                        if not index.exists:
+                            logger.warning("New directory does not exist: %s", folder)
+                    new_file_path = find_matching_file(
+                        new_file_path, folder, ignore_extensions=True, index=index) or new_file_path
+            if new_file_path != file_path:
+                if manifest is not None:
+                    manifest.rule = f"file_path: {rule.label}"
+                _set_attr(elem, attribute, new_file_path, journal)
+                paths_updated += 1
+                if path_rules is not None:
+                    path_rules[rule.label] = path_rules.get(rule.label, 0) + 1
+                logger.debug("%s -> %s (rule %s)", file_path, new_file_path, rule.label)
+        if progress is not None:
+            progress.advance(done, total)
+
+    if unmatched:
+        logger.warning("%d file paths matched no path mapping rule", unmatched)
+    logger.info("Updated %d file paths", paths_updated)
+    return paths_updated
+
+PIXEL_LIKE_THRESHOLD = 100.0
+
+POSITION_PARAM_NAMES = ("Position X", "Position Y", "Anchor X", "Anchor Y", "Anchor Z")
+TEXT_SCALED_PARAM_NAMES = ("FontSize", "Size", "LineHeight", "CharacterSpacing",
+                           "LineSpacing", "Position X", "Position Y")
+TEXT_COMPONENT_TYPES = ("TextBlock", "TextEffect", "TextGenerator", "BlockTextGenerator")
+# Effects whose position params are handled by dedicated rules
+EXCLUDED_EFFECT_TYPES = frozenset(("TransformEffect",) + TEXT_COMPONENT_TYPES)
+ALWAYS_PIXEL_EFFECT_TYPES = frozenset(("ScreenLayerTransform",))
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp')
+
+def _is_pixel_like_value(raw_value):
+    try:
+        return abs(float(raw_value)) >= PIXEL_LIKE_THRESHOLD
+    except (TypeError, ValueError):
+        return False
+
+class ChangeJournal:
+    """
+    Remembers the original value of every attribute the converter rewrites,
+    so writers can emit only the changes and callers can undo them.
+    """
+
+    def __init__(self):
+        self.originals = {}
+
+    def record(self, elem, name, value=None):
+        key = (elem, name)
+        if key not in self.originals:
+            self.originals[key] = elem.get(name)
+
+    def changes(self):
+        """Yield (element, attribute, original, current) for changed attributes."""
+        for (elem, name), original in self.originals.items():
+            current = elem.get(name)
+            if current != original:
+                yield elem, name, original, current
+
+    def rollback(self):
+        """Restore every recorded attribute to its original value."""
+        for (elem, name), original in self.originals.items():
+            if original is None:
+                elem.attrib.pop(name, None)
+            else:
+                elem.set(name, original)
+        self.originals.clear()
+
+class ChangeManifest:
+    """
+    Writes one JSON line per attribute the converter rewrites, as it happens,
+    so nothing accumulates in memory. Each record holds the rule that fired,
+    the element that owns the change (its tag and uniqueId), the changed
+    element's tag and name, the attribute, and the old and new values.
+
+    Records come out in conversion order with fixed keys and no timestamps,
+    so the manifests of two runs can be compared with a plain diff.
+    Writes that leave a value unchanged are not recorded.
+    """
+
+    def __init__(self, out):
+        self.out = out
+        self.journal = None
+        self.rule = None
+        self.owner = None
+        self.count = 0
+
+    def record(self, elem, name, value):
+        if self.journal is not None:
+            self.journal.record(elem, name, value)
+        old = elem.get(name)
+        if old == value:
+            return
+        owner = self.owner
+        self.out.write(json.dumps({
+            "rule": self.rule,
+            "owner": owner.tag if owner is not None else None,
+            "uniqueId": owner.get("uniqueId") if owner is not None else None,
+            "element": elem.tag,
+            "name": elem.get("name"),
+            "attribute": name,
+            "old": old,
+            "new": value,
+        }, ensure_ascii=False) + "\n")
+        self.count += 1
+
+def _set_attr(elem, name, value, journal=None):
+    if journal is not None:
+        journal.record(elem, name, value)
+    elem.set(name, value)
+
+def _scale_value_range_if_pixel_like(param_range, resolution_factor, journal=None):
+    """Scale ValueRange min/max bounds only when they look pixel-based."""
+    for value_range in param_range.findall("./ValueRange"):
+        min_raw = value_range.get("min")
+        max_raw = value_range.get("max")
+        if not _is_pixel_like_value(min_raw) and not _is_pixel_like_value(max_raw):
+            continue
+        try:
+            if min_raw is not None:
+                _set_attr(value_range, "min", str(float(min_raw) * resolution_factor), journal)
+            if max_raw is not None:
+                _set_attr(value_range, "max", str(float(max_raw) * resolution_factor), journal)
+        except ValueError:
+            continue
+
+def _scale_all_value_ranges(param_range, resolution_factor, journal=None):
+    """Scale all ValueRange min/max bounds regardless of threshold."""
+    for value_range in param_range.findall("./ValueRange"):
+        min_raw = value_range.get("min")
+        max_raw = value_range.get("max")
+        try:
+            if min_raw is not None:
+                _set_attr(value_range, "min", str(float(min_raw) * resolution_factor), journal)
+            if max_raw is not None:
+                _set_attr(value_range, "max", str(float(max_raw) * resolution_factor), journal)
+        except ValueError:
+            continue
+
+def _get_effect_policy_path():
+    system = platform.system()
+    if system == "Windows":
+        base = os.getenv("LOCALAPPDATA") or os.getenv("APPDATA") or os.path.expanduser("~")
+        return os.path.join(base, "Resolume Composition Converter", "effect_position_policy.json")
+    if system == "Darwin":
+        base = os.path.expanduser("~/Library/Application Support")
+        return os.path.join(base, "Resolume Composition Converter", "effect_position_policy.json")
+    base = os.getenv("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
+    return os.path.join(base, "resolume-composition-converter", "effect_position_policy.json")
+
+def load_effect_position_policy():
+    path = _get_effect_policy_path()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+            if isinstance(data, dict):
+                return data
+    except (FileNotFoundError, json.JSONDecodeError, OSError):
+        pass
+    return {}
+
+def save_effect_position_policy(policy):
+    path = _get_effect_policy_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(policy, f, indent=2, sort_keys=True)
+    except OSError as e:
+        logger.warning("Could not save effect position policy: %s", e)
+
+def _position_param(render_pass):
+    """The first position/anchor ParamRange in the Params of render_pass, or None."""
+    params_node = render_pass.find("./Params")
+    if params_node is None:
+        return None
+    for param in params_node.findall(".//ParamRange"):
+        if param.get("name") in POSITION_PARAM_NAMES:
+            return param
+    return None
+
+def _iter_render_passes_streaming(input_file):
+    """
+    Yield every RenderPass of input_file once it has been parsed, dropping
+    the sections of the document that have been read (as CompositionStream
+    does) so memory use stays bounded.
+    """
+    stack = []
+    for event, elem in ET.iterparse(input_file, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            continue
+        stack.pop()
+        if elem.tag == "RenderPass":
+            yield elem
+        if len(stack) == 1 or (len(stack) == 2 and stack[-1].tag == "Deck"):
+            stack[-1].remove(elem)
+
+def scan_unknown_position_effects(input_file, policy, xml_backend=None, index=None, streaming=False):
+    """
+    Find non-transform/non-text effects that expose position/anchor params and
+    do not yet have an explicit policy entry.
+
+    input_file may be a path or a ParsedComposition. index is a
+    CompositionIndex of the already parsed input_file; without one the file
+    is parsed and indexed here, or with streaming=True read section by
+    section without keeping the document in memory.
+    """
+    if index is None and isinstance(input_file, ParsedComposition):
+        index = input_file.index
+    if index is not None or not streaming:
+        if index is None:
+            index = CompositionIndex.build(parse_xml(input_file, xml_backend).getroot())
+        render_passes = (render_pass for render_passes in index.by_type.values()
+                         for render_pass in render_passes)
+    else:
+        render_passes = _iter_render_passes_streaming(input_file)
+
+    unknown = {}
+
+    for render_pass in render_passes:
+        effect_type = render_pass.get("type")
+        if (not effect_type or
+            effect_type in EXCLUDED_EFFECT_TYPES or
+            effect_type in ALWAYS_PIXEL_EFFECT_TYPES or
+            effect_type in policy):
+            continue
+
+        param = _position_param(render_pass)
+        if param is None:
+            continue
+
+        current = unknown.get(effect_type)
+        if current is None:
+            unknown[effect_type] = {
+                "count": 1,
+                "sample_value": param.get("value", ""),
+            }
+        else:
+            current["count"] += 1
+
+    return unknown
+
+
+# ----------------------
+#   SINGLE-PASS ENGINE
+# ----------------------
+
+# Elements that delimit a scope for CompositionIndex.scope_of()
+SCOPE_TAGS = ("Clip", "Layer", "Group", "Deck")
+
+class CompositionIndex:
+    """
+    Lookup tables for a parsed composition: uniqueId -> element, RenderPass
+    type -> elements, tag -> elements, and element -> parent / enclosing
+    Clip, Layer, Group or Deck (the root for top-level elements). Element
+    lists are in document order.
+
+    The tag and uniqueId tables are filled while the tree is walked (by
+    build() or by a CompositionVisitor); the type, parent and scope tables are
+    derived on first use.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.by_unique_id = {}
+        self.by_tag = defaultdict(list)
+        self._by_type = None
+        self._parents = None
+        self._scopes = {}
+
+    @classmethod
+    def build(cls, root):
+        """Index root and all its descendants."""
+        index = cls(root)
+        for elem in root.iter():
+            index.add(elem)
+        return index
+
+    def add(self, elem):
+        self.by_tag[elem.tag].append(elem)
+        unique_id = elem.get("uniqueId")
+        if unique_id is not None and unique_id not in self.by_unique_id:
+            self.by_unique_id[unique_id] = elem
+
+    def element_by_id(self, unique_id):
+        """The first element with this uniqueId, or None."""
+        return self.by_unique_id.get(unique_id)
+
+    def with_tag(self, tag):
+        return self.by_tag.get(tag, [])
+
+    @property
+    def by_type(self):
+        if self._by_type is None:
+            self._by_type = defaultdict(list)
+            for render_pass in self.with_tag("RenderPass"):
+                effect_type = render_pass.get("type")
+                if effect_type is not None:
+                    self._by_type[effect_type].append(render_pass)
+        return self._by_type
+
+    def with_type(self, effect_type):
+        """RenderPass elements of the given effect type."""
+        return self.by_type.get(effect_type, [])
+
+    @property
+    def parents(self):
+        if self._parents is None:
+            parents = {self.root: None}
+            for parent in self.root.iter():
+                parents.update(dict.fromkeys(parent, parent))
+            self._parents = parents
+        return self._parents
+
+    def parent_of(self, elem):
+        return self.parents.get(elem)
+
+    def scope_of(self, elem):
+        """The nearest enclosing Clip, Layer, Group or Deck, else the root."""
+        scope = self._scopes.get(elem)
+        if scope is None:
+            parent = self.parent_of(elem)
+            if parent is None:
+                return None
+            if parent.tag in SCOPE_TAGS or parent is self.root:
+                scope = parent
+            else:
+                scope = self.scope_of(parent)
+            self._scopes[elem] = scope
+        return scope
+
+
+class CompositionVisitor:
+    """
+    Walk a composition tree exactly once and collect the elements every
+    conversion rule needs.
+
+    Handlers are dispatched by tag (and by RenderPass type). The visitor keeps
+    a stack of the composition/group/layer/clip scopes it is inside, so rules
+    that used to re-search each container with findall() get their elements
+    handed to them during the walk instead. Everything is collected in
+    document order, which keeps the results identical to the old multi-pass
+    implementation.
+
+    With cancel (a CancellationToken) the walk stops at the next deck or
+    clip once the token is cancelled.
+    """
+
+    def __init__(self, root, index=None, cancel=None):
+        self.root = root
+        self.index = index
+        self.cancel = cancel
+
+        self.comp_info = None
+        self.name_param = None
+        self.top_dims = None
+        self.comp_transforms = []
+        self.layers = []
+        self.groups = []
+        self.clips = []
+        self.text_components = {effect_type: [] for effect_type in TEXT_COMPONENT_TYPES}
+        self.position_effects = []
+        self.transforms = []
+        self.video_sources = []
+        self.preload_files = []
+
+        # Walk state
+        self._path = []
+        self._containers = []
+        self._clip_scope = []
+        self._deck_scope = []
+        self._transform_scope = []
+        self._text_scope = []
+        self._effect_scope = []
+        self._dims_scope = []
+        self._dims_by_params = {}
+        self._effect_by_params = {}
+
+        self._handlers = {
+            "CompositionInfo": self._enter_composition_info,
+            "Layer": self._enter_layer,
+            "Group": self._enter_group,
+            "Deck": self._enter_deck,
+            "Clip": self._enter_clip,
+            "VideoTrack": self._enter_video_track,
+            "Params": self._enter_params,
+            "Param": self._enter_param,
+            "ParamRange": self._enter_param_range,
+            "RenderPass": self._enter_render_pass,
+            "PrimarySource": self._enter_primary_source,
+            "VideoFormatReaderSource": self._enter_video_format_reader_source,
+            "VideoFile": self._enter_video_file,
+        }
+
+    def walk(self):
+        """Visit every element below the root once. Returns self."""
+        if self.index is not None:
+            self.index.add(self.root)
+        ancestors = (self.root,)
+        for child in self.root:
+            self.walk_subtree(child, ancestors)
+        return self
+
+    def walk_subtree(self, elem, ancestors):
+        """
+        Visit elem and its descendants. ancestors is the chain of elements from
+        the root down to elem's parent, so rules that depend on position (for
+        example the composition-level transforms) still apply when only part
+        of the document is in memory.
+        """
+        self._path[:] = ancestors
+        self._visit(elem)
+        self._path.clear()
+        self._dims_by_params.clear()
+        self._effect_by_params.clear()
+        return self
+
+    def _visit(self, elem):
+        if self.index is not None:
+            self.index.add(elem)
+        handler = self._handlers.get(elem.tag)
+        scopes = handler(elem) if handler is not None else None
+        self._path.append(elem)
+        for child in elem:
+            self._visit(child)
+        self._path.pop()
+        if scopes:
+            for scope in scopes:
+                scope.pop()
+
+    # --- Scope handlers ---
+
+    def _enter_composition_info(self, elem):
+        if self.comp_info is None:
+            self.comp_info = elem
+        return None
+
+    def _enter_container(self, elem, records):
+        record = {"element": elem, "dims": None, "transforms": []}
+        records.append(record)
+        self._containers.append(record)
+        return record
+
+    def _enter_layer(self, elem):
+        self._enter_container(elem, self.layers)
+        return (self._containers,)
+
+    def _enter_group(self, elem):
+        self._enter_container(elem, self.groups)
+        return (self._containers,)
+
+    def _enter_deck(self, elem):
+        if self.cancel is not None:
+            self.cancel.check()
+        self._deck_scope.append(elem)
+        return (self._deck_scope,)
+
+    def _enter_clip(self, elem):
+        if self.cancel is not None:
+            self.cancel.check()
+        record = self._enter_container(elem, self.clips)
+        record["video_source"] = None
+        record["position"] = None
+        record["primary_source"] = None
+        record["deck"] = self._deck_scope[-1] if self._deck_scope else None
+        self._clip_scope.append(record)
+        return (self._containers, self._clip_scope)
+
+    def _dims_record(self, params):
+        record = self._dims_by_params.get(params)
+        if record is None:
+            record = {"width": None, "height": None}
+            self._dims_by_params[params] = record
+        return record
+
+    def _enter_video_track(self, elem):
+        # Mirrors container.find(".//VideoTrack/Params"): the first VideoTrack
+        # in document order that has a Params child.
+        params = elem.find("Params")
+        if params is None:
+            return None
+        if len(self._path) == 1 and self.top_dims is None:
+            self.top_dims = self._dims_record(params)
+        for container in self._containers:
+            if container["dims"] is None:
+                container["dims"] = self._dims_record(params)
+        return None
+
+    def _enter_primary_source(self, elem):
+        for clip in self._clip_scope:
+            if clip["primary_source"] is None:
+                clip["primary_source"] = elem.find("VideoSource")
+        return None
+
+    def _enter_video_format_reader_source(self, elem):
+        self.video_sources.append(elem)
+        for clip in self._clip_scope:
+            if clip["video_source"] is None:
+                clip["video_source"] = elem
+        return None
+
+    def _enter_video_file(self, elem):
+        if self._path[-1].tag == "PreloadData":
+            self.preload_files.append(elem)
+        return None
+
+    # --- Parameter handlers ---
+
+    def _enter_params(self, elem):
+        scopes = []
+        dims = self._dims_by_params.get(elem)
+        if dims is not None:
+            self._dims_scope.append(dims)
+            scopes.append(self._dims_scope)
+        effect = self._effect_by_params.get(elem)
+        if effect is not None:
+            self._effect_scope.append(effect)
+            scopes.append(self._effect_scope)
+        return scopes
+
+    def _enter_param(self, elem):
+        for text in self._text_scope:
+            text["params"].append(elem)
+        if (self.name_param is None and
+            elem.get("name") == "Name" and elem.get("T") == "STRING"):
+            self.name_param = elem
+        return None
+
+    def _enter_param_range(self, elem):
+        name = elem.get("name")
+        for text in self._text_scope:
+            text["ranges"].append(elem)
+        if name in POSITION_PARAM_NAMES:
+            for transform in self._transform_scope:
+                transform["params"].append(elem)
+            for effect in self._effect_scope:
+                effect["params"].append(elem)
+        elif name == "Width" or name == "Height":
+            key = "width" if name == "Width" else "height"
+            for dims in self._dims_scope:
+                if dims[key] is None:
+                    dims[key] = elem
+        elif name == "Position":
+            for clip in self._clip_scope:
+                if clip["position"] is None:
+                    clip["position"] = elem
+        return None
+
+    def _enter_render_pass(self, elem):
+        effect_type = elem.get("type", "")
+        scopes = []
+
+        if effect_type == "TransformEffect":
+            record = {"element": elem, "params": []}
+            self.transforms.append(record)
+            path = self._path
+            # Mirrors ".//VideoTrack/RenderPass/RenderPass[@type='TransformEffect']"
+            if (len(path) >= 3 and path[-1].tag == "RenderPass" and
+                path[-2].tag == "VideoTrack"):
+                if len(path) == 3:
+                    self.comp_transforms.append(record)
+                for container in self._containers:
+                    container["transforms"].append(record)
+            self._transform_scope.append(record)
+            scopes.append(self._transform_scope)
+        elif effect_type in TEXT_COMPONENT_TYPES:
+            record = {"element": elem, "params": [], "ranges": []}
+            self.text_components[effect_type].append(record)
+            self._text_scope.append(record)
+            scopes.append(self._text_scope)
+
+        if effect_type not in EXCLUDED_EFFECT_TYPES:
+            params = elem.find("Params")
+            if params is not None:
+                record = {"element": elem, "type": effect_type, "params": []}
+                self.position_effects.append(record)
+                self._effect_by_params[params] = record
+
+        return scopes
+
+
+def _phase_function(trackers):
+    """A phase(name) context manager that enters the phase of every tracker."""
+    if not trackers:
+        return no_phase
+    if len(trackers) == 1:
+        return trackers[0].phase
+
+    @contextmanager
+    def phase(name):
+        with trackers[0].phase(name), trackers[1].phase(name):
+            yield
+    return phase
+
+
+def _clip_item(clip):
+    """Where a clip sits, for progress events."""
+    elem = clip["element"]
+    deck = clip["deck"]
+    return {
+        "deck": deck.get("deckIndex") if deck is not None else None,
+        "layer": elem.get("layerIndex"),
+        "column": elem.get("columnIndex"),
+        "clip": elem.get("uniqueId"),
+    }
+
+
+class CompositionConverter:
+    """
+    Apply the conversion rules to the elements gathered by a CompositionVisitor.
+
+    Rules run in the same order as the original adjust_composition so any
+    element reached by more than one rule ends up with the same value.
+    """
+
+    def __init__(self, old_path=None, new_path=None, resolution_factor=2.0,
+                 framerate_factor=2.4, new_name=None, ignore_extensions=False,
+                 effect_position_policy=None, journal=None, metrics=None, manifest=None,
+                 progress=None, cancel=None, search_subfolders=False, path_mapping=None):
+        self.old_path = old_path
+        self.new_path = new_path
+        self.resolution_factor = resolution_factor
+        self.framerate_factor = framerate_factor
+        self.new_name = new_name
+        self.ignore_extensions = ignore_extensions
+        self.effect_position_policy = effect_position_policy or {}
+        self.journal = journal
+        # A ChangeManifest sees every write (and passes it on to the journal)
+        self.manifest = manifest
+        if manifest is not None:
+            manifest.journal = journal
+        self.recorder = manifest if manifest is not None else journal
+        # A PhaseMetrics, or None to measure nothing
+        self.metrics = metrics
+        # A ProgressReporter, or None to report nothing
+        self.progress = progress
+        self.phase = _phase_function([tracker for tracker in (metrics, progress) if tracker is not None])
+        # A CancellationToken, checked for every section, clip and path
+        self.cancel = cancel
+        # The listing of new_path for ignore_extensions, made once per conversion
+        self.media_index = None
+        # With path_mapping, the listings of the new folders (folder -> index)
+        self.media_indexes = {}
+        # Look up missing media in the whole tree under new_path (MediaLibrary);
+        # the library is opened on first use and closed by close()
+        self.search_subfolders = search_subfolders
+        self.library = None
+        self._media_library = None
+        # Many old -> new folders (PathMapping) in place of old_path/new_path
+        self.path_mapping = path_mapping
+        # Per-element debug messages are only built when DEBUG is enabled;
+        # refreshed at the start of every apply()
+        self.debug = False
+        self.orig_comp_w = None
+        self.orig_comp_h = None
+        self.comp_info_seen = False
+        self.name_param_seen = False
+        self.top_dims_seen = False
+        self.comp_name = None
+        self.processed_transform_ids = set()
+        self.stats = {
+            "clips_modified": 0,
+            "transforms_adjusted": 0,
+            "transforms_processed": 0,
+            "durations_adjusted": 0,
+            "paths_updated": 0,
+            "custom_durations_preserved": 0,
+            "text_components_found": 0,
+            "position_ranges_adjusted": 0,
+        }
+
+    def convert(self, root, index=None):
+        """
+        Walk root once, apply every rule and return the stats counters. When
+        index (a CompositionIndex) is given it is filled during the same walk.
+        """
+        with self.phase("walk"):
+            visitor = CompositionVisitor(root, index, self.cancel).walk()
+        return self.apply(root, visitor)
+
+    def convert_subtrees(self, root, subtrees):
+        """
+        Convert only the given (element, ancestors) pairs of a partially loaded
+        document. State such as the original composition size and the
+        processed transform ids carries over between calls.
+        """
+        with self.phase("walk"):
+            visitor = CompositionVisitor(root, cancel=self.cancel)
+            for elem, ancestors in subtrees:
+                visitor.walk_subtree(elem, ancestors)
+        return self.apply(root, visitor)
+
+    def close(self):
+        """Close the media library this converter opened for search_subfolders."""
+        if self._media_library is not None:
+            self._media_library.close()
+            self._media_library = None
+        self.library = None
+
+    def apply(self, root, visitor):
+        """Apply every rule to the elements collected by visitor."""
+        self.debug = logger.isEnabledFor(logging.DEBUG)
+        if self.cancel is not None:
+            self.cancel.check()
+
+        if self.debug:
+            for effect_type in TEXT_COMPONENT_TYPES:
+                logger.debug("Found %d %s components", len(visitor.text_components[effect_type]), effect_type)
+
+        with self.phase("transforms"):
+            self.apply_composition_info(root, visitor)
+            if visitor.top_dims is not None and not self.top_dims_seen:
+                self.top_dims_seen = True
+                self._rule("dimensions", root)
+                self.apply_dimensions(visitor.top_dims)
+
+            logger.info("Found %d total transforms in the composition using general pattern", len(visitor.transforms))
+            logger.info("Found %d transforms at composition level", len(visitor.comp_transforms))
+            self.apply_transforms(visitor.comp_transforms, "composition")
+
+            for layer in visitor.layers:
+                self._rule("dimensions", layer["element"])
+                self.apply_dimensions(layer["dims"])
+                if self.debug:
+                    logger.debug("Found %d transforms in layer", len(layer["transforms"]))
+                self.apply_transforms(layer["transforms"], "layer")
+
+            for group in visitor.groups:
+                self._rule("dimensions", group["element"])
+                self.apply_dimensions(group["dims"])
+                if self.debug:
+                    logger.debug("Found %d transforms in group", len(group["transforms"]))
+                self.apply_transforms(group["transforms"], "group")
+
+        with self.phase("text"):
+            for effect_type in TEXT_COMPONENT_TYPES:
+                for component in visitor.text_components[effect_type]:
+                    self.apply_text_component(effect_type, component)
+
+        with self.phase("position_effects"):
+            for effect in visitor.position_effects:
+                self.apply_position_effect(effect)
+
+        # Clip durations are charged to their own phase inside apply_clip
+        with self.phase("transforms"):
+            progress = self.progress
+            cancel = self.cancel
+            total = len(visitor.clips)
+            for done, clip in enumerate(visitor.clips, 1):
+                if cancel is not None:
+                    cancel.check()
+                self.apply_clip(clip)
+                if progress is not None and progress.due(done, total):
+                    progress.report(done, total, _clip_item(clip))
+
+            self.apply_missed_transforms(visitor.transforms)
+
+        if self.path_mapping is not None:
+            self._rule("file_path")
+            with self.phase("paths"):
+                self.stats["paths_updated"] += update_path_elements(
+                    visitor.video_sources, visitor.preload_files, None, None,
+                    self.ignore_extensions, self.recorder, self.progress, self.cancel,
+                    path_mapping=self.path_mapping,
+                    path_rules=self.stats.setdefault("path_rules", {}),
+                    media_indexes=self.media_indexes)
+        elif self.old_path and self.new_path:
+            self._rule("file_path")
+            with self.phase("paths"):
+                if self.ignore_extensions and self.media_index is None:
+                    self.media_index = directory_index(self.new_path)
+                if self.search_subfolders and self.library is None:
+                    if self._media_library is None:
+                        self._media_library = MediaLibrary()
+                    self.library = self._media_library.matcher(self.new_path, self.cancel)
+                self.stats["paths_updated"] += update_path_elements(
+                    visitor.video_sources, visitor.preload_files,
+                    self.old_path, self.new_path, self.ignore_extensions, self.recorder,
+                    self.progress, self.cancel, self.media_index, self.library)
+
+        return self.stats
+
+    # --- Rules ---
+
+    def _rule(self, rule, owner=None):
+        """Tell the manifest which rule makes the following changes, and for which element."""
+        if self.manifest is not None:
+            self.manifest.rule = rule
+            self.manifest.owner = owner
+
+    def apply_composition_info(self, root, visitor):
+        self._rule("composition_info", root)
+        comp_info = visitor.comp_info
+        if comp_info is not None and not self.comp_info_seen:
+            self.comp_info_seen = True
+            factor = self.resolution_factor
+            old_comp_w = int(comp_info.get("width"))
+            old_comp_h = int(comp_info.get("height"))
+            self.orig_comp_w = old_comp_w
+            self.orig_comp_h = old_comp_h
+            _set_attr(comp_info, "width", str(int(old_comp_w * factor)), self.recorder)
+            _set_attr(comp_info, "height", str(int(old_comp_h * factor)), self.recorder)
+
+            # Use the new composition name if provided, otherwise keep the existing name
+            self.comp_name = self.new_name if self.new_name else comp_info.get("name")
+            _set_attr(comp_info, "name", self.comp_name, self.recorder)
+            _set_attr(root, "name", self.comp_name, self.recorder)
+
+        # Only the first Name param in the document follows the composition name
+        if visitor.name_param is not None and not self.name_param_seen:
+            self.name_param_seen = True
+            if self.comp_info_seen:
+                _set_attr(visitor.name_param, "value", self.comp_name, self.recorder)
+
+    def apply_dimensions(self, dims):
+        """Scale the Width/Height ParamRanges of a VideoTrack's Params."""
+        if dims is None:
+            return
+        for param in (dims["width"], dims["height"]):
+            if param is not None:
+                old_val = float(param.get("value"))
+                _set_attr(param, "value", str(int(old_val * self.resolution_factor)), self.recorder)
+
+    def _scale_transform(self, transform, is_image_clip=False):
+        for param in transform["params"]:
+            old_val = float(param.get("value"))
+            new_val = old_val * self.resolution_factor
+            _set_attr(param, "value", str(new_val), self.recorder)
+            self.stats["transforms_adjusted"] += 1
+            if self.debug:
+                logger.debug("  Adjusted %s from %s to %s", param.get("name"), old_val, new_val)
+                if is_image_clip:
+                    logger.debug("IMAGE: Adjusted %s for image clip from %s to %s", param.get("name"), old_val, new_val)
+
+    def apply_transforms(self, transforms, scope_name):
+        for transform_count, transform in enumerate(transforms, 1):
+            self.stats["transforms_processed"] += 1
+            transform_id = transform["element"].get("uniqueId", None)
+            if transform_id:
+                self.processed_transform_ids.add(transform_id)
+            if self.debug:
+                logger.debug("Processing %s transform %d (ID: %s)", scope_name, transform_count, transform_id)
+            self._rule(f"{scope_name}_transform", transform["element"])
+            self._scale_transform(transform)
+
+    def apply_text_component(self, text_component_type, component):
+        factor = self.resolution_factor
+        self.stats["text_components_found"] += 1
+        self._rule("text_component", component["element"])
+        params = component["params"] + component["ranges"]
+        if self.debug:
+            logger.debug("Processing %s component (ID: %s)", text_component_type,
+                         component["element"].get("uniqueId", "unknown"))
+            logger.debug("Found %d parameters for %s", len(params), text_component_type)
+        for param in params:
+            param_name = param.get("name", "unnamed")
+            param_value = param.get("value", "no-value")
+            if self.debug:
+                logger.debug("%s param: %s (Type: %s, Value: %s)", text_component_type, param_name,
+                             param.get("T", param.get("type", "unknown")), param_value)
+
+            if param_name in TEXT_SCALED_PARAM_NAMES:
+                try:
+                    old_val = float(param_value)
+                    new_val = old_val * factor
+                    if self.debug:
+                        logger.debug("Scaling text parameter %s from %s to %s", param_name, old_val, new_val)
+                    _set_attr(param, "value", str(new_val), self.recorder)
+                except (ValueError, TypeError) as e:
+                    logger.debug("Error scaling text parameter %s: %s", param_name, e)
+
+            if param_name in POSITION_PARAM_NAMES:
+                _scale_value_range_if_pixel_like(param, factor, self.recorder)
+
+    def apply_position_effect(self, effect):
+        """Non-transform effects that also expose position/anchor params."""
+        factor = self.resolution_factor
+        effect_type = effect["type"]
+        is_always_pixel = effect_type in ALWAYS_PIXEL_EFFECT_TYPES
+        policy_mode = self.effect_position_policy.get(effect_type)
+        self._rule("position_effect", effect["element"])
+        for param in effect["params"]:
+            raw_value = param.get("value")
+            should_convert = (
+                is_always_pixel or
+                policy_mode == "convert" or
+                (policy_mode is None and _is_pixel_like_value(raw_value))
+            )
+            if should_convert:
+                try:
+                    old_val = float(raw_value)
+                    new_val = old_val * factor
+                    _set_attr(param, "value", str(new_val), self.recorder)
+                    self.stats["transforms_adjusted"] += 1
+                    self.stats["position_ranges_adjusted"] += 1
+                    if self.debug:
+                        logger.debug("Adjusted %s %s from %s to %s", effect_type, param.get("name"), old_val, new_val)
+                except ValueError:
+                    pass
+
+            if is_always_pixel or policy_mode == "convert":
+                _scale_all_value_ranges(param, factor, self.recorder)
+            elif policy_mode != "skip":
+                _scale_value_range_if_pixel_like(param, factor, self.recorder)
+
+    def apply_clip(self, clip):
+        self.stats["clips_modified"] += 1  # Count all clips, including generators and routers
+        transforms = clip["transforms"]
+        debug = self.debug
+        if debug:
+            logger.debug("Found %d transforms in clip", len(transforms))
+
+        is_image_clip = False
+        video_source = clip["video_source"]
+        if video_source is not None:
+            file_path = video_source.get("fileName", "")
+            if file_path.lower().endswith(IMAGE_EXTENSIONS):
+                is_image_clip = True
+                if debug:
+                    self._log_image_clip(file_path, clip["dims"])
+
+        for transform_count, transform in enumerate(transforms, 1):
+            self.stats["transforms_processed"] += 1
+            element = transform["element"]
+            transform_id = element.get("uniqueId", None)
+            if transform_id:
+                self.processed_transform_ids.add(transform_id)
+            if debug:
+                logger.debug("Processing clip transform %d (ID: %s)", transform_count, transform_id)
+                if is_image_clip:
+                    self._log_image_transform(element, transform_id)
+
+            self._rule("clip_transform", element)
+            self._scale_transform(transform, is_image_clip)
+
+        clip_element = clip["element"]
+        with self.phase("durations"):
+            self._rule("clip_duration", clip_element)
+            self.apply_clip_duration(clip["position"])
+        self._rule("dimensions", clip_element)
+        self.apply_dimensions(clip["dims"])
+        self._rule("primary_source", clip_element)
+        self.apply_primary_source(clip)
+
+    def _log_image_clip(self, file_path, dims):
+        logger.debug("IMAGE: Processing transforms for image clip: %s", file_path)
+        if dims is not None and dims["width"] is not None and dims["height"] is not None:
+            try:
+                width_val = float(dims["width"].get("value"))
+                height_val = float(dims["height"].get("value"))
+                logger.debug("IMAGE: Clip dimensions: %sx%s", width_val, height_val)
+            except (ValueError, TypeError):
+                logger.debug("IMAGE: Could not parse clip dimensions")
+
+    def _log_image_transform(self, element, transform_id):
+        logger.debug("IMAGE: Transform parameters for image clip (ID: %s):", transform_id)
+        for p in element.iter("ParamRange"):
+            if p is not element:
+                logger.debug("IMAGE:   %s = %s", p.get("name"), p.get("value"))
+
+        # Images keep their Scale; it is only reported
+        scale_param = element.find(".//ParamRange[@name='Scale']")
+        if scale_param is not None:
+            try:
+                old_val = float(scale_param.get("value"))
+                logger.debug("IMAGE: Found Scale parameter with value %s", old_val)
+                logger.debug("IMAGE: Scale parameter would change from %s to %s",
+                             old_val, old_val * self.resolution_factor)
+            except (ValueError, TypeError) as e:
+                logger.debug("IMAGE: Error parsing Scale parameter: %s", e)
+
+    def _scale_phase_duration(self, position_param):
+        phase_source = position_param.find("PhaseSourceTransportTimeline")
+        if phase_source is not None and phase_source.get("defaultMillisecondsDuration"):
+            try:
+                old_ms = float(phase_source.get("defaultMillisecondsDuration"))
+                new_ms = old_ms * self.framerate_factor
+                _set_attr(phase_source, "defaultMillisecondsDuration", str(new_ms), self.recorder)
+                self.stats["durations_adjusted"] += 1
+            except ValueError:
+                logger.warning("Could not convert defaultMillisecondsDuration to float.")
+
+    def apply_clip_duration(self, position_param):
+        """Keep TIMELINE (seconds) durations, scale BPM (beats) durations."""
+        if position_param is None:
+            return
+        duration_source = position_param.find("DurationSource")
+        if duration_source is None:
+            # No DurationSource, but maybe there's a PhaseSourceTransportTimeline
+            self._scale_phase_duration(position_param)
+            return
+
+        default_duration = duration_source.get("defaultDuration", "")
+        if default_duration.endswith("s"):
+            if duration_source.get("duration", None):
+                self.stats["custom_durations_preserved"] += 1
+            self.stats["durations_adjusted"] += 1
+        elif default_duration.endswith("b"):
+            self._scale_phase_duration(position_param)
+        else:
+            logger.info("defaultDuration '%s' is not 's' or 'b'. Skipping.", default_duration)
+
+    def _set_fallback_resolution(self, primary_source):
+        factor = self.resolution_factor
+        fallback_w = self.orig_comp_w if self.orig_comp_w is not None else 1920
+        fallback_h = self.orig_comp_h if self.orig_comp_h is not None else 1080
+        _set_attr(primary_source, "width", str(int(fallback_w * factor)), self.recorder)
+        _set_attr(primary_source, "height", str(int(fallback_h * factor)), self.recorder)
+
+    def apply_primary_source(self, clip):
+        """Update the PrimarySource resolution based on source type."""
+        factor = self.resolution_factor
+        primary_source = clip["primary_source"]
+        if primary_source is None:
+            return
+
+        source_type = primary_source.get("type", "")
+        if source_type == "VideoFormatReaderSource":
+            is_image = False
+            video_source = clip["video_source"]
+            if video_source is not None:
+                file_path = video_source.get("fileName", "")
+                if file_path.lower().endswith(IMAGE_EXTENSIONS):
+                    is_image = True
+                    logger.debug("Detected image file: %s", file_path)
+
+            if is_image:
+                # For images, preserve the original aspect ratio by scaling both dimensions
+                try:
+                    current_width = int(primary_source.get("width"))
+                    current_height = int(primary_source.get("height"))
+                    aspect_ratio = current_width / current_height
+                    if self.debug:
+                        logger.debug("IMAGE: Processing image with dimensions %dx%d", current_width, current_height)
+                        logger.debug("IMAGE: Aspect ratio: %.2f", aspect_ratio)
+                        if aspect_ratio > 2.0 or aspect_ratio < 0.5:
+                            logger.debug("IMAGE: Unusual aspect ratio detected: %.2f", aspect_ratio)
+
+                    new_width = int(current_width * factor)
+                    new_height = int(current_height * factor)
+                    _set_attr(primary_source, "width", str(new_width), self.recorder)
+                    _set_attr(primary_source, "height", str(new_height), self.recorder)
+                    logger.debug("Preserving image aspect ratio: %dx%d -> %dx%d",
+                                 current_width, current_height, new_width, new_height)
+                except (ValueError, TypeError) as e:
+                    logger.debug("IMAGE: Error parsing image dimensions: %s", e)
+                    self._set_fallback_resolution(primary_source)
+            else:
+                # For videos, scale existing dimensions when available
+                try:
+                    if "width" in primary_source.attrib and "height" in primary_source.attrib:
+                        current_width = int(primary_source.get("width"))
+                        current_height = int(primary_source.get("height"))
+                        _set_attr(primary_source, "width", str(int(current_width * factor)), self.recorder)
+                        _set_attr(primary_source, "height", str(int(current_height * factor)), self.recorder)
+                    else:
+                        raise ValueError("Missing width/height")
+                except (ValueError, TypeError):
+                    self._set_fallback_resolution(primary_source)
+        elif "width" in primary_source.attrib and "height" in primary_source.attrib:
+            # Generator/router clips: scale when the values parse, otherwise leave as is
+            try:
+                current_width = int(primary_source.get("width"))
+                current_height = int(primary_source.get("height"))
+                _set_attr(primary_source, "width", str(int(current_width * factor)), self.recorder)
+                _set_attr(primary_source, "height", str(int(current_height * factor)), self.recorder)
+            except (ValueError, TypeError):
+                pass
+
+    def apply_missed_transforms(self, transforms):
+        """Final sweep for transforms that no structural rule reached."""
+        logger.info("Final check: Found %d total transforms in the composition", len(transforms))
+        logger.info("Processed %d transforms so far", self.stats["transforms_processed"])
+        for transform in transforms:
+            transform_id = transform["element"].get("uniqueId", None)
+            if transform_id and transform_id in self.processed_transform_ids:
+                if self.debug:
+                    logger.debug("Skipping already processed transform %s", transform_id)
+                continue
+            if transform_id:
+                self.processed_transform_ids.add(transform_id)
+                self.stats["transforms_processed"] += 1
+                if self.debug:
+                    logger.debug("Processing additional transform %s", transform_id)
+            self._rule("missed_transform", transform["element"])
+            self._scale_transform(transform)
+
+
+def format_summary(stats, output_file, ignore_extensions=False, metrics=None):
+    """
+    Build the human readable summary shown after a conversion. With metrics
+    (a PhaseMetrics) the time spent per phase is appended.
+    """
+    extension_note = ""
+    if ignore_extensions and stats["paths_updated"] > 0:
+        extension_note = "\nNote: File extensions were ignored during replacement, allowing format conversion."
+        extension_note += "\nIMPORTANT: If you're replacing MP4 files with MOV files, make sure both old and new paths are correct."
+        extension_note += "\nThe application will match files with the same base name but different extensions."
+
+    summary = (
+        f"Modifications Summary:\n"
+        f"Clips modified: {stats['clips_modified']}\n"
+        f"Transforms adjusted: {stats['transforms_adjusted']}\n"
+        f"Additional effect position/range adjustments: {stats['position_ranges_adjusted']}\n"
+        f"Durations adjusted: {stats['durations_adjusted']}\n"
+        f"Custom durations preserved: {stats['custom_durations_preserved']}\n"
+        f"File paths updated: {stats['paths_updated']}\n"
+        f"Text components found: {stats['text_components_found']}{extension_note}\n\n"
+        f"Adjusted composition saved to: {output_file}"
+    )
+    if "path_rules" in stats:
+        summary += "\n\n" + format_path_rules(stats["path_rules"])
+    if metrics is not None and metrics.phases:
+        summary += "\n\n" + metrics.format()
+    return summary
+
+
+def format_path_rules(path_rules):
+    """The paths rewritten per path mapping rule, most used rule first."""
+    if not path_rules:
+        return "Path mapping: no rule matched"
+    lines = ["Path mapping rules used:"]
+    for label, count in sorted(path_rules.items(), key=lambda item: (-item[1], item[0])):
+        lines.append(f"  {count:6d}  {label}")
+    return "\n".join(lines)
+
+
+OUTPUT_BACKENDS = ("etree", "splice")
+
+# Parsed compositions kept for reuse, most recently used last
+COMPOSITION_CACHE_SIZE = 2
+_composition_cache = OrderedDict()
+_composition_cache_lock = threading.Lock()
+
+
+def _file_key(path):
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+class ParsedComposition:
+    """
+    A composition parsed once and shared between the unknown-effect scan and
+    any number of conversions.
+
+    Conversions record the attributes they change in a ChangeJournal and
+    roll them back after writing, so the tree always holds the file as it is
+    on disk. The index and the visitor are built on first use and reused.
+    Use load_composition() to get a cached handle.
+    """
+
+    def __init__(self, path, xml_backend=None, progress=None, cancel=None):
+        self.path = path
+        self.key = _file_key(path)
+        self.xml_backend = xml_backend
+        self.tree = _parse_file(path, xml_backend, progress, cancel)
+        self._index = None
+        self._visitor = None
+        self._lock = threading.Lock()
+
+    @property
+    def root(self):
+        return self.tree.getroot()
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = CompositionIndex.build(self.root)
+        return self._index
+
+    @property
+    def visitor(self):
+        return self.get_visitor()
+
+    def get_visitor(self, cancel=None):
+        """The visitor, walking the tree first if needed (stopping early if cancel is cancelled)."""
+        if self._visitor is None:
+            self._visitor = CompositionVisitor(self.root, cancel=cancel).walk()
+        return self._visitor
+
+    def is_current(self):
+        """True while the file on disk still has the size and mtime it was parsed with."""
+        try:
+            return _file_key(self.path) == self.key
+        except OSError:
+            return False
+
+    def convert(self, converter, output_file, splice=False):
+        """
+        Apply converter (which must have a journal) to the tree, write
+        output_file and restore the tree. Returns the stats counters.
+        """
+        with self._lock:
+            try:
+                with converter.phase("walk"):
+                    visitor = self.get_visitor(converter.cancel)  # Built on the first conversion only
+                stats = converter.apply(self.root, visitor)
+                with converter.phase("write"):
+                    _write_tree(self.tree, self.path, output_file,
+                                converter.journal if splice else None, converter.cancel)
+            finally:
+                converter.journal.rollback()
+        return stats
+
+
+def load_composition(path, xml_backend=None, progress=None, cancel=None):
+    """
+    Return a ParsedComposition for path, reusing a cached one while the
+    file's size and modification time are unchanged. progress (a
+    ProgressReporter) follows the bytes parsed; parsing stops with
+    ConversionCancelled once cancel (a CancellationToken) is cancelled.
+    """
+    key = _file_key(path)
+    with _composition_cache_lock:
+        composition = _composition_cache.get(key[0])
+        if (composition is not None and composition.key == key and
+                composition.xml_backend == xml_backend):
+            _composition_cache.move_to_end(key[0])
+            return composition
+
+    composition = ParsedComposition(path, xml_backend, progress, cancel)
+    with _composition_cache_lock:
+        _composition_cache[key[0]] = composition
+        _composition_cache.move_to_end(key[0])
+        while len(_composition_cache) > COMPOSITION_CACHE_SIZE:
+            _composition_cache.popitem(last=False)
+    return composition
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def clear_composition_cache():
+    with _composition_cache_lock:
+        _composition_cache.clear()
+
+def forget_composition(path):
+    """Drop the cached ParsedComposition of path; its tree is freed once no caller holds it."""
+    with _composition_cache_lock:
+        _composition_cache.pop(os.path.abspath(path), None)
+
+def _parse_file(input_file, xml_backend=None, progress=None, cancel=None):
+    """parse_xml, reporting the bytes read to progress and checking cancel when given."""
+    if progress is None and cancel is None:
+        return parse_xml(input_file, xml_backend)
+    with open(input_file, "rb") as f:
+        return parse_xml(ProgressReader(f, progress, cancel=cancel), xml_backend)
+
+def _write_tree(tree, input_file, output_file, journal=None, cancel=None):
+    """Write a converted tree, splicing into the original bytes when a journal was kept."""
+    if cancel is not None:
+        cancel.check()
+    if journal is not None:
+        from splice_writer import can_splice, write_spliced
+        if can_splice(input_file):
+            write_spliced(input_file, output_file, tree.getroot(), journal)
+            return
+        logger.info("Input is not UTF-8; writing the full document instead of splicing.")
+    write_xml(tree, output_file, cancel)
+
+
+def _stream_file(input_file, output_file, converter):
+    from streaming_converter import stream_composition
+    with converter.phase("stream"):
+        return stream_composition(input_file, output_file, converter)
+
+
+def convert_composition_file(input_file, output_file, old_path=None, new_path=None,
+                             resolution_factor=2.0, framerate_factor=2.4, new_name=None,
+                             ignore_extensions=False, effect_position_policy=None,
+                             streaming=False, output_backend="etree", deck_workers=1,
+                             xml_backend=None, metrics=None, manifest_file=None,
+                             progress=None, cancel=None, memory_budget=None,
+                             search_subfolders=False, path_mapping=None):
+    """
+    Convert input_file into output_file and return the stats counters.
+    Takes the same arguments as adjust_composition.
+
+    When metrics (a PhaseMetrics) is given, the time spent parsing, in each
+    group of rules and writing is recorded in it.
+
+    input_file may also be a ParsedComposition, whose tree is then converted
+    without parsing the file again (streaming and parallel deck conversion
+    read the file themselves).
+
+    With memory_budget (a MemoryBudget), a conversion whose whole document
+    would not fit in the budget is streamed instead, also when the splice
+    backend or deck workers were asked for; the budget records the strategy
+    used and the peak memory.
+    """
+    if output_backend not in OUTPUT_BACKENDS:
+        raise ValueError(f"Unknown output backend: {output_backend}")
+    if streaming and output_backend == "splice":
+        raise ValueError("The splice output backend needs the whole document and cannot be used with streaming")
+    if deck_workers > 1 and (streaming or output_backend != "etree"):
+        raise ValueError("Parallel deck conversion only supports the etree output backend without streaming")
+    if deck_workers > 1 and manifest_file:
+        raise ValueError("A change manifest cannot be written with parallel deck conversion")
+
+    composition = None
+    if isinstance(input_file, ParsedComposition):
+        composition = input_file
+        input_file = composition.path
+
+    guarded = cancel
+    if memory_budget is not None:
+        if composition is not None and not streaming and deck_workers <= 1:
+            # Already in memory: only the conversion itself is measured
+            memory_budget.strategy = memory_budget.strategy or "dom"
+        else:
+            strategy = "streaming" if streaming else "decks" if deck_workers > 1 else "dom"
+            streaming = memory_budget.plan(input_file, strategy, xml_backend) == "streaming"
+            if streaming:
+                output_backend, deck_workers = "etree", 1
+        memory_budget.start()
+        if deck_workers <= 1:
+            guarded = memory_budget.guard(cancel)
+
+    journal = ChangeJournal() if output_backend == "splice" or composition is not None else None
+    manifest_out = open(manifest_file, "w", encoding="utf-8") if manifest_file else None
+
+    converters = []
+
+    def make_converter(journal):
+        converters.append(CompositionConverter(
+            old_path, new_path, resolution_factor, framerate_factor, new_name,
+            ignore_extensions, effect_position_policy, journal, metrics,
+            ChangeManifest(manifest_out) if manifest_out is not None else None,
+            progress, guarded, search_subfolders, path_mapping))
+        return converters[-1]
+
+    try:
+        converter = make_converter(journal)
+        if search_subfolders and old_path and new_path and path_mapping is None:
+            with converter.phase("library"), MediaLibrary() as library:
+                library.refresh_once(new_path, guarded)
+
+        if composition is not None and not streaming and deck_workers <= 1:
+            stats = composition.convert(converter, output_file,
+                                        splice=output_backend == "splice")
+        elif streaming:
+            stats = _stream_file(input_file, output_file, converter)
+        elif deck_workers > 1:
+            from parallel_decks import convert_decks_parallel
+            with converter.phase("decks"):
+                stats = convert_decks_parallel(input_file, output_file, converter, deck_workers)
+        else:
+            enforce = memory_budget.enforce() if memory_budget is not None else nullcontext()
+            exceeded = None
+            try:
+                with converter.phase("parse"), enforce:
+                    tree = _parse_file(input_file, xml_backend, progress, guarded)
+            except MemoryBudgetExceeded as e:
+                # Only the message is kept: the exception's traceback holds
+                # the parser frames and with them the partial tree
+                exceeded = str(e)
+            if exceeded is not None:
+                gc.collect()
+                memory_budget.switch_to_streaming(exceeded)
+                stats = _stream_file(input_file, output_file, make_converter(None))
+            else:
+                stats = converter.convert(tree.getroot())
+                with converter.phase("write"):
+                    _write_tree(tree, input_file, output_file, journal, guarded)
+    except ConversionCancelled:
+        # The writers remove their partial output; a half-written manifest
+        # would only be misleading
+        if manifest_out is not None:
+            manifest_out.close()
+            manifest_out = None
+            _remove_quietly(manifest_file)
+        raise
+    finally:
+        for converter in converters:
+            converter.close()
+        if manifest_out is not None:
+            manifest_out.close()
+
+    if memory_budget is not None:
+        memory_budget.sample(force=True)
+    return stats
+
+
+def adjust_composition(input_file, output_file, old_path=None, new_path=None,
+                        resolution_factor=2.0, framerate_factor=2.4, new_name=None,
+                        ignore_extensions=False, effect_position_policy=None,
+                        streaming=False, output_backend="etree", deck_workers=1,
+                        xml_backend=None, metrics=None, manifest_file=None,
+                        progress=None, cancel=None, memory_budget=None,
+                        search_subfolders=False, path_mapping=None):
+    """
+    Adjust a Resolume composition file for higher resolution and new frame rate,
+    WITHOUT altering the original composition on disk.
+
+    Key changes:
+      1) CompositionInfo width/height -> scaled by resolution_factor
+      2) Top-level VideoTrack (if present) -> scaled by resolution_factor
+      3) Each Layer's VideoTrack -> scaled by resolution_factor
+      4) Each Clip's VideoTrack (Width/Height) -> scaled by resolution_factor
+      5) TransformEffect (Position X, Position Y, Anchor X, Anchor Y, Anchor Z) -> scaled by resolution_factor
+      6) TIMELINE (seconds) durations -> Keep same real-time (preserve user-edited durations)
+      7) BPM (beats) durations -> multiply defaultMillisecondsDuration by framerate_factor
+      8) PrimarySource -> either force new resolution or remove width/height
+      9) (Optional) replace old_path with new_path in file references
+         - When ignore_extensions=True, only compare base filenames without extensions
+           This allows replacing media files with different formats (e.g., .MP4 with .MOV)
+           while keeping the same base filename.
+         - Example: A composition using 'video1.mp4' can be updated to use 'video1.mov'
+           when this option is enabled and the new media path contains the .dxv file.
+
+    The tree is walked once by CompositionVisitor; CompositionConverter then
+    applies the rules to the collected elements. With streaming=True the file
+    is converted top-level section by section (and clip by clip inside decks)
+    so memory use does not grow with the size of the composition.
+
+    output_backend selects how the result is written: "etree" re-serializes
+    the whole document, "splice" copies the original bytes and patches only
+    the attributes that changed, keeping the source formatting intact.
+
+    With deck_workers > 1 every Deck is converted in its own worker process
+    and the results are stitched back in order; the output is the same as
+    the serial conversion.
+
+    input_file may be a ParsedComposition from load_composition(), so a file
+    that was already parsed (for example by scan_unknown_position_effects)
+    is not parsed again.
+
+    xml_backend chooses the parser and serializer: "lxml", "etree" or None
+    for lxml when it is installed. Both produce the same output file.
+    Streaming and parallel deck conversion always use ElementTree.
+
+    Pass a PhaseMetrics as metrics to get the wall time, CPU time and (when
+    tracemalloc is tracing) peak memory of every phase, both in the summary
+    and as metrics.as_dict().
+
+    With manifest_file, every attribute change is also written to that file
+    as it is made, one JSON object per line (see ChangeManifest). Not
+    available with deck_workers > 1.
+
+    progress is an optional ProgressReporter (conversion_progress.py) that
+    receives throttled start/progress/finish events for every phase, with
+    bytes parsed, clips converted (and where they are), paths remapped or
+    decks finished, so front ends can show a progress bar and an ETA.
+
+    cancel is an optional CancellationToken (conversion_cancel.py). Once it
+    is cancelled the conversion stops at the next chunk read or written,
+    clip, path or deck, removes any partially written output and raises
+    ConversionCancelled.
+
+    memory_budget is an optional MemoryBudget (memory_budget.py): when the
+    whole document would not fit in it, the file is streamed instead (see
+    convert_composition_file), and the summary says which strategy was used
+    and how much memory it took.
+
+    With search_subfolders, media that is not found where the new path
+    points is looked up by name in the whole folder tree under new_path,
+    using the MediaLibrary (media_library.py) kept in the settings folder.
+    The tree is refreshed once per process (see MediaLibrary.refresh_once);
+    batches refresh it themselves before they start.
+
+    path_mapping (a PathMapping from path_mapping.load_path_mapping) moves
+    media with a table of many old -> new folders instead of old_path and
+    new_path; stats["path_rules"] and the summary count the paths per rule.
+    """
+    stats = convert_composition_file(
+        input_file, output_file, old_path, new_path, resolution_factor,
+        framerate_factor, new_name, ignore_extensions, effect_position_policy,
+        streaming, output_backend, deck_workers, xml_backend, metrics,
+        manifest_file, progress, cancel, memory_budget, search_subfolders, path_mapping)
+    summary = format_summary(stats, output_file, ignore_extensions, metrics)
+    if manifest_file:
+        summary += f"\n\nChange manifest saved to: {manifest_file}"
+    if memory_budget is not None:
+        summary += "\n\n" + memory_budget.format()
+    return summary
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# conversion_log.py - Leveled logging for the conversion engine
+
+import logging
+import sys
+
+LOGGER_NAME = "resolume_converter"
+
+# verbosity 0: warnings only, 1: progress messages, 2: every changed value
+VERBOSITY_LEVELS = (logging.WARNING, logging.INFO, logging.DEBUG)
+
+_handler = None
+
+
+def get_logger(name):
+    """Logger for one module, below the converter's common logger."""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+def configure_logging(verbosity=1, stream=None):
+    """
+    Show converter messages up to the given verbosity on stream (stderr by
+    default). Can be called again to change the level or the stream.
+
+    Messages are formatted only when their level is enabled, and the
+    per-element debug output in the engine is skipped entirely below
+    verbosity 2, so quiet conversions pay nothing for it.
+    """
+    global _handler
+
+    verbosity = max(0, min(int(verbosity), len(VERBOSITY_LEVELS) - 1))
+    base = logging.getLogger(LOGGER_NAME)
+    base.setLevel(VERBOSITY_LEVELS[verbosity])
+    if _handler is not None and (stream is None or _handler.stream is stream):
+        return base
+
+    if _handler is not None:
+        base.removeHandler(_handler)
+    _handler = logging.StreamHandler(stream or sys.stderr)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    base.addHandler(_handler)
+    base.propagate = False
+    return base
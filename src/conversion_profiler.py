@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# conversion_profiler.py - Profile conversions into pstats and flamegraph stack files
+
+import cProfile
+import os
+import sys
+import threading
+from collections import Counter
+
+# Seconds between stack samples; the GIL switch interval (5 ms by default)
+# bounds the real rate while the converter is busy
+SAMPLE_INTERVAL = 0.001
+
+
+def profile_paths(output_file):
+    """The .pstats and collapsed-stack files written next to output_file."""
+    base = os.path.splitext(output_file)[0]
+    return base + ".pstats", base + ".collapsed.txt"
+
+
+def _frame_name(code):
+    name = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return name.replace(";", ":")
+
+
+class ConversionProfiler:
+    """
+    Profiles the code run inside `with profiler:` blocks of the calling
+    thread. cProfile collects per-function statistics; a background thread
+    samples the call stack for a collapsed-stack file ("a;b;c count" per
+    line) that flamegraph.pl, speedscope and similar tools read. A profiler
+    can be entered several times; the results add up.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.profile = cProfile.Profile()
+        self.stacks = Counter()
+        self._thread_id = None
+        self._stop = None
+        self._sampler = None
+
+    def __enter__(self):
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name="conversion-profiler", daemon=True)
+        self._sampler.start()
+        self.profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profile.disable()
+        self._stop.set()
+        self._sampler.join()
+        return False
+
+    def _sample(self):
+        names = {}
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                name = names.get(code)
+                if name is None:
+                    name = names[code] = _frame_name(code)
+                stack.append(name)
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def save(self, output_file):
+        """
+        Write the .pstats and collapsed-stack files for output_file (the
+        converted .avc) and return their paths.
+        """
+        pstats_file, stacks_file = profile_paths(output_file)
+        self.profile.dump_stats(pstats_file)
+        with open(stacks_file, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+        return pstats_file, stacks_file
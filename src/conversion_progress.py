@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# conversion_progress.py - Throttled progress events for long conversions
+
+import os
+import time
+from contextlib import contextmanager
+
+# Minimum seconds between two "progress" events
+PROGRESS_INTERVAL = 0.1
+
+
+class ProgressReporter:
+    """
+    Sends progress events for a conversion to callback, a function that
+    takes one event dict:
+
+        {"event": "start" | "progress" | "finish", "phase": "parse",
+         "done": 1200, "total": 2560, "item": {...} or None,
+         "elapsed": 1.25, "eta": 1.4 or None}
+
+    "start" and "finish" are sent for the top-level phases (parse, walk,
+    transforms, paths, write, stream, decks, ...). "progress" events carry
+    how far the running top-level phase is (bytes read, clips converted,
+    paths remapped, decks finished) and are sent at most every interval
+    seconds, plus once when a phase reaches its total. elapsed is the time
+    since the reporter was created; eta estimates the seconds left in the
+    phase from its rate so far.
+
+    Progress inside nested phases (for example the rules applied to each
+    section while streaming) is not reported, so the numbers never jump
+    back and forth between phases.
+
+    The callback runs in the converting thread; a GUI should hand the
+    events to its own thread (for example through a queue).
+    """
+
+    def __init__(self, callback, interval=PROGRESS_INTERVAL):
+        self.callback = callback
+        self.interval = interval
+        self.started = time.perf_counter()
+        self._stack = []
+        self._phase_started = self.started
+        self._last = 0.0
+
+    def _emit(self, event, phase, done=None, total=None, item=None, now=None):
+        now = now if now is not None else time.perf_counter()
+        eta = None
+        if event == "progress" and done and total:
+            eta = (now - self._phase_started) / done * max(0, total - done)
+        self.callback({
+            "event": event,
+            "phase": phase,
+            "done": done,
+            "total": total,
+            "item": item,
+            "elapsed": now - self.started,
+            "eta": eta,
+        })
+
+    @contextmanager
+    def phase(self, name):
+        self._stack.append(name)
+        top = len(self._stack) == 1
+        if top:
+            self._phase_started = self._last = time.perf_counter()
+            self._emit("start", name, now=self._phase_started)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            if top:
+                self._emit("finish", name)
+
+    def due(self, done, total=None):
+        """True when a progress event for done/total should be sent now."""
+        if len(self._stack) != 1:
+            return False
+        if total is not None and done >= total:
+            return True
+        return time.perf_counter() - self._last >= self.interval
+
+    def report(self, done, total=None, item=None):
+        """Send a progress event for the running top-level phase."""
+        if len(self._stack) != 1:
+            return
+        self._last = time.perf_counter()
+        self._emit("progress", self._stack[0], done, total, item, self._last)
+
+    def advance(self, done, total=None, item=None):
+        if self.due(done, total):
+            self.report(done, total, item)
+
+
+class ProgressReader:
+    """
+    Wraps a binary file and reports the bytes read so far to progress (a
+    ProgressReporter or None), so parsing a large composition shows
+    progress. With cancel (a CancellationToken) reading stops once the token
+    is cancelled. Parsers read files in chunks, so the cost is one check per
+    chunk.
+    """
+
+    def __init__(self, f, progress, total=None, cancel=None):
+        self._file = f
+        self.progress = progress
+        self.cancel = cancel
+        self.total = total if total is not None else os.fstat(f.fileno()).st_size
+        self.position = 0
+
+    def read(self, size=-1):
+        if self.cancel is not None:
+            self.cancel.check()
+        data = self._file.read(size)
+        self.position += len(data)
+        if self.progress is not None:
+            self.progress.advance(self.position, self.total)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+# media_audit.py - Check that the media a composition references exists
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from conversion_log import configure_logging, get_logger
+from media_index import media_kind
+
+logger = get_logger("media_audit")
+
+# Files checked at the same time; on network mounts every stat waits on the server
+AUDIT_WORKERS = 16
+
+MISSING = "missing"
+EMPTY = "empty"
+TYPE_MISMATCH = "type_mismatch"
+PROBLEMS = (MISSING, EMPTY, TYPE_MISMATCH)
+
+# Problems listed by format_audit; the counts always cover all of them
+MAX_LISTED_ISSUES = 50
+
+# Bytes read from a file to recognise its format
+HEADER_SIZE = 16
+
+_QUICKTIME_ATOMS = (b"ftyp", b"moov", b"mdat", b"wide", b"free", b"skip", b"pnot")
+
+
+def _content_kind(header):
+    """"video", "image" or None (unknown) for the first bytes of a file."""
+    if header[4:8] in _QUICKTIME_ATOMS:
+        return "video"  # QuickTime / MP4 family, including DXV
+    if header[:4] == b"RIFF":
+        return {b"AVI ": "video", b"WEBP": "image"}.get(header[8:12])
+    if header[:4] in (b"\x1a\x45\xdf\xa3", b"\x30\x26\xb2\x75"):
+        return "video"  # Matroska / WebM, ASF (WMV)
+    if (header[:3] == b"\xff\xd8\xff" or header[:8] == b"\x89PNG\r\n\x1a\n" or
+            header[:4] in (b"GIF8", b"II*\x00", b"MM\x00*") or header[:2] == b"BM"):
+        return "image"
+    return None
+
+
+def check_media_file(path):
+    """
+    (problem, detail) for one media file: problem is None when the file is
+    fine, otherwise MISSING, EMPTY or TYPE_MISMATCH (a folder, or content
+    that is an image where the extension says video or the other way round).
+    """
+    try:
+        stat = os.stat(path)
+    except OSError as e:
+        return MISSING, e.strerror or str(e)
+    if not os.path.isfile(path):
+        return TYPE_MISMATCH, "is not a file"
+    if stat.st_size == 0:
+        return EMPTY, "0 bytes"
+    expected = media_kind(os.path.splitext(path)[1].lower())
+    if expected is None:
+        return None, None
+    try:
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+    except OSError as e:
+        return MISSING, e.strerror or str(e)
+    found = _content_kind(header)
+    if found is not None and found != expected:
+        return TYPE_MISMATCH, f"{found} content, {expected} extension"
+    return None, None
+
+
+def collect_media_references(composition_file, cancel=None):
+    """
+    Every media reference in a composition file, in document order: dicts
+    with path, attribute (the element holding it), and the deck index,
+    layer, column, uniqueId and name of the clip it belongs to (None
+    outside clips). The file is read incrementally, so memory use does not
+    grow with its size.
+    """
+    # (path, attribute, deck, clip record); a clip's name may follow its media
+    found = []
+    stack = []
+    deck = None
+    clip = None
+    for event, elem in ET.iterparse(composition_file, events=("start", "end")):
+        if event == "end":
+            stack.pop()
+            if elem.tag == "Clip":
+                clip = None
+            elif elem.tag == "Deck":
+                deck = None
+            # Detached, not only cleared: an empty shell per element would
+            # still pile up in its parent until the whole file is read.
+            # Finished siblings are gone, so elem is its parent's first child.
+            if stack:
+                stack[-1].remove(elem)
+            elem.clear()
+            continue
+
+        tag = elem.tag
+        parent = stack[-1] if stack else None
+        stack.append(elem)
+        if tag == "Deck":
+            if cancel is not None:
+                cancel.check()
+            deck = elem.get("deckIndex")
+        elif tag == "Clip":
+            clip = {"deck": deck, "layer": elem.get("layerIndex"), "column": elem.get("columnIndex"),
+                    "clip": elem.get("uniqueId"), "clip_name": None}
+        elif tag == "VideoFormatReaderSource":
+            path = elem.get("fileName")
+            if path:
+                found.append((path, "VideoFormatReaderSource", deck, clip))
+        elif tag == "VideoFile" and parent is not None and parent.tag == "PreloadData":
+            path = elem.get("value")
+            if path:
+                found.append((path, "PreloadData", deck, clip))
+        elif (tag == "Param" and clip is not None and clip["clip_name"] is None and
+              elem.get("name") == "Name" and len(stack) >= 3 and stack[-3].tag == "Clip"):
+            # The clip's own Params/Param name="Name"
+            clip["clip_name"] = elem.get("value")
+
+    references = []
+    for path, attribute, deck, clip in found:
+        reference = {"path": path, "attribute": attribute, "deck": deck, "layer": None,
+                     "column": None, "clip": None, "clip_name": None}
+        if clip is not None:
+            reference.update(clip)
+        references.append(reference)
+    return references
+
+
+def _resolve(path, base_dir):
+    return path if os.path.isabs(path) else os.path.normpath(os.path.join(base_dir, path))
+
+
+def audit_composition(composition_file, workers=AUDIT_WORKERS, cancel=None, progress=None):
+    """
+    Check every file referenced by composition_file, each distinct path
+    once, with up to workers checks running at the same time. Relative
+    paths are taken relative to the composition's folder. progress (a
+    ProgressReporter) is told how many paths are done; cancel (a
+    CancellationToken) is checked for every deck and every path.
+
+    Returns a dict with the number of references and distinct files
+    checked, the count of every problem (missing, empty, type_mismatch),
+    seconds, and issues: one entry per problem reference, in document
+    order and once per clip, with status, detail and the fields of
+    collect_media_references.
+    """
+    start = time.perf_counter()
+    references = collect_media_references(composition_file, cancel)
+
+    base_dir = os.path.dirname(os.path.abspath(composition_file))
+    paths = list(dict.fromkeys(reference["path"] for reference in references))
+    results = {}
+    if paths:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(paths))),
+                                thread_name_prefix="media-audit") as pool:
+            futures = {pool.submit(check_media_file, _resolve(path, base_dir)): path for path in paths}
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    if cancel is not None:
+                        cancel.check()
+                    results[futures[future]] = future.result()
+                    if progress is not None:
+                        progress.advance(done, len(paths))
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    audit = {"references": len(references), "checked": len(paths),
+             "seconds": 0.0, "issues": []}
+    audit.update((problem, 0) for problem in PROBLEMS)
+    for path, (problem, _detail) in results.items():
+        if problem is not None:
+            audit[problem] += 1
+    # A clip refers to its file twice (source and preload data): report it once
+    reported = set()
+    for reference in references:
+        problem, detail = results[reference["path"]]
+        key = (reference["deck"], reference["clip"], reference["path"])
+        if problem is not None and key not in reported:
+            reported.add(key)
+            audit["issues"].append(dict(reference, status=problem, detail=detail))
+    audit["seconds"] = time.perf_counter() - start
+    logger.info("Media audit of %s: %d files, %d missing, %d empty, %d of the wrong type in %.2fs",
+                composition_file, audit["checked"], audit[MISSING], audit[EMPTY],
+                audit[TYPE_MISMATCH], audit["seconds"])
+    return audit
+
+
+def audit_ok(audit):
+    return not any(audit[problem] for problem in PROBLEMS)
+
+
+def _one_based(value):
+    try:
+        return str(int(value) + 1)
+    except (TypeError, ValueError):
+        return "?"
+
+
+def format_location(item):
+    """
+    "Deck 1, layer 2, column 3" for the 0-based "deck", "layer" and "column"
+    indices in item, numbered from 1 as in Resolume's interface; indices
+    that are missing or None are left out.
+    """
+    location = ", ".join(f"{key} {_one_based(item[key])}" for key in ("deck", "layer", "column")
+                         if item.get(key) is not None)
+    return location[:1].upper() + location[1:]
+
+
+def _issue_location(issue):
+    if issue["clip"] is None:
+        return "Outside clips"
+    location = format_location(issue)
+    if issue["clip_name"]:
+        location += f' "{issue["clip_name"]}"'
+    return location
+
+
+def format_audit(audit, limit=MAX_LISTED_ISSUES):
+    """The audit as text: the totals, then one line per problem (the first limit of them)."""
+    lines = [f"Media audit: {audit['references']} references to {audit['checked']} files checked "
+             f"in {audit['seconds']:.2f}s: {audit[MISSING]} missing, {audit[EMPTY]} empty, "
+             f"{audit[TYPE_MISMATCH]} of the wrong type"]
+    issues = audit["issues"]
+    for issue in issues[:limit]:
+        status = issue["status"].replace("_", " ")
+        lines.append(f"  {_issue_location(issue)}: {status} ({issue['detail']}): {issue['path']}")
+    if len(issues) > limit:
+        lines.append(f"  ... and {len(issues) - limit} more")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Check that the media referenced by Resolume compositions (.avc) exists.")
+    parser.add_argument("inputs", nargs="+", help="Composition files or glob patterns")
+    parser.add_argument("-j", "--workers", type=int, default=AUDIT_WORKERS,
+                        help=f"Files checked at the same time (default: {AUDIT_WORKERS})")
+    parser.add_argument("--json", action="store_true", help="Print the audits as JSON")
+    parser.add_argument("--all", action="store_true", help="List every problem, not only the first 50")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="Show the log")
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    configure_logging(args.verbose)
+    files = []
+    for pattern in args.inputs:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        files.extend(matches)
+    if not files:
+        parser.error("No composition files found")
+
+    audits = {}
+    failed = False
+    for composition_file in files:
+        try:
+            audits[composition_file] = audit_composition(composition_file, args.workers)
+        except (OSError, ET.ParseError) as e:
+            print(f"{composition_file}: {e}", file=sys.stderr)
+            failed = True
+
+    if args.json:
+        print(json.dumps(audits, indent=2))
+    else:
+        for composition_file, audit in audits.items():
+            print(composition_file)
+            print(format_audit(audit, len(audit["issues"]) if args.all else MAX_LISTED_ISSUES))
+    return 1 if failed or not all(audit_ok(audit) for audit in audits.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# media_crawler.py - Concurrent listing of media folder trees
+
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from conversion_log import get_logger
+
+logger = get_logger("media_crawler")
+
+# Folders stat'ed or listed at the same time. Network shares answer every
+# call slowly but handle many calls in parallel, so this is well above the
+# number of CPU cores.
+DEFAULT_WORKERS = 16
+
+
+class CrawledDirectory:
+    """
+    One folder of a crawl. relpath is relative to the root ("" for the root
+    itself). When listed is False the folder was unchanged since the known
+    state passed to crawl() and was not listed again: files is None and
+    subdirectories are the known ones. Otherwise files holds
+    (name, size, mtime_ns) and subdirectories (relpath, mtime_ns or None).
+    """
+
+    __slots__ = ("relpath", "mtime_ns", "listed", "files", "subdirectories")
+
+    def __init__(self, relpath, mtime_ns, listed, files, subdirectories):
+        self.relpath = relpath
+        self.mtime_ns = mtime_ns
+        self.listed = listed
+        self.files = files
+        self.subdirectories = subdirectories
+
+
+def _child_relpath(relpath, name):
+    return os.path.join(relpath, name) if relpath else name
+
+
+def _crawl_directory(root, relpath, mtime_ns, known):
+    """Stat (when needed) and list one folder; None when it is gone or unreadable."""
+    full_path = os.path.join(root, relpath) if relpath else root
+    if mtime_ns is None:
+        try:
+            mtime_ns = os.stat(full_path).st_mtime_ns
+        except OSError:
+            return None
+
+    previous = known.get(relpath)
+    if previous is not None and previous[0] == mtime_ns:
+        return CrawledDirectory(relpath, mtime_ns, False, None,
+                                [(child, None) for child in previous[1]])
+
+    files = []
+    subdirectories = []
+    try:
+        with os.scandir(full_path) as entries:
+            for entry in entries:
+                # The listing already says what each entry is (and on Windows
+                # also its size and time), so nothing is stat'ed twice: the
+                # time of a subfolder found here is not looked up again
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirectories.append((_child_relpath(relpath, entry.name),
+                                               entry.stat(follow_symlinks=False).st_mtime_ns))
+                    elif entry.is_file():
+                        stat = entry.stat()
+                        files.append((entry.name, stat.st_size, stat.st_mtime_ns))
+                except OSError:
+                    continue  # Vanished or unreadable while listing
+    except OSError as e:
+        logger.warning("Could not list %s: %s", full_path, e)
+        return None
+    return CrawledDirectory(relpath, mtime_ns, True, files, subdirectories)
+
+
+def crawl(root, known=None, workers=DEFAULT_WORKERS, cancel=None):
+    """
+    Yield a CrawledDirectory for every folder in the tree under root, with
+    up to workers folders stat'ed and listed concurrently. A folder is
+    always yielded before its subfolders; otherwise the order depends on
+    which listing finishes first.
+
+    known maps relpath to (mtime_ns, subfolder relpaths) from an earlier
+    crawl. A known folder whose modification time is unchanged is not
+    listed again (adding, removing or renaming an entry changes the time
+    of its folder); its known subfolders are still visited.
+
+    cancel (a CancellationToken) is checked whenever a folder is done.
+    """
+    known = known or {}
+    pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="media-crawl")
+    try:
+        pending = {pool.submit(_crawl_directory, root, "", None, known)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if cancel is not None:
+                    cancel.check()
+                directory = future.result()
+                if directory is None:
+                    continue
+                for child, mtime_ns in directory.subdirectories:
+                    pending.add(pool.submit(_crawl_directory, root, child, mtime_ns, known))
+                yield directory
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
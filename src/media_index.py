@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# media_index.py - Listing of a media folder for matching files by base name
+
+import os
+import threading
+from collections import OrderedDict
+
+from conversion_log import get_logger
+
+logger = get_logger("media_index")
+
+VIDEO_EXTENSIONS = frozenset(('.mp4', '.mov', '.avi', '.wmv', '.mkv', '.dxv', '.m4v', '.webm'))
+IMAGE_EXTENSIONS = frozenset(('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp'))
+
+# Folder listings kept for reuse, most recently used last
+DIRECTORY_CACHE_SIZE = 8
+_directory_cache = OrderedDict()
+_directory_cache_lock = threading.Lock()
+
+
+def media_kind(extension):
+    """"video", "image" or None for a lower-case extension such as ".mov"."""
+    if extension in VIDEO_EXTENSIONS:
+        return "video"
+    if extension in IMAGE_EXTENSIONS:
+        return "image"
+    return None
+
+
+class MediaDirectoryIndex:
+    """
+    The files of one media folder, listed once and looked up by base name.
+
+    Base names are compared case-insensitively. For every base name the
+    index keeps the first file (in listing order) per extension and per
+    media kind, so match() finds the same file a scan of the listing would,
+    in constant time.
+    """
+
+    def __init__(self, directory, names):
+        self.directory = directory
+        # False when the folder does not exist
+        self.exists = names is not None
+        # (base name, extension) -> (position, file name)
+        self._by_extension = {}
+        # (base name, kind) -> (position, file name)
+        self._by_kind = {}
+        for position, name in enumerate(names or ()):
+            base, extension = os.path.splitext(name)
+            base, extension = base.lower(), extension.lower()
+            self._by_extension.setdefault((base, extension), (position, name))
+            kind = media_kind(extension)
+            if kind is not None:
+                self._by_kind.setdefault((base, kind), (position, name))
+
+    @classmethod
+    def scan(cls, directory):
+        if not os.path.isdir(directory):
+            return cls(directory, None)
+        return cls(directory, os.listdir(directory))
+
+    def match(self, file_path, ignore_extensions=False):
+        """
+        Name of the file in this folder with the base name of file_path and
+        the same extension or, with ignore_extensions, the same kind (video
+        or image). The first such file in listing order wins. None if there
+        is none.
+        """
+        base, extension = os.path.splitext(os.path.basename(file_path))
+        base, extension = base.lower(), extension.lower()
+        candidates = [self._by_extension.get((base, extension))]
+        if ignore_extensions:
+            kind = media_kind(extension)
+            if kind is not None:
+                candidates.append(self._by_kind.get((base, kind)))
+        found = [candidate for candidate in candidates if candidate is not None]
+        return min(found)[1] if found else None
+
+
+def _directory_key(directory):
+    try:
+        return os.stat(directory).st_mtime_ns
+    except OSError:
+        return None
+
+
+def directory_index(directory):
+    """
+    MediaDirectoryIndex of directory, reusing the listing of an earlier call
+    while the folder's modification time is unchanged (adding, removing or
+    renaming a file changes it), so all clips and all files of a batch share
+    one listing.
+    """
+    path = os.path.abspath(directory)
+    key = _directory_key(path)
+    with _directory_cache_lock:
+        cached = _directory_cache.get(path)
+        if cached is not None and cached[0] == key:
+            _directory_cache.move_to_end(path)
+            return cached[1]
+
+    index = MediaDirectoryIndex.scan(directory)
+    if not index.exists:
+        logger.warning("New directory does not exist: %s", directory)
+    with _directory_cache_lock:
+        _directory_cache[path] = (key, index)
+        _directory_cache.move_to_end(path)
+        while len(_directory_cache) > DIRECTORY_CACHE_SIZE:
+            _directory_cache.popitem(last=False)
+    return index
+
+
+def clear_directory_indexes():
+    with _directory_cache_lock:
+        _directory_cache.clear()
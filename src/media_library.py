@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+# media_library.py - Persistent index of media folder trees for relinking clips
+
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from conversion_log import get_logger
+from media_crawler import DEFAULT_WORKERS, crawl
+from media_index import media_kind
+
+logger = get_logger("media_library")
+
+LIBRARY_FILE_NAME = "media_library.sqlite3"
+
+# Roots (as _root_key) refreshed by this process, or by the batch that
+# started it (see mark_refreshed): conversions refresh each root at most once
+# per process, never once per file. A batch that outlives changes to the
+# media calls refresh() again, as the app does before every run.
+_refreshed_roots = set()
+_refreshed_roots_lock = threading.Lock()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS roots (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    refreshed REAL
+);
+CREATE TABLE IF NOT EXISTS directories (
+    id INTEGER PRIMARY KEY,
+    root_id INTEGER NOT NULL,
+    parent_id INTEGER,
+    relpath TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    UNIQUE (root_id, relpath)
+);
+CREATE INDEX IF NOT EXISTS directories_parent ON directories (parent_id);
+CREATE TABLE IF NOT EXISTS files (
+    directory_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    base TEXT NOT NULL,
+    extension TEXT NOT NULL,
+    kind TEXT,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    PRIMARY KEY (directory_id, name)
+);
+CREATE INDEX IF NOT EXISTS files_base ON files (base);
+"""
+
+
+def default_library_path():
+    """The library file, in the folder that also holds the effect position policy."""
+    from conversion_engine import _get_effect_policy_path
+    return os.path.join(os.path.dirname(_get_effect_policy_path()), LIBRARY_FILE_NAME)
+
+
+def _root_key(root):
+    return os.path.normcase(os.path.abspath(root))
+
+
+def refreshed_roots():
+    """The roots this process refreshed, to hand to worker processes."""
+    with _refreshed_roots_lock:
+        return frozenset(_refreshed_roots)
+
+
+def mark_refreshed(roots):
+    """Treat roots (from refreshed_roots() of the parent process) as refreshed here."""
+    with _refreshed_roots_lock:
+        _refreshed_roots.update(roots)
+
+
+def _path_parts(path):
+    return [part for part in re.split(r"[\\/]", path) if part and part != "."]
+
+
+def _common_tail(left, right):
+    """Number of equal trailing components (case-insensitive) of two part lists."""
+    count = 0
+    for a, b in zip(reversed(left), reversed(right)):
+        if a.lower() != b.lower():
+            break
+        count += 1
+    return count
+
+
+class MediaLibrary:
+    """
+    Files under one or more media roots, kept in an SQLite database so a
+    deep library on a NAS is not crawled again for every conversion.
+
+    For every file the base name, extension, kind (video or image), size
+    and modification time are stored. refresh() only lists folders whose
+    modification time changed since the last refresh (a folder's time
+    changes when entries are added, removed or renamed in it); unchanged
+    folders cost one stat each. Folders are read concurrently (see
+    media_crawler.py), which is what makes a refresh fast on network storage
+    where every call waits on the server. A file edited in place keeps its old size and
+    time in the library until its folder changes, which does not matter for
+    matching by name.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_library_path()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(self.path, timeout=30)
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _root(self, root):
+        """(id, refreshed) of root, or None when it was never indexed."""
+        return self.connection.execute(
+            "SELECT id, refreshed FROM roots WHERE path = ?", (_root_key(root),)).fetchone()
+
+    def _store_directory(self, root_id, parent_id, directory, directory_id):
+        """Write the listing of a CrawledDirectory; returns its directory id."""
+        files = []
+        for name, size, mtime_ns in directory.files:
+            base, extension = os.path.splitext(name)
+            extension = extension.lower()
+            files.append((name, base.lower(), extension, media_kind(extension), size, mtime_ns))
+
+        connection = self.connection
+        if directory_id is None:
+            directory_id = connection.execute(
+                "INSERT INTO directories (root_id, parent_id, relpath, mtime_ns) VALUES (?, ?, ?, ?)",
+                (root_id, parent_id, directory.relpath, directory.mtime_ns)).lastrowid
+        else:
+            connection.execute("UPDATE directories SET mtime_ns = ? WHERE id = ?",
+                               (directory.mtime_ns, directory_id))
+            connection.execute("DELETE FROM files WHERE directory_id = ?", (directory_id,))
+        connection.executemany(
+            "INSERT INTO files (directory_id, name, base, extension, kind, size, mtime_ns) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(directory_id,) + row for row in files])
+        return directory_id
+
+    def refresh(self, root, cancel=None, workers=DEFAULT_WORKERS):
+        """
+        Bring the library up to date with the folder tree under root, with
+        up to workers folders read at once (see media_crawler.crawl).
+        cancel (a CancellationToken) is checked for every folder. Returns
+        counters: directories seen, directories listed, seconds.
+        """
+        start = time.perf_counter()
+        counters = {"directories": 0, "listed": 0, "seconds": 0.0}
+        connection = self.connection
+        with connection:
+            # One refresh at a time, also across processes
+            connection.execute("BEGIN IMMEDIATE")
+            existing = self._root(root)
+            if existing is None:
+                root_id = connection.execute(
+                    "INSERT INTO roots (path) VALUES (?)", (_root_key(root),)).lastrowid
+            else:
+                root_id = existing[0]
+            # relpath -> directory id, and the (mtime_ns, subfolders) the crawl compares with
+            ids = {}
+            known = {}
+            rows = connection.execute(
+                "SELECT id, parent_id, relpath, mtime_ns FROM directories WHERE root_id = ?",
+                (root_id,)).fetchall()
+            relpaths = {directory_id: relpath for directory_id, _parent, relpath, _mtime in rows}
+            for directory_id, _parent_id, relpath, mtime_ns in rows:
+                ids[relpath] = directory_id
+                known[relpath] = (mtime_ns, [])
+            for _directory_id, parent_id, relpath, _mtime_ns in rows:
+                if parent_id in relpaths:
+                    known[relpaths[parent_id]][1].append(relpath)
+
+            # Folders arrive before their subfolders, so the parent id is known
+            seen = {}
+            for directory in crawl(root, known, workers, cancel):
+                counters["directories"] += 1
+                directory_id = ids.get(directory.relpath)
+                if directory.listed:
+                    parent_id = seen.get(os.path.dirname(directory.relpath)) if directory.relpath else None
+                    directory_id = self._store_directory(root_id, parent_id, directory, directory_id)
+                    counters["listed"] += 1
+                seen[directory.relpath] = directory_id
+
+            kept = set(seen.values())
+            gone = [(directory_id,) for directory_id in ids.values() if directory_id not in kept]
+            connection.executemany("DELETE FROM files WHERE directory_id = ?", gone)
+            connection.executemany("DELETE FROM directories WHERE id = ?", gone)
+            connection.execute("UPDATE roots SET refreshed = ? WHERE id = ?", (time.time(), root_id))
+        with _refreshed_roots_lock:
+            _refreshed_roots.add(_root_key(root))
+
+        counters["seconds"] = time.perf_counter() - start
+        logger.info("Media library: %s, %d folders (%d listed) in %.2fs",
+                    root, counters["directories"], counters["listed"], counters["seconds"])
+        return counters
+
+    def refresh_once(self, root, cancel=None):
+        """
+        Refresh root unless this process (or the batch that started it)
+        already did. Conversions call this, so a batch lists every root
+        once however many files it converts.
+        """
+        with _refreshed_roots_lock:
+            refreshed = _root_key(root) in _refreshed_roots
+        if not refreshed or self._root(root) is None:
+            self.refresh(root, cancel)
+
+    def matcher(self, root, cancel=None):
+        """A LibraryMatcher for root, after refresh_once(root)."""
+        self.refresh_once(root, cancel)
+        return LibraryMatcher(self.connection, self._root(root)[0], root)
+
+
+class LibraryMatcher:
+    """Finds media by name anywhere in the folder tree of one library root."""
+
+    def __init__(self, connection, root_id, root):
+        self.connection = connection
+        self.root_id = root_id
+        self.root = root
+        # base name -> [(relpath, name, extension, kind)]
+        self._candidates = {}
+
+    def _lookup(self, base):
+        candidates = self._candidates.get(base)
+        if candidates is None:
+            candidates = self._candidates[base] = self.connection.execute(
+                "SELECT d.relpath, f.name, f.extension, f.kind FROM files f "
+                "JOIN directories d ON d.id = f.directory_id "
+                "WHERE f.base = ? AND d.root_id = ? ORDER BY d.relpath, f.name",
+                (base, self.root_id)).fetchall()
+        return candidates
+
+    def contains(self, path):
+        """True when path (a file somewhere under the root) is in the library."""
+        try:
+            relative = os.path.relpath(os.path.abspath(path), os.path.abspath(self.root))
+        except ValueError:
+            return False  # Another drive
+        parts = _path_parts(relative)
+        if not parts or parts[0] == "..":
+            return False
+        base = os.path.splitext(parts[-1])[0].lower()
+        relpath = os.path.join(*parts[:-1]) if len(parts) > 1 else ""
+        name = parts[-1].lower()
+        return any(candidate_relpath == relpath and candidate_name.lower() == name
+                   for candidate_relpath, candidate_name, _extension, _kind in self._lookup(base))
+
+    def match(self, old_file_path, ignore_extensions=False):
+        """
+        Path under the root of the file with the base name of old_file_path
+        and the same extension (or, with ignore_extensions, the same kind),
+        or None. When several folders hold one, the folder whose trailing
+        names agree most with the old path's folders wins, then a same
+        extension, then the shallowest folder.
+        """
+        old_parts = _path_parts(old_file_path)
+        if not old_parts:
+            return None
+        base, extension = os.path.splitext(old_parts[-1])
+        extension = extension.lower()
+        kind = media_kind(extension) if ignore_extensions else None
+
+        best = None
+        for relpath, name, candidate_extension, candidate_kind in self._lookup(base.lower()):
+            same_extension = candidate_extension == extension
+            if not same_extension and (kind is None or candidate_kind != kind):
+                continue
+            directory_parts = _path_parts(relpath)
+            rank = (-_common_tail(old_parts[:-1], directory_parts), not same_extension, len(directory_parts))
+            if best is None or rank < best[0]:
+                best = (rank, relpath, name)
+        if best is None:
+            return None
+        _rank, relpath, name = best
+        return os.path.join(self.root, relpath, name) if relpath else os.path.join(self.root, name)
@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# memory_budget.py - Memory ceiling for conversions, with a streaming fallback
+
+import ctypes
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+
+from conversion_log import get_logger
+from xml_backend import resolve_backend
+
+logger = get_logger("memory")
+
+# Default ceiling for conversions, e.g. RCC_MEMORY_LIMIT=1.5G
+MEMORY_LIMIT_ENV_VAR = "RCC_MEMORY_LIMIT"
+
+# Memory a full-document conversion needs per byte of input. Measured on
+# synthetic compositions: the ElementTree DOM takes about 9.3 times the file
+# size, lxml about 12.4 times.
+DOM_BYTES_PER_INPUT_BYTE = {"etree": 10, "lxml": 13}
+
+# Seconds between two memory samples
+SAMPLE_INTERVAL = 0.05
+
+_SIZE_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([kmgt]?)i?b?\s*$", re.IGNORECASE)
+_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3, "t": 1024 ** 4}
+
+
+class MemoryBudgetExceeded(Exception):
+    """Raised while a full document is parsed once memory use passes the limit."""
+
+
+def parse_memory_size(text):
+    """Bytes in a size like 512M, 2G or 1.5GB (binary units); ValueError when invalid."""
+    match = _SIZE_RE.match(str(text))
+    if match is None:
+        raise ValueError(f"Invalid memory size: {text!r} (use e.g. 512M or 2G)")
+    size = int(float(match.group(1)) * _UNITS[match.group(2).lower()])
+    if size <= 0:
+        raise ValueError(f"Memory size must be positive: {text!r}")
+    return size
+
+
+def memory_limit_from_env():
+    """The limit set in RCC_MEMORY_LIMIT in bytes, or None."""
+    value = os.environ.get(MEMORY_LIMIT_ENV_VAR)
+    if not value:
+        return None
+    try:
+        return parse_memory_size(value)
+    except ValueError as e:
+        logger.warning("Ignoring %s: %s", MEMORY_LIMIT_ENV_VAR, e)
+        return None
+
+
+def _format_mb(size):
+    return f"{size / (1024 * 1024):.0f} MB"
+
+
+def _linux_memory():
+    with open("/proc/self/statm", "rb") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+class _ProcessMemoryCounters(ctypes.Structure):
+    _fields_ = [("cb", ctypes.c_uint32), ("PageFaultCount", ctypes.c_uint32)] + [
+        (name, ctypes.c_size_t) for name in (
+            "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage",
+            "QuotaPagedPoolUsage", "QuotaPeakNonPagedPoolUsage",
+            "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+
+
+def _windows_memory():
+    kernel32 = ctypes.windll.kernel32
+    kernel32.GetCurrentProcess.restype = ctypes.c_void_p
+    get_info = kernel32.K32GetProcessMemoryInfo
+    get_info.argtypes = (ctypes.c_void_p, ctypes.POINTER(_ProcessMemoryCounters), ctypes.c_uint32)
+    counters = _ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    if not get_info(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+        raise OSError("GetProcessMemoryInfo failed")
+    return counters.WorkingSetSize
+
+
+class _MachTaskBasicInfo(ctypes.Structure):
+    _fields_ = [("virtual_size", ctypes.c_uint64), ("resident_size", ctypes.c_uint64),
+                ("resident_size_max", ctypes.c_uint64), ("user_time", ctypes.c_int32 * 2),
+                ("system_time", ctypes.c_int32 * 2), ("policy", ctypes.c_int32),
+                ("suspend_count", ctypes.c_int32)]
+
+
+def _macos_memory():
+    libc = ctypes.CDLL("/usr/lib/libSystem.B.dylib")
+    task = ctypes.c_uint32.in_dll(libc, "mach_task_self_")
+    info = _MachTaskBasicInfo()
+    count = ctypes.c_uint32(ctypes.sizeof(info) // 4)
+    # task_info(mach_task_self(), MACH_TASK_BASIC_INFO, ...)
+    if libc.task_info(task, 20, ctypes.byref(info), ctypes.byref(count)) != 0:
+        raise OSError("task_info failed")
+    return info.resident_size
+
+
+def _peak_memory():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+_memory_reader = None
+
+
+def process_memory():
+    """
+    Resident memory of this process in bytes, or None when it cannot be
+    measured. Falls back to the peak resident size on systems without a
+    cheap way to read the current one.
+    """
+    global _memory_reader
+    if _memory_reader is None:
+        if sys.platform.startswith("linux"):
+            candidates = (_linux_memory, _peak_memory)
+        elif sys.platform == "win32":
+            candidates = (_windows_memory,)
+        elif sys.platform == "darwin":
+            candidates = (_macos_memory, _peak_memory)
+        else:
+            candidates = (_peak_memory,)
+        _memory_reader = lambda: None
+        for reader in candidates:
+            try:
+                reader()
+            except (OSError, AttributeError, ImportError, ValueError):
+                continue
+            _memory_reader = reader
+            break
+    try:
+        return _memory_reader()
+    except (OSError, ValueError):
+        return None
+
+
+class _GuardedToken:
+    """
+    Stands in for the CancellationToken of a conversion: every check() also
+    samples the memory in use.
+    """
+
+    def __init__(self, budget, cancel):
+        self.budget = budget
+        self.cancel = cancel
+
+    @property
+    def cancelled(self):
+        return self.cancel is not None and self.cancel.cancelled
+
+    def check(self):
+        if self.cancel is not None:
+            self.cancel.check()
+        self.budget.sample()
+
+
+class MemoryBudget:
+    """
+    A memory ceiling for one conversion, in bytes of resident memory above
+    what the process used when the conversion started.
+
+    plan() estimates what the full document would cost from the size of the
+    input file and picks the streaming conversion when that estimate does
+    not fit. During the conversion the memory in use is sampled at the
+    engine's cancellation checks (every chunk read, clip, path and chunk
+    written); while the full document is being parsed, passing the limit
+    stops the parse and the conversion starts over in streaming mode. Once
+    the document is in memory the limit is no longer enforced: stopping
+    would not give anything back.
+
+    Afterwards strategy ("dom", "decks" or "streaming"), estimate, peak and
+    fallback (why the strategy was changed, or None) describe what happened.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.strategy = None
+        self.estimate = None
+        self.peak = 0
+        self.fallback = None
+        self._baseline = None
+        self._last_sample = 0.0
+        self._enforcing = False
+
+    def plan(self, input_file, strategy="dom", xml_backend=None):
+        """
+        Return strategy, or "streaming" when the estimated cost of loading
+        input_file whole is over the limit.
+        """
+        backend = resolve_backend(xml_backend) if strategy == "dom" else "etree"
+        self.estimate = os.path.getsize(input_file) * DOM_BYTES_PER_INPUT_BYTE[backend]
+        if strategy != "streaming" and self.estimate > self.limit:
+            self.switch_to_streaming(f"estimated {_format_mb(self.estimate)} for the whole document")
+        else:
+            self.strategy = strategy
+        return self.strategy
+
+    def switch_to_streaming(self, reason):
+        self.strategy = "streaming"
+        self.fallback = f"{reason}, limit {_format_mb(self.limit)}"
+        logger.warning("Using the low-memory streaming conversion: %s.", self.fallback)
+
+    def start(self):
+        """Measure from here; later calls keep the first starting point."""
+        if self._baseline is None:
+            self._baseline = process_memory() or 0
+            self._last_sample = time.monotonic()
+
+    def sample(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_sample < SAMPLE_INTERVAL:
+            return
+        self._last_sample = now
+        current = process_memory()
+        if current is None or self._baseline is None:
+            return
+        used = max(0, current - self._baseline)
+        self.peak = max(self.peak, used)
+        if self._enforcing and used > self.limit:
+            raise MemoryBudgetExceeded(
+                f"{_format_mb(used)} in use while loading the whole document")
+
+    @contextmanager
+    def enforce(self):
+        """Raise MemoryBudgetExceeded from sample() while the block runs."""
+        self._enforcing = True
+        try:
+            yield
+        finally:
+            self._enforcing = False
+
+    def guard(self, cancel=None):
+        """A token to hand to the engine in place of cancel (a CancellationToken or None)."""
+        return _GuardedToken(self, cancel)
+
+    def as_dict(self):
+        return {
+            "strategy": self.strategy,
+            "limit_bytes": self.limit,
+            "estimate_bytes": self.estimate,
+            "peak_bytes": self.peak,
+            "fallback": self.fallback,
+        }
+
+    def format(self):
+        text = f"Strategy: {self.strategy}, peak {_format_mb(self.peak)} of {_format_mb(self.limit)}"
+        if self.fallback:
+            text += f"\nSwitched to streaming: {self.fallback}"
+        return text
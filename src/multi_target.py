@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# multi_target.py - Convert one composition into several outputs from a single parse
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from conversion_engine import (
+    ChangeJournal, ChangeManifest, CompositionConverter, CompositionVisitor, ParsedComposition,
+    format_summary, _parse_file, _write_tree,
+)
+from conversion_cancel import ConversionCancelled
+from conversion_metrics import PhaseMetrics
+
+# Parsed document handed to forked workers; set only while a pool is running
+_shared = None
+
+
+def _convert_target(input_file, tree, visitor, target, output_backend, cancel=None):
+    """Apply one target to the shared tree, write it and undo the changes again."""
+    options = dict(target)
+    output_file = options.pop("output_file")
+    manifest_file = options.pop("manifest_file", None)
+    result = {
+        "output": output_file,
+        "ok": False,
+        "cancelled": False,
+        "error": None,
+        "stats": None,
+        "summary": None,
+        "phases": None,
+        "seconds": 0.0,
+    }
+    start = time.perf_counter()
+    journal = ChangeJournal()
+    metrics = PhaseMetrics()
+    manifest_out = None
+    converter = None
+    try:
+        if manifest_file:
+            manifest_out = open(manifest_file, "w", encoding="utf-8")
+        converter = CompositionConverter(
+            journal=journal, metrics=metrics,
+            manifest=ChangeManifest(manifest_out) if manifest_out is not None else None,
+            cancel=cancel, **options)
+        stats = converter.apply(tree.getroot(), visitor)
+        with converter.phase("write"):
+            _write_tree(tree, input_file, output_file,
+                        journal if output_backend == "splice" else None, cancel)
+        result["stats"] = stats
+        result["summary"] = format_summary(stats, output_file, options.get("ignore_extensions", False), metrics)
+        result["ok"] = True
+    except ConversionCancelled as e:
+        result["cancelled"] = True
+        result["error"] = str(e)
+        if manifest_out is not None:
+            manifest_out.close()
+            manifest_out = None
+            try:
+                os.remove(manifest_file)
+            except OSError:
+                pass
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        journal.rollback()
+        if converter is not None:
+            converter.close()
+        if manifest_out is not None:
+            manifest_out.close()
+        result["phases"] = metrics.as_dict()
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def _convert_shared_target(target):
+    input_file, tree, visitor, output_backend, cancel = _shared
+    return _convert_target(input_file, tree, visitor, target, output_backend, cancel)
+
+
+def convert_targets(input_file, targets, workers=1, output_backend="etree", xml_backend=None,
+                    cancel=None):
+    """
+    Convert input_file into several outputs while parsing and walking it once.
+
+    targets is a list of dicts with an "output_file" key plus any of the
+    conversion keyword arguments of adjust_composition (resolution_factor,
+    framerate_factor, old_path, new_path, new_name, ignore_extensions,
+    effect_position_policy, search_subfolders, path_mapping) and optionally "manifest_file" for a JSON-lines
+    change manifest. Every target starts from the original document:
+    the attributes a target changes are recorded in a ChangeJournal and rolled
+    back before the next target runs.
+
+    With workers > 1 the targets run in forked processes that inherit the
+    parsed document. Where fork is not available (Windows) the targets run one
+    after the other in this process, which still saves the repeated parsing.
+
+    input_file may also be a ParsedComposition, whose tree and visitor are
+    reused.
+
+    cancel is an optional CancellationToken; forked workers inherit it.
+    Once it is cancelled every target that is not finished yet stops, its
+    partial output is removed and its result is marked cancelled.
+
+    Returns one result dict per target, in target order, with the keys
+    output, ok, cancelled, error, stats, summary, phases
+    (PhaseMetrics.as_dict(); the shared parse is not included) and seconds.
+    """
+    global _shared
+
+    if isinstance(input_file, ParsedComposition):
+        composition = input_file
+        input_file, tree, visitor = composition.path, composition.tree, composition.visitor
+    else:
+        tree = _parse_file(input_file, xml_backend, cancel=cancel)
+        visitor = CompositionVisitor(tree.getroot(), cancel=cancel).walk()
+
+    parallel = (workers > 1 and len(targets) > 1 and
+                "fork" in multiprocessing.get_all_start_methods())
+    if not parallel:
+        return [_convert_target(input_file, tree, visitor, target, output_backend, cancel)
+                for target in targets]
+
+    _shared = (input_file, tree, visitor, output_backend, cancel)
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(targets)),
+                                 mp_context=multiprocessing.get_context("fork")) as pool:
+            return list(pool.map(_convert_shared_target, targets))
+    finally:
+        _shared = None
@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+# parallel_decks.py - Convert the decks of a composition in worker processes
+
+import os
+import re
+import signal
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from conversion_cancel import ConversionCancelled
+from conversion_engine import CompositionConverter, CompositionVisitor, _parse_file
+from conversion_log import get_logger
+from media_library import mark_refreshed, refreshed_roots
+from splice_writer import can_splice
+from streaming_converter import XML_DECLARATION
+from xml_backend import write_xml
+
+logger = get_logger("parallel_decks")
+
+_DECK_START_RE = re.compile(rb'<Deck[\s/>]')
+_DECK_END = b"</Deck>"
+_START_TAG_END_RE = re.compile(rb'(?:[^>"\']|"[^"]*"|\'[^\']*\')*>')
+
+# Stands in for a deck while the rest of the document is converted
+SLOT_TAG = "ParallelDeckSlot"
+_SLOT_RE = re.compile(r'<ParallelDeckSlot index="(\d+)" />')
+
+# Converter state that rules for later parts of the document depend on
+_CARRIED_STATE = (
+    "orig_comp_w", "orig_comp_h", "comp_info_seen", "name_param_seen",
+    "top_dims_seen", "comp_name", "processed_transform_ids",
+)
+_CONVERTER_OPTIONS = (
+    "old_path", "new_path", "resolution_factor", "framerate_factor",
+    "new_name", "ignore_extensions", "effect_position_policy", "search_subfolders",
+    "path_mapping",
+)
+
+# The CancellationToken of the conversion a deck worker belongs to
+_worker_cancel = None
+
+
+def _init_worker(cancel, library_roots=()):
+    """
+    Deck workers leave Ctrl+C to the process that started them and watch
+    cancel instead. library_roots were refreshed by that process.
+    """
+    global _worker_cancel
+    _worker_cancel = cancel
+    mark_refreshed(library_roots)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _split_decks(data):
+    """
+    Cut every Deck with content out of data. Returns (skeleton, chunks) where
+    the skeleton has a numbered slot element in place of each deck, or None
+    when the document cannot be split safely.
+    """
+    pieces = []
+    chunks = []
+    position = 0
+    for match in _DECK_START_RE.finditer(data):
+        start = match.start()
+        if start < position:
+            return None  # A Deck inside a Deck
+        tag_end = _START_TAG_END_RE.match(data, match.end() - 1)
+        if tag_end is None:
+            return None
+        if data[tag_end.end() - 2:tag_end.end()] == b"/>":
+            continue  # Empty decks stay in the skeleton
+        end = data.find(_DECK_END, tag_end.end())
+        if end < 0:
+            return None
+        end += len(_DECK_END)
+        pieces.append(data[position:start])
+        pieces.append(f'<{SLOT_TAG} index="{len(chunks)}"/>'.encode("ascii"))
+        chunks.append(data[start:end])
+        position = end
+    pieces.append(data[position:])
+    return b"".join(pieces), chunks
+
+
+def _globals_precede_decks(root, visitor, first_slot):
+    """
+    True when everything the deck rules depend on (composition info, the
+    composition name param and the top-level VideoTrack size) appears before
+    the first deck, so converting the decks last gives the serial result.
+    """
+    if visitor.comp_info is None or visitor.name_param is None or visitor.top_dims is None:
+        return False
+    order = {elem: index for index, elem in enumerate(root.iter())}
+    needed = [visitor.comp_info, visitor.name_param]
+    needed += [param for param in visitor.top_dims.values() if param is not None]
+    return all(order[elem] < order[first_slot] for elem in needed)
+
+
+def _structural_ids(visitor):
+    """uniqueIds of the transforms reached by the layer/group/clip rules."""
+    records = list(visitor.comp_transforms)
+    for container in visitor.layers + visitor.groups + visitor.clips:
+        records.extend(container["transforms"])
+    return {record["element"].get("uniqueId") for record in records} - {None}
+
+
+def _convert_deck(chunk, root_tag, options, state):
+    """
+    Convert one deck in a worker process. Returns (markup, stats,
+    structural_ids, sweep_ids) so the caller can check that the final
+    transform sweep made the same decisions it would have made serially.
+    """
+    deck = ET.fromstring(chunk)
+    root = ET.Element(root_tag)
+    root.append(deck)
+    converter = CompositionConverter(cancel=_worker_cancel, **options)
+    for name, value in state.items():
+        setattr(converter, name, value)
+    known_ids = set(converter.processed_transform_ids)
+    visitor = CompositionVisitor(root, cancel=_worker_cancel).walk_subtree(deck, (root,))
+    try:
+        stats = converter.apply(root, visitor)
+    finally:
+        converter.close()
+    structural_ids = _structural_ids(visitor)
+    sweep_ids = converter.processed_transform_ids - known_ids - structural_ids
+    return ET.tostring(deck, encoding="unicode"), stats, structural_ids, sweep_ids
+
+
+def _sweep_matches_serial(global_sweep_ids, deck_results):
+    """
+    The final sweep skips transforms whose uniqueId was already handled
+    anywhere in the document. Decks only know about their own ids, so the
+    result only matches serial conversion when no id is shared between a
+    swept transform and a transform in another deck (or the global sweep).
+    """
+    structural = set()
+    for _markup, _stats, structural_ids, _deck_sweep in deck_results:
+        structural |= structural_ids
+    if global_sweep_ids & structural:
+        return False
+    swept = set(global_sweep_ids)
+    for _markup, _stats, _deck_structural, sweep_ids in deck_results:
+        if sweep_ids & structural or sweep_ids & swept:
+            return False
+        swept |= sweep_ids
+    return True
+
+
+def _convert_serially(input_file, output_file, converter):
+    logger.info("Converting decks serially: the document cannot be split at deck boundaries.")
+    tree = _parse_file(input_file, "etree", cancel=converter.cancel)
+    stats = converter.convert(tree.getroot())
+    write_xml(tree, output_file, converter.cancel)
+    return stats
+
+
+def convert_decks_parallel(input_file, output_file, converter, workers=None):
+    """
+    Convert input_file into output_file with converter (a
+    CompositionConverter), running every Deck in a worker process.
+
+    The rest of the document is converted first in this process; the decks
+    then start from the converter state that serial conversion would have
+    reached, and their results are stitched back in original order. When the
+    document does not allow this (no UTF-8, decks before the composition
+    info, unexpected nesting) the whole file is converted serially instead.
+    Returns the converter's stats counters.
+
+    The converter's CancellationToken reaches the workers too: once it is
+    cancelled, decks that have not started are dropped, running decks stop
+    at their next clip and ConversionCancelled is raised.
+    """
+    with open(input_file, "rb") as f:
+        data = f.read()
+
+    split = _split_decks(data) if can_splice(input_file) else None
+    root = slots = visitor = None
+    if split is not None and split[1]:
+        skeleton, chunks = split
+        del data
+        root = ET.fromstring(skeleton)
+        slots = list(root.iter(SLOT_TAG))
+        children = set(root)
+        if len(slots) == len(chunks) and all(slot in children for slot in slots):
+            visitor = CompositionVisitor(root).walk()
+            if not _globals_precede_decks(root, visitor, slots[0]):
+                visitor = None
+
+    if visitor is None:
+        return _convert_serially(input_file, output_file, converter)
+
+    options = {name: getattr(converter, name) for name in _CONVERTER_OPTIONS}
+    fresh_state = {name: getattr(converter, name) for name in _CARRIED_STATE}
+    fresh_state["processed_transform_ids"] = set()
+    stats = converter.apply(root, visitor)
+    global_sweep_ids = converter.processed_transform_ids - _structural_ids(visitor)
+    state = {name: getattr(converter, name) for name in _CARRIED_STATE}
+
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(chunks) // (workers * 4))
+    cancel = converter.cancel
+    if cancel is not None:
+        cancel.check()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(cancel, refreshed_roots())) as pool:
+        results = []
+        try:
+            for result in pool.map(_convert_deck, chunks, repeat(root.tag),
+                                   repeat(options), repeat(state), chunksize=chunksize):
+                results.append(result)
+                if cancel is not None:
+                    cancel.check()
+                if converter.progress is not None:
+                    converter.progress.advance(len(results), len(chunks))
+        except ConversionCancelled:
+            pool.shutdown(cancel_futures=True)
+            raise
+
+    if not _sweep_matches_serial(global_sweep_ids, results):
+        # Rare: transforms share uniqueIds across decks. Start over serially.
+        for name, value in fresh_state.items():
+            setattr(converter, name, value)
+        converter.stats.pop("path_rules", None)
+        for key in converter.stats:
+            converter.stats[key] = 0
+        return _convert_serially(input_file, output_file, converter)
+
+    decks = []
+    for markup, deck_stats, _deck_structural, _deck_sweep in results:
+        decks.append(markup)
+        for key, value in deck_stats.items():
+            if key == "path_rules":
+                rules = stats.setdefault(key, {})
+                for label, count in value.items():
+                    rules[label] = rules.get(label, 0) + count
+            else:
+                stats[key] += value
+
+    markup = _SLOT_RE.sub(lambda match: decks[int(match.group(1))],
+                          ET.tostring(root, encoding="unicode"))
+    if cancel is not None:
+        cancel.check()
+    try:
+        # Opened the way ElementTree.write opens files
+        with open(output_file, "w", encoding="utf-8", errors="xmlcharrefreplace") as out:
+            out.write(XML_DECLARATION)
+            out.write(markup)
+    except BaseException:
+        try:
+            os.remove(output_file)
+        except OSError:
+            pass
+        raise
+    return stats
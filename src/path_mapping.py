@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# path_mapping.py - Table of old -> new media folders, matched by longest prefix
+
+import csv
+import json
+import os
+import re
+
+from conversion_log import get_logger
+
+logger = get_logger("path_mapping")
+
+_SEPARATORS_RE = re.compile(r"[\\/]")
+# Drive letter and leading separators: C:\, /, \\server (UNC) or nothing
+_ANCHOR_RE = re.compile(r"(?:[A-Za-z]:)?[\\/]*")
+
+
+def _components(path):
+    """
+    The anchor of path followed by its folder and file names, without empty
+    and "." parts. The anchor keeps absolute and relative paths apart: ""
+    for a relative path, "/" for a root, "//" for a network share and the
+    drive for a drive letter ("C:/", or "C:" for a drive-relative path).
+    """
+    anchor = _ANCHOR_RE.match(path).group()
+    separators = len(anchor) - (2 if anchor[1:2] == ":" else 0)
+    key = anchor[:2] if anchor[1:2] == ":" else ""
+    key += "//" if separators > 1 and not key else "/" if separators else ""
+    names = [part for part in _SEPARATORS_RE.split(path[len(anchor):]) if part and part != "."]
+    return [key] + names
+
+
+class PathRule:
+    """One old -> new folder pair of a PathMapping."""
+
+    __slots__ = ("old", "new", "label", "_root", "_separator")
+
+    def __init__(self, old, new):
+        if not any(_components(old)):
+            raise ValueError(f"Path mapping rule needs an old folder: {old!r} -> {new!r}")
+        if not new:
+            raise ValueError(f"Path mapping rule needs a new folder: {old!r} -> {new!r}")
+        self.old = old
+        self.new = new
+        self.label = f"{old} -> {new}"
+        # New paths use the separator of the new folder (D:\Media -> backslashes)
+        self._separator = "\\" if "\\" in new and "/" not in new else "/"
+        self._root = new.rstrip("\\/") or new[:1]
+
+    def apply(self, remainder):
+        """The new path for the components below the old folder."""
+        if not remainder:
+            return self._root
+        root = self._root if self._root[-1:] not in ("\\", "/") else self._root[:-1]
+        return root + self._separator + self._separator.join(remainder)
+
+
+class PathMapping:
+    """
+    Many old -> new media folders, e.g. one per artist or a drive that moved
+    from /Users/vj/Media to D:\\Media.
+
+    The old folders are compiled into a trie of path components, so a path
+    is resolved in one walk over its own components, however many rules
+    there are. Components are compared case-insensitively and both / and \\
+    separate them; an absolute old folder only matches absolute paths and a
+    relative one only relative paths. When old folders are nested the
+    longest one wins.
+    """
+
+    def __init__(self, rules):
+        self.rules = []
+        # component -> [children, rule]
+        self._trie = {}
+        for old, new in rules:
+            rule = PathRule(old, new)
+            children = self._trie
+            node = None
+            for component in _components(old):
+                node = children.setdefault(component.casefold(), [{}, None])
+                children = node[0]
+            if node[1] is not None:
+                raise ValueError(f"Duplicate path mapping rule for {old!r} "
+                                 f"(also {node[1].old!r} -> {node[1].new!r})")
+            node[1] = rule
+            self.rules.append(rule)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def resolve(self, file_path):
+        """(new path, PathRule) for file_path, or (file_path, None) when no rule matches."""
+        components = _components(file_path)
+        children = self._trie
+        match = None
+        for depth, component in enumerate(components):
+            node = children.get(component.casefold())
+            if node is None:
+                break
+            if node[1] is not None:
+                match = (depth + 1, node[1])
+            children = node[0]
+        if match is None:
+            return file_path, None
+        depth, rule = match
+        return rule.apply(components[depth:]), rule
+
+
+def load_path_mapping(path):
+    """
+    Read a PathMapping from a JSON or CSV file.
+
+    JSON: an object {"old": "new", ...} or a list of {"old": ..., "new": ...}
+    objects or [old, new] pairs. CSV (any other extension): one old,new pair
+    per row; an "old,new" header row, empty rows and rows starting with #
+    are skipped. Raises ValueError for invalid tables.
+    """
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if os.path.splitext(path)[1].lower() == ".json":
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid path mapping file {path}: {e}") from e
+            pairs = _json_pairs(data, path)
+        else:
+            pairs = []
+            for number, row in enumerate(csv.reader(f), 1):
+                if not row or not "".join(row).strip() or row[0].lstrip().startswith("#"):
+                    continue
+                if number == 1 and [cell.strip().lower() for cell in row[:2]] == ["old", "new"]:
+                    continue
+                if len(row) != 2:
+                    raise ValueError(f"{path}, line {number}: expected old,new but got {len(row)} columns")
+                pairs.append((row[0].strip(), row[1].strip()))
+    mapping = PathMapping(pairs)
+    logger.info("Loaded %d path mapping rules from %s", len(mapping), path)
+    return mapping
+
+
+def _json_pairs(data, path):
+    if isinstance(data, dict):
+        for old, new in data.items():
+            if not isinstance(old, str) or not isinstance(new, str):
+                raise ValueError(f"{path}: invalid rule {old!r}: {new!r}")
+        return list(data.items())
+    if not isinstance(data, list):
+        raise ValueError(f"{path}: expected an object or a list of rules")
+    pairs = []
+    for entry in data:
+        if isinstance(entry, dict) and isinstance(entry.get("old"), str) and isinstance(entry.get("new"), str):
+            pairs.append((entry["old"], entry["new"]))
+        elif isinstance(entry, list) and len(entry) == 2 and all(isinstance(value, str) for value in entry):
+            pairs.append(tuple(entry))
+        else:
+            raise ValueError(f"{path}: invalid rule {entry!r}")
+    return pairs
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# prometheus_metrics.py - Prometheus textfile export for batch conversion runs
+
+import os
+import tempfile
+import time
+
+METRIC_PREFIX = "resolume_converter"
+
+# Upper bounds of the histogram buckets
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+SIZE_BUCKETS = tuple(megabytes * 1024 * 1024 for megabytes in (1, 5, 10, 25, 50, 100, 250, 500, 1000))
+
+# The stats counters of a conversion, exported as <prefix>_<name>_total
+STAT_HELP = {
+    "clips_modified": "Clips processed.",
+    "transforms_processed": "Transform effects processed.",
+    "transforms_adjusted": "Transform effects adjusted.",
+    "position_ranges_adjusted": "Effect position ranges adjusted.",
+    "durations_adjusted": "Clip durations adjusted.",
+    "custom_durations_preserved": "User-edited clip durations preserved.",
+    "paths_updated": "Media file paths updated.",
+    "text_components_found": "Text components found.",
+}
+
+# name: (type, help); counters and histograms add up over runs, gauges are replaced
+FAMILIES = {
+    "files_total": ("counter", "Converted output files by status (converted, failed, cancelled)."),
+    "file_duration_seconds": ("histogram", "Conversion time per output file."),
+    "input_size_bytes": ("histogram", "Size of each input composition."),
+    "last_batch_duration_seconds": ("gauge", "Wall time of the last batch run."),
+    "last_batch_timestamp_seconds": ("gauge", "Unix time the last batch run finished."),
+}
+FAMILIES.update((f"{name}_total", ("counter", help_text)) for name, help_text in STAT_HELP.items())
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _family(sample_name):
+    """The family a sample belongs to (histogram samples end in _bucket, _sum or _count)."""
+    name = sample_name[len(METRIC_PREFIX) + 1:]
+    if name in FAMILIES:
+        return name
+    for suffix in ("_bucket", "_sum", "_count"):
+        if name.endswith(suffix) and FAMILIES.get(name[:-len(suffix)], ("",))[0] == "histogram":
+            return name[:-len(suffix)]
+    return None
+
+
+class BatchMetrics:
+    """
+    Counters and histograms of batch conversions in the Prometheus text
+    format, for node_exporter's textfile collector (or anything else that
+    reads such a file).
+
+    load() reads the file a previous run wrote, so counters and histograms
+    keep adding up from run to run as Prometheus expects; delete the file to
+    start from zero. Gauges describe the last run only.
+    """
+
+    def __init__(self):
+        # family -> {sample (name with labels): value}, in insertion order
+        self.samples = {family: {} for family in FAMILIES}
+
+    def _add(self, family, sample, value):
+        samples = self.samples[family]
+        samples[sample] = samples.get(sample, 0) + value
+
+    def _observe(self, family, buckets, value):
+        name = f"{METRIC_PREFIX}_{family}"
+        for bound in buckets:
+            self._add(family, f'{name}_bucket{{le="{_format_value(bound)}"}}', 1 if value <= bound else 0)
+        self._add(family, f'{name}_bucket{{le="+Inf"}}', 1)
+        self._add(family, f"{name}_sum", value)
+        self._add(family, f"{name}_count", 1)
+
+    def load(self, path):
+        """Add the samples of an earlier textfile; a missing file is fine."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return self
+        for line in lines:
+            if not line or line.startswith("#"):
+                continue
+            sample, _, value = line.rpartition(" ")
+            family = _family(sample.split("{", 1)[0])
+            if family is None or FAMILIES[family][0] == "gauge":
+                continue
+            try:
+                self._add(family, sample, float(value))
+            except ValueError:
+                continue
+        return self
+
+    def add_results(self, results, elapsed):
+        """Count one batch: the result dicts of resolume_cli.run_batch and its wall time."""
+        input_sizes = {}
+        for result in results:
+            status = "converted" if result["ok"] else "cancelled" if result.get("cancelled") else "failed"
+            self._add("files_total", f'{METRIC_PREFIX}_files_total{{status="{status}"}}', 1)
+            for key, value in (result["stats"] or {}).items():
+                if key in STAT_HELP:
+                    self._add(f"{key}_total", f"{METRIC_PREFIX}_{key}_total", value)
+            if result["ok"]:
+                self._observe("file_duration_seconds", LATENCY_BUCKETS, result["seconds"])
+                input_sizes[result["input"]] = result["bytes"]
+        for size in input_sizes.values():
+            self._observe("input_size_bytes", SIZE_BUCKETS, size)
+
+        self.samples["last_batch_duration_seconds"] = {
+            f"{METRIC_PREFIX}_last_batch_duration_seconds": round(elapsed, 6)}
+        self.samples["last_batch_timestamp_seconds"] = {
+            f"{METRIC_PREFIX}_last_batch_timestamp_seconds": round(time.time(), 3)}
+        return self
+
+    def format(self):
+        lines = []
+        for family, samples in self.samples.items():
+            if not samples:
+                continue
+            kind, help_text = FAMILIES[family]
+            name = f"{METRIC_PREFIX}_{family}"
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample, value in samples.items():
+                lines.append(f"{sample} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """
+        Replace path atomically, so a collector never reads a half-written
+        file.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(prefix=".", suffix=".prom.tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self.format())
+            # mkstemp creates owner-only files; collectors often run as another user
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+
+def write_batch_metrics(path, results, elapsed):
+    """Add a batch run to the Prometheus textfile at path."""
+    BatchMetrics().load(path).add_results(results, elapsed).write(path)
@@ -0,0 +1,629 @@
+#!/usr/bin/env python
+# resolume_cli.py - Headless batch conversion of Resolume compositions
+
+import argparse
+import glob
+import json
+import os
+import signal
+import sys
+import time
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from conversion_cancel import CancellationToken, ConversionCancelled
+from conversion_engine import (
+    convert_composition_file, format_path_rules, load_effect_position_policy, OUTPUT_BACKENDS,
+)
+from conversion_log import configure_logging
+from conversion_metrics import PhaseMetrics
+from conversion_profiler import ConversionProfiler
+from memory_budget import MemoryBudget, memory_limit_from_env, parse_memory_size
+from media_audit import audit_composition, audit_ok, format_audit
+from media_library import MediaLibrary, mark_refreshed, refreshed_roots
+from multi_target import convert_targets
+from path_mapping import load_path_mapping
+from prometheus_metrics import write_batch_metrics
+
+COMPOSITION_EXTENSION = ".avc"
+
+# Exit code after Ctrl+C, as for other interrupted commands
+EXIT_CANCELLED = 130
+
+# The batch's CancellationToken inside pool workers
+_worker_cancel = None
+
+
+def _parse_ratio(value, label):
+    """Accept either a plain factor ("2") or a from:to pair ("1920:3840")."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        if ":" in value:
+            old, new = (float(part) for part in value.split(":", 1))
+            if old == 0:
+                raise argparse.ArgumentTypeError(f"Original {label} must be non-zero")
+            return new / old
+        return float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid {label}: {value}")
+
+
+def _parse_memory_limit(value):
+    try:
+        return parse_memory_size(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def parse_target(spec, framerate):
+    """Parse a --target SUFFIX=RESOLUTION[@FRAMERATE] option."""
+    suffix, separator, settings = spec.partition("=")
+    if not separator or not suffix:
+        raise argparse.ArgumentTypeError(f"Invalid target (expected SUFFIX=RESOLUTION[@FRAMERATE]): {spec}")
+    resolution, _at, target_framerate = settings.partition("@")
+    return {
+        "suffix": suffix,
+        "resolution_factor": _parse_ratio(resolution, "resolution"),
+        "framerate_factor": _parse_ratio(target_framerate, "frame rate") if target_framerate else framerate,
+    }
+
+
+def load_targets(path, framerate):
+    """
+    Read targets from a JSON file: a list of objects with a "suffix" and
+    optionally "resolution", "framerate", "old_path", "new_path",
+    "ignore_extensions" and "search_subfolders".
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    if not isinstance(entries, list):
+        raise argparse.ArgumentTypeError("Targets file must contain a JSON list")
+
+    targets = []
+    for entry in entries:
+        if not isinstance(entry, dict) or not entry.get("suffix"):
+            raise argparse.ArgumentTypeError(f"Every target needs a suffix: {entry}")
+        target = {"suffix": entry["suffix"], "framerate_factor": framerate}
+        if "resolution" in entry:
+            target["resolution_factor"] = _parse_ratio(entry["resolution"], "resolution")
+        if "framerate" in entry:
+            target["framerate_factor"] = _parse_ratio(entry["framerate"], "frame rate")
+        if bool(entry.get("old_path")) != bool(entry.get("new_path")):
+            raise argparse.ArgumentTypeError(f"old_path and new_path must be given together: {entry}")
+        for key in ("old_path", "new_path", "ignore_extensions", "search_subfolders"):
+            if key in entry:
+                target[key] = entry[key]
+        targets.append(target)
+    return targets
+
+
+def collect_inputs(patterns, recursive=False):
+    """
+    Expand files, directories and glob patterns into (input_file, relative_name)
+    pairs. relative_name is the path below the directory it was found in, so
+    the folder structure of a show can be mirrored in the output directory.
+    """
+    found = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            if recursive:
+                matches = glob.glob(os.path.join(glob.escape(pattern), "**", "*" + COMPOSITION_EXTENSION), recursive=True)
+            else:
+                matches = glob.glob(os.path.join(glob.escape(pattern), "*" + COMPOSITION_EXTENSION))
+            for path in sorted(matches):
+                found.append((path, os.path.relpath(path, pattern)))
+        elif os.path.isfile(pattern):
+            found.append((pattern, os.path.basename(pattern)))
+        else:
+            for path in sorted(glob.glob(pattern, recursive=True)):
+                if os.path.isfile(path):
+                    found.append((path, os.path.basename(path)))
+
+    seen = set()
+    unique = []
+    for path, relative_name in found:
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            unique.append((path, relative_name))
+    return unique
+
+
+def plan_outputs(inputs, output_dir=None, suffixes=("_converted",)):
+    """
+    Pair every input with one output path per suffix. Returns a list of
+    (input_file, [output_file, ...]). Raises ValueError on collisions.
+    """
+    jobs = []
+    outputs = {}
+    sources = {os.path.abspath(input_file) for input_file, _relative_name in inputs}
+    for input_file, relative_name in inputs:
+        base, extension = os.path.splitext(relative_name)
+        output_files = []
+        for suffix in suffixes:
+            if output_dir:
+                output_file = os.path.join(output_dir, base + suffix + extension)
+            else:
+                output_file = os.path.join(os.path.dirname(input_file), os.path.basename(base) + suffix + extension)
+
+            key = os.path.abspath(output_file)
+            if key in sources:
+                raise ValueError(f"Converting {input_file} would overwrite the input {output_file}")
+            if key in outputs:
+                raise ValueError(f"{outputs[key]} would be written to {output_file} twice")
+            outputs[key] = input_file
+            output_files.append(output_file)
+        jobs.append((input_file, output_files))
+    return jobs
+
+
+def _failed_results(input_file, output_files, error, cancelled=False):
+    return [{
+        "input": input_file, "output": output_file, "ok": False, "cancelled": cancelled,
+        "error": error, "stats": None, "phases": None, "seconds": 0.0, "bytes": 0,
+        "strategy": None, "memory": None,
+    } for output_file in output_files]
+
+
+def _cancelled_results(input_file, output_files):
+    return _failed_results(input_file, output_files, str(ConversionCancelled()), cancelled=True)
+
+
+def manifest_path(output_file):
+    """The change manifest written next to output_file with --manifest."""
+    return os.path.splitext(output_file)[0] + ".changes.jsonl"
+
+
+def _converted_result(output_file, stats, metrics, start, budget):
+    return {"output": output_file, "ok": True, "cancelled": False, "error": None, "stats": stats,
+            "phases": metrics.as_dict(), "seconds": time.perf_counter() - start,
+            "strategy": budget.strategy if budget is not None else None,
+            "memory": budget.as_dict() if budget is not None else None}
+
+
+def _default_strategy(options):
+    return "streaming" if options["streaming"] else "decks" if options["deck_workers"] > 1 else "dom"
+
+
+def _convert_outputs(input_file, output_files, options, targets, target_workers, cancel=None):
+    # Same rule as the GUI: the composition is named after the output file
+    names = [os.path.splitext(os.path.basename(output_file))[0] for output_file in output_files]
+    options = dict(options)
+    manifest = options.pop("manifest", False)
+    options.pop("audit", None)
+    memory_limit = options.pop("memory_limit", None)
+    budget = MemoryBudget(memory_limit) if memory_limit else None
+    if not targets:
+        start = time.perf_counter()
+        metrics = PhaseMetrics()
+        stats = convert_composition_file(input_file, output_files[0], new_name=names[0],
+                                         metrics=metrics,
+                                         manifest_file=manifest_path(output_files[0]) if manifest else None,
+                                         cancel=cancel, memory_budget=budget, **options)
+        result = _converted_result(output_files[0], stats, metrics, start, budget)
+        result["strategy"] = result["strategy"] or _default_strategy(options)
+        return [result]
+
+    shared = {key: value for key, value in options.items() if key not in ("streaming", "output_backend", "deck_workers", "xml_backend")}
+    target_options = []
+    for output_file, name, target in zip(output_files, names, targets):
+        target_option = dict(shared, output_file=output_file, new_name=name)
+        if manifest:
+            target_option["manifest_file"] = manifest_path(output_file)
+        target_option.update((key, value) for key, value in target.items() if key != "suffix")
+        target_options.append(target_option)
+
+    if budget is not None and budget.plan(input_file, "dom", options["xml_backend"]) == "streaming":
+        # Too large to share one parse between the targets: stream each of them
+        results = []
+        for target_option in target_options:
+            start = time.perf_counter()
+            metrics = PhaseMetrics()
+            try:
+                stats = convert_composition_file(input_file, streaming=True, metrics=metrics,
+                                                 cancel=cancel, memory_budget=budget, **target_option)
+            except ConversionCancelled:
+                raise
+            except Exception as e:
+                results.extend(_failed_results(input_file, [target_option["output_file"]],
+                                               f"{type(e).__name__}: {e}"))
+                continue
+            results.append(_converted_result(target_option["output_file"], stats, metrics, start, budget))
+        return results
+
+    results = convert_targets(input_file, target_options, target_workers,
+                              options["output_backend"], options["xml_backend"], cancel)
+    for result in results:
+        result["strategy"] = "dom"
+        result["memory"] = None
+    return results
+
+
+def refresh_media_library(options, targets=None, cancel=None):
+    """
+    Bring the media library up to date for every new path that is searched
+    with search_subfolders, so the conversions only look files up.
+    """
+    roots = []
+    for target in targets or [{}]:
+        settings = dict(options, **target)
+        if settings.get("search_subfolders") and settings.get("old_path") and settings.get("new_path"):
+            if settings["new_path"] not in roots:
+                roots.append(settings["new_path"])
+    if not roots:
+        return
+    with MediaLibrary() as library:
+        for root in roots:
+            counters = library.refresh(root, cancel=cancel)
+            print(f"Media library: {root} ({counters['directories']} folders, "
+                  f"{counters['listed']} listed) in {counters['seconds']:.2f}s")
+
+
+def convert_one(input_file, output_files, options, verbose=0, targets=None, target_workers=1,
+                profile=False, cancel=None):
+    """
+    Convert a single file into its outputs and return one result dict per
+    output. With targets, the file is parsed once and every target is written
+    from that parse. Runs in a worker process. verbose is the log verbosity
+    (0: warnings only, 1: progress, 2: every changed value). With profile,
+    the conversion is profiled and the .pstats and collapsed-stack files are
+    written next to the first output (also when the conversion fails).
+    cancel is the batch's CancellationToken (in pool workers, the one given
+    to run_batch); a cancelled file gets results marked cancelled and
+    leaves no partial output behind. With options["audit"], the media
+    referenced by every written output is checked (see media_audit.py) and
+    the result is added as "audit".
+    """
+    configure_logging(verbose)
+    if cancel is None:
+        cancel = _worker_cancel
+    if cancel is not None and cancel.cancelled:
+        return _cancelled_results(input_file, output_files)
+    profiler = ConversionProfiler() if profile else None
+    try:
+        size = os.path.getsize(input_file)
+        for output_file in output_files:
+            output_dir = os.path.dirname(output_file)
+            if output_dir:
+                os.makedirs(output_dir, exist_ok=True)
+        with profiler or nullcontext():
+            results = _convert_outputs(input_file, output_files, options, targets, target_workers, cancel)
+        for result in results:
+            result["input"] = input_file
+            result["bytes"] = size
+            result.pop("summary", None)
+            if options.get("audit") and result["ok"]:
+                result["audit"] = audit_composition(result["output"], cancel=cancel)
+    except ConversionCancelled:
+        results = _cancelled_results(input_file, output_files)
+    except Exception as e:
+        results = _failed_results(input_file, output_files, f"{type(e).__name__}: {e}")
+
+    if profiler is not None:
+        try:
+            profile_files = profiler.save(output_files[0])
+        except OSError:
+            profile_files = None
+        for result in results:
+            result["profile"] = profile_files
+    return results
+
+
+def _init_worker(cancel, library_roots=()):
+    """
+    Pool workers leave Ctrl+C to the main process and watch cancel instead.
+    library_roots were refreshed by the main process for this batch.
+    """
+    global _worker_cancel
+    _worker_cancel = cancel
+    mark_refreshed(library_roots)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def run_batch(jobs, options, workers=None, verbose=0, targets=None, on_result=None, profile=False,
+              cancel=None):
+    """
+    Convert (input_file, output_files) jobs across a process pool.
+
+    With workers=1 everything runs in this process. A single input with
+    several targets spreads the targets over the workers instead. on_result
+    is called with each result as it finishes. Returns the results in job
+    order.
+
+    Once cancel (a CancellationToken) is cancelled, running conversions
+    stop, files that have not started are skipped, and both are reported
+    with "cancelled" set in their results.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(jobs) or 1)) if len(jobs) != 1 else max(1, workers)
+
+    if len(jobs) == 1 or workers == 1:
+        target_workers = workers if len(jobs) == 1 else 1
+        results = []
+        for input_file, output_files in jobs:
+            job_results = convert_one(input_file, output_files, options, verbose, targets, target_workers,
+                                      profile, cancel)
+            results.extend(job_results)
+            if on_result:
+                for result in job_results:
+                    on_result(result)
+        return results
+
+    job_results = [None] * len(jobs)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(cancel, refreshed_roots())) as pool:
+        futures = {
+            pool.submit(convert_one, input_file, output_files, options, verbose, targets,
+                        profile=profile): index
+            for index, (input_file, output_files) in enumerate(jobs)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                job_results[index] = future.result()
+            except Exception as e:
+                # The worker itself died (e.g. killed or out of memory)
+                input_file, output_files = jobs[index]
+                job_results[index] = _failed_results(input_file, output_files, f"{type(e).__name__}: {e}")
+            if on_result:
+                for result in job_results[index]:
+                    on_result(result)
+    return [result for results in job_results for result in results]
+
+
+def format_table(results):
+    """Render the per-file result table."""
+    rows = [("File", "Output", "Status", "Mode", "Clips", "Transforms", "Paths", "Size MB", "Seconds")]
+    for result in results:
+        stats = result["stats"] or {}
+        rows.append((
+            result["input"],
+            os.path.basename(result["output"]),
+            "ok" if result["ok"] else "cancelled" if result.get("cancelled") else "FAILED",
+            result.get("strategy") or "-",
+            str(stats.get("clips_modified", "-")),
+            str(stats.get("transforms_adjusted", "-")),
+            str(stats.get("paths_updated", "-")),
+            f"{result['bytes'] / (1024 * 1024):.1f}",
+            f"{result['seconds']:.2f}",
+        ))
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    lines = []
+    for number, row in enumerate(rows):
+        cells = [cell.ljust(width) for cell, width in zip(row[:4], widths[:4])]
+        cells += [cell.rjust(width) for cell, width in zip(row[4:], widths[4:])]
+        lines.append("  ".join(cells))
+        if number == 0:
+            lines.append("  ".join("-" * width for width in widths))
+    for result in results:
+        if not result["ok"] and not result.get("cancelled"):
+            lines.append(f"{result['output']}: {result['error']}")
+    return "\n".join(lines)
+
+
+def format_throughput(results, elapsed):
+    input_sizes = {result["input"]: result["bytes"] for result in results}
+    succeeded = sum(1 for result in results if result["ok"])
+    cancelled = sum(1 for result in results if result.get("cancelled"))
+    megabytes = sum(input_sizes.values()) / (1024 * 1024)
+    files_per_second = len(results) / elapsed if elapsed > 0 else 0.0
+    megabytes_per_second = megabytes / elapsed if elapsed > 0 else 0.0
+    return (
+        f"{succeeded}/{len(results)} converted, {len(results) - succeeded - cancelled} failed, "
+        + (f"{cancelled} cancelled, " if cancelled else "") +
+        f"{len(input_sizes)} input(s), {megabytes:.1f} MB in {elapsed:.2f}s "
+        f"({files_per_second:.2f} files/s, {megabytes_per_second:.1f} MB/s)"
+    )
+
+
+def _total_path_rules(results):
+    """Paths rewritten per path mapping rule, over all results."""
+    totals = {}
+    for result in results:
+        for label, count in ((result["stats"] or {}).get("path_rules") or {}).items():
+            totals[label] = totals.get(label, 0) + count
+    return totals
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Convert Resolume compositions (.avc) in batch without the GUI.")
+    parser.add_argument("inputs", nargs="+",
+                        help="Composition files, directories or glob patterns")
+    parser.add_argument("-o", "--output-dir",
+                        help="Directory for converted files (default: next to each input)")
+    parser.add_argument("--suffix", default="_converted",
+                        help="Added to each output file name (default: _converted)")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="Search directories recursively")
+    parser.add_argument("--resolution", default="2.0", metavar="FACTOR|FROM:TO",
+                        help="Resolution factor, or original:new width (default: 2.0)")
+    parser.add_argument("--framerate", default="2.4", metavar="FACTOR|FROM:TO",
+                        help="Frame rate factor, or original:new fps (default: 2.4)")
+    parser.add_argument("-t", "--target", action="append", default=[], metavar="SUFFIX=RESOLUTION[@FRAMERATE]",
+                        help="Write an extra output per input from the same parse, e.g. _4k=1920:3840@30:60 (repeatable)")
+    parser.add_argument("--targets", metavar="FILE",
+                        help="JSON list of targets with suffix, resolution, framerate and optional paths")
+    parser.add_argument("--old-path", help="Media folder referenced by the compositions")
+    parser.add_argument("--new-path", help="Media folder to point the compositions at")
+    parser.add_argument("--path-map", metavar="FILE",
+                        help="CSV (old,new per line) or JSON table of media folders to move, "
+                             "in place of --old-path/--new-path; the longest matching folder wins")
+    parser.add_argument("--ignore-extensions", action="store_true",
+                        help="Match media by base name so the file format can change")
+    parser.add_argument("--search-subfolders", action="store_true",
+                        help="Find media that moved into subfolders of the new path (indexed in the media library)")
+    parser.add_argument("--policy", metavar="FILE",
+                        help="Effect position policy JSON (default: the rules saved by the GUI)")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Convert with bounded memory (for very large compositions)")
+    parser.add_argument("--output-backend", choices=OUTPUT_BACKENDS, default="etree",
+                        help="How converted files are written (default: etree)")
+    parser.add_argument("--memory-limit", type=_parse_memory_limit, default=memory_limit_from_env(),
+                        metavar="SIZE",
+                        help="Stream every conversion whose whole document would need more memory than "
+                             "this, e.g. 2G (default: $RCC_MEMORY_LIMIT, or no limit)")
+    parser.add_argument("--xml-backend", choices=("lxml", "etree"), default=None,
+                        help="XML library to use (default: lxml when installed)")
+    parser.add_argument("--deck-workers", type=int, default=1, metavar="N",
+                        help="Convert the decks of each composition in N processes (default: 1)")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--audit", action="store_true",
+                        help="Check that the media every output refers to exists, is not empty and "
+                             "has the type its extension says; problems make the exit code 1")
+    parser.add_argument("--manifest", action="store_true",
+                        help="Write every changed attribute to NAME.changes.jsonl next to each output")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile each conversion; writes NAME.pstats and NAME.collapsed.txt "
+                             "(for flamegraph tools) next to each output")
+    parser.add_argument("--metrics-file", metavar="FILE.prom",
+                        help="Add this run's counters and latency/size histograms to a Prometheus textfile")
+    parser.add_argument("-v", "--verbose", action="count", default=0,
+                        help="Show the conversion log of every file (-vv: every changed value)")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        resolution_factor = _parse_ratio(args.resolution, "resolution")
+        framerate_factor = _parse_ratio(args.framerate, "frame rate")
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    if bool(args.old_path) != bool(args.new_path):
+        parser.error("--old-path and --new-path must be given together")
+    if args.path_map and args.old_path:
+        parser.error("--path-map cannot be combined with --old-path/--new-path")
+    if args.ignore_extensions and not (args.old_path or args.path_map):
+        parser.error("--ignore-extensions needs --old-path and --new-path, or --path-map")
+    if args.search_subfolders and not args.old_path:
+        parser.error("--search-subfolders needs --old-path and --new-path")
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.streaming and args.output_backend == "splice":
+        parser.error("--streaming cannot be combined with --output-backend splice")
+    if args.deck_workers < 1:
+        parser.error("--deck-workers must be at least 1")
+    if args.deck_workers > 1 and (args.streaming or args.output_backend != "etree"):
+        parser.error("--deck-workers only works with the etree output backend without streaming")
+    if args.deck_workers > 1 and args.manifest:
+        parser.error("--manifest cannot be combined with --deck-workers")
+
+    try:
+        targets = [parse_target(spec, framerate_factor) for spec in args.target]
+        if args.targets:
+            targets += load_targets(args.targets, framerate_factor)
+    except (OSError, json.JSONDecodeError, argparse.ArgumentTypeError) as e:
+        parser.error(f"Invalid targets: {e}")
+    if targets and (args.streaming or args.deck_workers > 1):
+        parser.error("--streaming and --deck-workers cannot be combined with targets")
+    if args.path_map and any(target.get("old_path") for target in targets):
+        parser.error("--path-map cannot be combined with targets that set their own media paths")
+
+    path_mapping = None
+    if args.path_map:
+        try:
+            path_mapping = load_path_mapping(args.path_map)
+        except (OSError, ValueError) as e:
+            parser.error(f"Could not read path map: {e}")
+
+    if args.policy:
+        try:
+            with open(args.policy, "r", encoding="utf-8") as f:
+                policy = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            parser.error(f"Could not read policy file: {e}")
+        if not isinstance(policy, dict):
+            parser.error("Policy file must contain a JSON object")
+    else:
+        policy = load_effect_position_policy()
+
+    inputs = collect_inputs(args.inputs, args.recursive)
+    if not inputs:
+        parser.error("No composition files found")
+    try:
+        suffixes = [target["suffix"] for target in targets] if targets else [args.suffix]
+        jobs = plan_outputs(inputs, args.output_dir, suffixes)
+    except ValueError as e:
+        parser.error(str(e))
+
+    options = {
+        "old_path": args.old_path,
+        "new_path": args.new_path,
+        "resolution_factor": resolution_factor,
+        "framerate_factor": framerate_factor,
+        "ignore_extensions": args.ignore_extensions,
+        "search_subfolders": args.search_subfolders,
+        "path_mapping": path_mapping,
+        "effect_position_policy": policy,
+        "streaming": args.streaming,
+        "output_backend": args.output_backend,
+        "deck_workers": args.deck_workers,
+        "xml_backend": args.xml_backend,
+        "manifest": args.manifest,
+        "audit": args.audit,
+        "memory_limit": args.memory_limit,
+    }
+
+    if targets:
+        print(f"Converting {len(jobs)} composition(s) into {len(targets)} target(s) each")
+    else:
+        print(f"Converting {len(jobs)} composition(s) "
+              f"(resolution x{resolution_factor:g}, frame rate x{framerate_factor:g})")
+    # The first Ctrl+C stops the batch cleanly, a second one interrupts at once
+    cancel = CancellationToken()
+
+    def on_interrupt(signum, frame):
+        cancel.cancel()
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    previous_handler = signal.signal(signal.SIGINT, on_interrupt)
+    start = time.perf_counter()
+    try:
+        refresh_media_library(options, targets, cancel)
+    except ConversionCancelled:
+        signal.signal(signal.SIGINT, previous_handler)
+        return EXIT_CANCELLED
+    try:
+        results = run_batch(jobs, options, args.workers, args.verbose, targets or None,
+                            profile=args.profile, cancel=cancel)
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+    elapsed = time.perf_counter() - start
+
+    print(format_table(results))
+    print()
+    print(format_throughput(results, elapsed))
+    if path_mapping is not None:
+        print()
+        print(format_path_rules(_total_path_rules(results)))
+    audits = [result for result in results if result.get("audit")]
+    for result in audits:
+        print()
+        print(result["output"])
+        print(format_audit(result["audit"]))
+    if args.profile:
+        profiles = {tuple(result["profile"]) for result in results if result.get("profile")}
+        print()
+        for pstats_file, stacks_file in sorted(profiles):
+            print(f"Profile: {pstats_file}\n         {stacks_file}")
+    if args.metrics_file:
+        try:
+            write_batch_metrics(args.metrics_file, results, elapsed)
+        except OSError as e:
+            print(f"Could not write the metrics file: {e}", file=sys.stderr)
+            return 1
+    if cancel.cancelled:
+        return EXIT_CANCELLED
+    if not all(audit_ok(result["audit"]) for result in audits):
+        return 1
+    return 0 if all(result["ok"] for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
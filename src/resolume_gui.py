@@ -1,849 +1,41 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import xml.etree.ElementTree as ET
 import os
-import re
-import json
 import platform
 import webbrowser
 import threading
+import queue
+from contextlib import nullcontext
 from version import get_version
 import update_checker
+from conversion_engine import (
+    find_matching_file,
+    update_file_paths,
+    load_effect_position_policy,
+    save_effect_position_policy,
+    scan_unknown_position_effects,
+    adjust_composition,
+    forget_composition,
+    load_composition,
+)
+from conversion_log import configure_logging, get_logger
+from conversion_cancel import CancellationToken, ConversionCancelled
+from conversion_metrics import PHASE_LABELS, PhaseMetrics
+from conversion_profiler import ConversionProfiler
+from conversion_progress import ProgressReporter
+from memory_budget import MemoryBudget, MemoryBudgetExceeded, memory_limit_from_env
+from media_audit import audit_composition, format_audit, format_location
+from media_library import MediaLibrary
+
+logger = get_logger("gui")
+
+# Media problems listed in the completion dialog (the counts cover all of them)
+GUI_LISTED_ISSUES = 10
 
 # Disable drag and drop functionality since tkdnd library can't be loaded
 DRAG_DROP_ENABLED = False
 print("Drag and drop functionality disabled.")
 
-def find_matching_file(old_file_path, new_directory, ignore_extensions=False):
-    """
-    Find a matching file in the new directory based on the old file path.
-    
-    Args:
-        old_file_path: Path to the original file
-        new_directory: Directory to search for matching files
-        ignore_extensions: If True, match files with different extensions
-        
-    Returns:
-        Path to the matching file in the new directory, or None if no match found
-    """
-    # Define file type categories for type checking
-    video_extensions = ['.mp4', '.mov', '.avi', '.wmv', '.mkv', '.dxv', '.m4v', '.webm']
-    image_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp']
-    
-    # Get the base name and extension of the old file
-    old_basename = os.path.splitext(os.path.basename(old_file_path))[0]
-    old_ext = os.path.splitext(old_file_path)[1].lower()
-    
-    # Determine original file type
-    old_is_video = old_ext in video_extensions
-    old_is_image = old_ext in image_extensions
-    
-    print(f"Looking for match for: {old_basename}{old_ext}")
-    
-    # Check if the new directory exists
-    if not os.path.exists(new_directory) or not os.path.isdir(new_directory):
-        print(f"New directory does not exist: {new_directory}")
-        return None
-    
-    # List all files in the new directory
-    new_files = os.listdir(new_directory)
-    
-    # First, try to find an exact match (same name, same extension)
-    for new_file in new_files:
-        new_basename = os.path.splitext(new_file)[0]
-        new_ext = os.path.splitext(new_file)[1].lower()
-        
-        # Check for exact match (case insensitive)
-        if new_basename.lower() == old_basename.lower():
-            if new_ext.lower() == old_ext.lower():
-                # Same name, same extension - exact match
-                print(f"Found exact match: {new_file}")
-                return os.path.join(new_directory, new_file)
-            elif ignore_extensions:
-                # Same name, different extension - check file types
-                new_is_video = new_ext in video_extensions
-                new_is_image = new_ext in image_extensions
-                
-                # Check if file types match (video with video, image with image)
-                types_match = (old_is_video and new_is_video) or (old_is_image and new_is_image)
-                
-                if types_match:
-                    print(f"Found match with different extension: {new_file}")
-                    return os.path.join(new_directory, new_file)
-                else:
-                    print(f"WARNING: File types don't match. Original: {old_ext} (video={old_is_video}, image={old_is_image}), New: {new_ext} (video={new_is_video}, image={new_is_image})")
-    
-    # If we get here, no match was found
-    print(f"No match found for {old_basename}{old_ext} in {new_directory}")
-    return None
-
-def _split_path_parts(path_str):
-    return [p for p in re.split(r"[\\/]", path_str) if p and p != "."]
-
-def _rebase_path(file_path, old_path, new_path):
-    if not old_path or not new_path:
-        return file_path
-
-    if old_path in file_path:
-        return file_path.replace(old_path, new_path)
-
-    file_parts = _split_path_parts(file_path)
-    old_parts = _split_path_parts(old_path)
-    new_parts = _split_path_parts(new_path)
-
-    if not old_parts:
-        return file_path
-
-    old_media_folder = old_parts[-1]
-    try:
-        idx = file_parts.index(old_media_folder)
-    except ValueError:
-        return file_path
-
-    relative_parts = file_parts[idx + 1:]
-    rebased_parts = new_parts + relative_parts
-    rebased = "/".join(rebased_parts)
-    if file_path.startswith("./"):
-        return "./" + rebased
-    return rebased
-
-def update_file_paths(root, old_path, new_path, ignore_extensions=False):
-    """
-    Update file paths in the XML tree to point to files in the new directory.
-
-    When ignore_extensions is True, match by base name and file type. If no match
-    is found, fall back to rebasing the path to the new directory.
-    """
-    if not old_path or not new_path:
-        return 0
-
-    paths_updated = 0
-
-    print(f"\n=== UPDATING FILE PATHS ===")
-    print(f"Old path: {old_path}")
-    print(f"New path: {new_path}")
-    print(f"Ignore extensions: {ignore_extensions}")
-
-    def update_value(getter, setter):
-        nonlocal paths_updated
-        file_path = getter()
-        if not file_path:
-            return
-
-        new_file_path = None
-        if ignore_extensions:
-            matching_file = find_matching_file(file_path, new_path, ignore_extensions=True)
-            if matching_file:
-                new_file_path = matching_file
-            else:
-                new_file_path = _rebase_path(file_path, old_path, new_path)
-        else:
-            new_file_path = _rebase_path(file_path, old_path, new_path)
-
-        if new_file_path and new_file_path != file_path:
-            setter(new_file_path)
-            paths_updated += 1
-
-    # Update VideoFormatReaderSource paths
-    for video_source in root.findall(".//VideoFormatReaderSource"):
-        update_value(lambda: video_source.get("fileName"),
-                     lambda v: video_source.set("fileName", v))
-
-    # Update PreloadData paths
-    for preload in root.findall(".//PreloadData/VideoFile"):
-        update_value(lambda: preload.get("value"),
-                     lambda v: preload.set("value", v))
-
-    print(f"Updated {paths_updated} file paths")
-    return paths_updated
-
-PIXEL_LIKE_THRESHOLD = 100.0
-
-def _is_pixel_like_value(raw_value):
-    try:
-        return abs(float(raw_value)) >= PIXEL_LIKE_THRESHOLD
-    except (TypeError, ValueError):
-        return False
-
-def _scale_value_range_if_pixel_like(param_range, resolution_factor):
-    """Scale ValueRange min/max bounds only when they look pixel-based."""
-    for value_range in param_range.findall("./ValueRange"):
-        min_raw = value_range.get("min")
-        max_raw = value_range.get("max")
-        if not _is_pixel_like_value(min_raw) and not _is_pixel_like_value(max_raw):
-            continue
-        try:
-            if min_raw is not None:
-                value_range.set("min", str(float(min_raw) * resolution_factor))
-            if max_raw is not None:
-                value_range.set("max", str(float(max_raw) * resolution_factor))
-        except ValueError:
-            continue
-
-def _scale_all_value_ranges(param_range, resolution_factor):
-    """Scale all ValueRange min/max bounds regardless of threshold."""
-    for value_range in param_range.findall("./ValueRange"):
-        min_raw = value_range.get("min")
-        max_raw = value_range.get("max")
-        try:
-            if min_raw is not None:
-                value_range.set("min", str(float(min_raw) * resolution_factor))
-            if max_raw is not None:
-                value_range.set("max", str(float(max_raw) * resolution_factor))
-        except ValueError:
-            continue
-
-def _get_effect_policy_path():
-    system = platform.system()
-    if system == "Windows":
-        base = os.getenv("LOCALAPPDATA") or os.getenv("APPDATA") or os.path.expanduser("~")
-        return os.path.join(base, "Resolume Composition Converter", "effect_position_policy.json")
-    if system == "Darwin":
-        base = os.path.expanduser("~/Library/Application Support")
-        return os.path.join(base, "Resolume Composition Converter", "effect_position_policy.json")
-    base = os.getenv("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
-    return os.path.join(base, "resolume-composition-converter", "effect_position_policy.json")
-
-def load_effect_position_policy():
-    path = _get_effect_policy_path()
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            if isinstance(data, dict):
-                return data
-    except (FileNotFoundError, json.JSONDecodeError, OSError):
-        pass
-    return {}
-
-def save_effect_position_policy(policy):
-    path = _get_effect_policy_path()
-    try:
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(policy, f, indent=2, sort_keys=True)
-    except OSError as e:
-        print(f"Warning: Could not save effect position policy: {e}")
-
-def scan_unknown_position_effects(input_file, policy):
-    """
-    Find non-transform/non-text effects that expose position/anchor params and
-    do not yet have an explicit policy entry.
-    """
-    tree = ET.parse(input_file)
-    root = tree.getroot()
-
-    excluded_effect_types = {
-        "TransformEffect",
-        "TextBlock",
-        "TextEffect",
-        "TextGenerator",
-        "BlockTextGenerator",
-    }
-    always_pixel_effect_types = {
-        "ScreenLayerTransform",
-    }
-    unknown = {}
-
-    for render_pass in root.findall(".//RenderPass"):
-        effect_type = render_pass.get("type", "")
-        if (not effect_type or
-            effect_type in excluded_effect_types or
-            effect_type in always_pixel_effect_types or
-            effect_type in policy):
-            continue
-
-        params_node = render_pass.find("./Params")
-        if params_node is None:
-            continue
-
-        for param in params_node.findall(".//ParamRange"):
-            if param.get("name") not in ["Position X", "Position Y", "Anchor X", "Anchor Y", "Anchor Z"]:
-                continue
-
-            current = unknown.get(effect_type)
-            if current is None:
-                unknown[effect_type] = {
-                    "count": 1,
-                    "sample_value": param.get("value", ""),
-                }
-            else:
-                current["count"] += 1
-            break
-
-    return unknown
-
-def adjust_composition(input_file, output_file, old_path=None, new_path=None,
-                        resolution_factor=2.0, framerate_factor=2.4, new_name=None,
-                        ignore_extensions=False, effect_position_policy=None):
-    """
-    Adjust a Resolume composition file for higher resolution and new frame rate,
-    WITHOUT altering the original composition on disk.
-
-    Key changes:
-      1) CompositionInfo width/height -> scaled by resolution_factor
-      2) Top-level VideoTrack (if present) -> scaled by resolution_factor
-      3) Each Layer's VideoTrack -> scaled by resolution_factor
-      4) Each Clip's VideoTrack (Width/Height) -> scaled by resolution_factor
-      5) TransformEffect (Position X, Position Y, Anchor X, Anchor Y, Anchor Z) -> scaled by resolution_factor
-      6) TIMELINE (seconds) durations -> Keep same real-time (preserve user-edited durations)
-      7) BPM (beats) durations -> multiply defaultMillisecondsDuration by framerate_factor
-      8) PrimarySource -> either force new resolution or remove width/height
-      9) (Optional) replace old_path with new_path in file references
-         - When ignore_extensions=True, only compare base filenames without extensions
-           This allows replacing media files with different formats (e.g., .MP4 with .MOV)
-           while keeping the same base filename.
-         - Example: A composition using 'video1.mp4' can be updated to use 'video1.mov'
-           when this option is enabled and the new media path contains the .dxv file.
-    """
-
-    # --- Parse the XML from the original file (in memory) ---
-    tree = ET.parse(input_file)
-    root = tree.getroot()
-    
-    # Stats counters
-    clips_modified = 0
-    transforms_adjusted = 0
-    transforms_processed = 0  # New counter to track the number of transforms processed
-    durations_adjusted = 0
-    paths_updated = 0
-    custom_durations_preserved = 0
-    text_components_found = 0  # New counter for text components
-    position_ranges_adjusted = 0
-    orig_comp_w = None
-    orig_comp_h = None
-    
-    # Keep track of transforms we've already processed
-    processed_transform_ids = set()
-    effect_position_policy = effect_position_policy or {}
-    
-    # DEBUG: Find all text-related components
-    text_blocks = root.findall(".//RenderPass[@type='TextBlock']")
-    text_effects = root.findall(".//RenderPass[@type='TextEffect']")
-    text_generators = root.findall(".//RenderPass[@type='TextGenerator']")
-    block_text_generators = root.findall(".//RenderPass[@type='BlockTextGenerator']")
-    
-    print(f"DEBUG: Found {len(text_blocks)} TextBlock components")
-    print(f"DEBUG: Found {len(text_effects)} TextEffect components")
-    print(f"DEBUG: Found {len(text_generators)} TextGenerator components")
-    print(f"DEBUG: Found {len(block_text_generators)} BlockTextGenerator components")
-
-    # --- 1) Update the CompositionInfo resolution and name ---
-    comp_info = root.find(".//CompositionInfo")
-    if comp_info is not None:
-        old_comp_w = int(comp_info.get("width"))
-        old_comp_h = int(comp_info.get("height"))
-        orig_comp_w = old_comp_w
-        orig_comp_h = old_comp_h
-        comp_info.set("width", str(int(old_comp_w * resolution_factor)))
-        comp_info.set("height", str(int(old_comp_h * resolution_factor)))
-        
-        # Set the new composition name if provided, otherwise keep the existing name
-        comp_name = new_name if new_name else comp_info.get("name")
-        comp_info.set("name", comp_name)
-        
-        # Ensure the root Composition element has the same name
-        root.set("name", comp_name)
-            
-        # Also update the Param name="Name" element to match the composition name
-        name_param = root.find(".//Param[@name='Name'][@T='STRING']")
-        if name_param is not None:
-            name_param.set("value", comp_name)
-
-    # --- 2) Update the top-level VideoTrack (if it exists) ---
-    comp_video_params = root.find("./VideoTrack/Params")
-    if comp_video_params is not None:
-        comp_width_param = comp_video_params.find(".//ParamRange[@name='Width']")
-        comp_height_param = comp_video_params.find(".//ParamRange[@name='Height']")
-        if comp_width_param is not None:
-            old_val = float(comp_width_param.get("value"))
-            comp_width_param.set("value", str(int(old_val * resolution_factor)))
-        if comp_height_param is not None:
-            old_val = float(comp_height_param.get("value"))
-            comp_height_param.set("value", str(int(old_val * resolution_factor)))
-            
-    # --- 2b) Update all top-level Transforms ---
-    # First, let's find all transforms in the composition using a more general pattern
-    all_transforms = root.findall(".//RenderPass[@type='TransformEffect']")
-    print(f"Found {len(all_transforms)} total transforms in the composition using general pattern")
-    
-    # Now, let's find the top-level transforms
-    comp_transforms = root.findall("./VideoTrack/RenderPass/RenderPass[@type='TransformEffect']")
-    print(f"Found {len(comp_transforms)} transforms at composition level")
-    transform_count = 0
-    for comp_transform in comp_transforms:
-        transform_count += 1
-        transforms_processed += 1  # Increment the counter
-        
-        # Add this transform to the set of processed transforms
-        transform_id = comp_transform.get("uniqueId", None)
-        if transform_id:
-            processed_transform_ids.add(transform_id)
-            
-        print(f"Processing composition transform {transform_count} (ID: {transform_id})")
-        # Get all parameters for this transform
-        params = comp_transform.findall(".//ParamRange")
-        
-        # Process each parameter
-        for param in params:
-            param_name = param.get("name")
-            
-            # Only process position and anchor parameters
-            if param_name in ["Position X", "Position Y", "Anchor X", "Anchor Y", "Anchor Z"]:
-                old_val = float(param.get("value"))
-                new_val = old_val * resolution_factor
-                param.set("value", str(new_val))
-                transforms_adjusted += 1
-                print(f"  Adjusted {param_name} from {old_val} to {new_val}")
-
-    # --- 3) Update each Layer's VideoTrack width/height ---
-    for layer in root.findall(".//Layer"):
-        layer_params = layer.find(".//VideoTrack/Params")
-        if layer_params is not None:
-            param_width = layer_params.find(".//ParamRange[@name='Width']")
-            param_height = layer_params.find(".//ParamRange[@name='Height']")
-            if param_width is not None:
-                w_val = float(param_width.get("value"))
-                param_width.set("value", str(int(w_val * resolution_factor)))
-            if param_height is not None:
-                h_val = float(param_height.get("value"))
-                param_height.set("value", str(int(h_val * resolution_factor)))
-        
-        # --- 3b) Update all Layer's Transforms ---
-        layer_transforms = layer.findall(".//VideoTrack/RenderPass/RenderPass[@type='TransformEffect']")
-        print(f"Found {len(layer_transforms)} transforms in layer")
-        transform_count = 0
-        for layer_transform in layer_transforms:
-            transform_count += 1
-            transforms_processed += 1  # Increment the counter
-            
-            # Add this transform to the set of processed transforms
-            transform_id = layer_transform.get("uniqueId", None)
-            if transform_id:
-                processed_transform_ids.add(transform_id)
-                
-            print(f"Processing layer transform {transform_count} (ID: {transform_id})")
-            # Get all parameters for this transform
-            params = layer_transform.findall(".//ParamRange")
-            
-            # Process each parameter
-            for param in params:
-                param_name = param.get("name")
-                
-                # Only process position and anchor parameters
-                if param_name in ["Position X", "Position Y", "Anchor X", "Anchor Y", "Anchor Z"]:
-                    old_val = float(param.get("value"))
-                    new_val = old_val * resolution_factor
-                    param.set("value", str(new_val))
-                    transforms_adjusted += 1
-                    print(f"  Adjusted {param_name} from {old_val} to {new_val}")
-
-    # --- 3c) Update each Group's VideoTrack width/height and transforms ---
-    for group in root.findall(".//Group"):
-        group_params = group.find(".//VideoTrack/Params")
-        if group_params is not None:
-            param_width = group_params.find(".//ParamRange[@name='Width']")
-            param_height = group_params.find(".//ParamRange[@name='Height']")
-            if param_width is not None:
-                w_val = float(param_width.get("value"))
-                param_width.set("value", str(int(w_val * resolution_factor)))
-            if param_height is not None:
-                h_val = float(param_height.get("value"))
-                param_height.set("value", str(int(h_val * resolution_factor)))
-
-        group_transforms = group.findall(".//VideoTrack/RenderPass/RenderPass[@type='TransformEffect']")
-        print(f"Found {len(group_transforms)} transforms in group")
-        transform_count = 0
-        for group_transform in group_transforms:
-            transform_count += 1
-            transforms_processed += 1
-
-            transform_id = group_transform.get("uniqueId", None)
-            if transform_id:
-                processed_transform_ids.add(transform_id)
-
-            print(f"Processing group transform {transform_count} (ID: {transform_id})")
-            params = group_transform.findall(".//ParamRange")
-            for param in params:
-                param_name = param.get("name")
-                if param_name in ["Position X", "Position Y", "Anchor X", "Anchor Y", "Anchor Z"]:
-                    old_val = float(param.get("value"))
-                    new_val = old_val * resolution_factor
-                    param.set("value", str(new_val))
-                    transforms_adjusted += 1
-                    print(f"  Adjusted {param_name} from {old_val} to {new_val}")
-
-    # --- Process text components specifically ---
-    for text_component_type, components in [
-        ("TextBlock", text_blocks),
-        ("TextEffect", text_effects),
-        ("TextGenerator", text_generators),
-        ("BlockTextGenerator", block_text_generators)
-    ]:
-        for component in components:
-            text_components_found += 1
-            component_id = component.get("uniqueId", "unknown")
-            print(f"DEBUG: Processing {text_component_type} component (ID: {component_id})")
-            
-            # Find all parameters for this text component
-            params = component.findall(".//Param") + component.findall(".//ParamRange")
-            
-            # Log all parameters for debugging
-            print(f"DEBUG: Found {len(params)} parameters for {text_component_type}")
-            for param in params:
-                param_name = param.get("name", "unnamed")
-                param_type = param.get("T", param.get("type", "unknown"))
-                param_value = param.get("value", "no-value")
-                print(f"DEBUG: {text_component_type} param: {param_name} (Type: {param_type}, Value: {param_value})")
-                
-                # Check for text-specific parameters that might need scaling
-                if param_name in ["FontSize", "Size", "LineHeight", "CharacterSpacing", "LineSpacing", "Position X", "Position Y"]:
-                    try:
-                        old_val = float(param_value)
-                        new_val = old_val * resolution_factor
-                        print(f"DEBUG: Scaling text parameter {param_name} from {old_val} to {new_val}")
-                        param.set("value", str(new_val))
-                    except (ValueError, TypeError) as e:
-                        print(f"DEBUG: Error scaling text parameter {param_name}: {e}")
-
-                if param_name in ["Position X", "Position Y", "Anchor X", "Anchor Y", "Anchor Z"]:
-                    _scale_value_range_if_pixel_like(param, resolution_factor)
-
-    # --- Process non-transform effects that also expose position/anchor params ---
-    # Covers effects like ScreenLayerTransform while avoiding double-scaling
-    # TransformEffect and text blocks that are already handled above.
-    excluded_effect_types = {
-        "TransformEffect",
-        "TextBlock",
-        "TextEffect",
-        "TextGenerator",
-        "BlockTextGenerator",
-    }
-    always_pixel_effect_types = {
-        "ScreenLayerTransform",
-    }
-    for render_pass in root.findall(".//RenderPass"):
-        effect_type = render_pass.get("type", "")
-        if effect_type in excluded_effect_types:
-            continue
-
-        params_node = render_pass.find("./Params")
-        if params_node is None:
-            continue
-
-        for param in params_node.findall(".//ParamRange"):
-            param_name = param.get("name")
-            if param_name not in ["Position X", "Position Y", "Anchor X", "Anchor Y", "Anchor Z"]:
-                continue
-
-            raw_value = param.get("value")
-            is_always_pixel = effect_type in always_pixel_effect_types
-            policy_mode = effect_position_policy.get(effect_type)
-            should_convert = (
-                is_always_pixel or
-                policy_mode == "convert" or
-                (policy_mode is None and _is_pixel_like_value(raw_value))
-            )
-            if should_convert:
-                try:
-                    old_val = float(raw_value)
-                    new_val = old_val * resolution_factor
-                    param.set("value", str(new_val))
-                    transforms_adjusted += 1
-                    position_ranges_adjusted += 1
-                    print(f"Adjusted {effect_type} {param_name} from {old_val} to {new_val}")
-                except ValueError:
-                    pass
-
-            if is_always_pixel or policy_mode == "convert":
-                _scale_all_value_ranges(param, resolution_factor)
-            elif policy_mode != "skip":
-                _scale_value_range_if_pixel_like(param, resolution_factor)
-
-    # --- 4) Process each clip ---
-    clips = root.findall(".//Clip")
-    for clip in clips:
-        clips_modified += 1  # Count all clips, including generators and routers
-
-        # 4a) File path updates are handled in a single pass after clip processing
-
-        # 4b) Update all transform effects (Position, Anchor, Scale) by resolution_factor
-        transforms = clip.findall(".//VideoTrack/RenderPass/RenderPass[@type='TransformEffect']")
-        print(f"Found {len(transforms)} transforms in clip")
-        transform_count = 0
-        
-        # Check if this is an image clip
-        is_image_clip = False
-        video_source = clip.find(".//VideoFormatReaderSource")
-        if video_source is not None:
-            file_path = video_source.get("fileName", "")
-            if file_path.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp')):
-                is_image_clip = True
-                print(f"IMAGE DEBUG: Processing transforms for image clip: {file_path}")
-                
-                # Get clip dimensions for reference
-                clip_video_params = clip.find(".//VideoTrack/Params")
-                if clip_video_params is not None:
-                    clip_width = clip_video_params.find(".//ParamRange[@name='Width']")
-                    clip_height = clip_video_params.find(".//ParamRange[@name='Height']")
-                    if clip_width is not None and clip_height is not None:
-                        try:
-                            width_val = float(clip_width.get("value"))
-                            height_val = float(clip_height.get("value"))
-                            print(f"IMAGE DEBUG: Clip dimensions: {width_val}x{height_val}")
-                        except (ValueError, TypeError):
-                            print("IMAGE DEBUG: Could not parse clip dimensions")
-        
-        for transform in transforms:
-            transform_count += 1
-            transforms_processed += 1  # Increment the counter
-            
-            # Add this transform to the set of processed transforms
-            transform_id = transform.get("uniqueId", None)
-            if transform_id:
-                processed_transform_ids.add(transform_id)
-                
-            print(f"Processing clip transform {transform_count} (ID: {transform_id})")
-            # Get all parameters for this transform
-            params = transform.findall(".//ParamRange")
-            
-            # For image clips, log all transform parameters for debugging
-            if is_image_clip:
-                print(f"IMAGE DEBUG: Transform parameters for image clip (ID: {transform_id}):")
-                for p in params:
-                    p_name = p.get("name")
-                    p_val = p.get("value")
-                    print(f"IMAGE DEBUG:   {p_name} = {p_val}")
-            
-            # Process each parameter
-            for param in params:
-                param_name = param.get("name")
-                
-                # Only process position and anchor parameters
-                if param_name in ["Position X", "Position Y", "Anchor X", "Anchor Y", "Anchor Z"]:
-                    old_val = float(param.get("value"))
-                    new_val = old_val * resolution_factor
-                    param.set("value", str(new_val))
-                    transforms_adjusted += 1
-                    print(f"  Adjusted {param_name} from {old_val} to {new_val}")
-                    
-                    # For image clips, log additional information
-                    if is_image_clip:
-                        print(f"IMAGE DEBUG: Adjusted {param_name} for image clip from {old_val} to {new_val}")
-
-            # For images, we should handle the Scale parameter differently
-            if is_image_clip:
-                scale_param = transform.find(".//ParamRange[@name='Scale']")
-                if scale_param is not None:
-                    try:
-                        old_val = float(scale_param.get("value"))
-                        print(f"IMAGE DEBUG: Found Scale parameter with value {old_val}")
-                        
-                        # For images, we might want to preserve the scale to maintain aspect ratio
-                        # But for now, just log it without changing
-                        print(f"IMAGE DEBUG: Scale parameter would change from {old_val} to {old_val * resolution_factor}")
-                        
-                        # Uncomment to actually change the scale
-                        # new_val = old_val * resolution_factor
-                        # scale_param.set("value", str(new_val))
-                    except (ValueError, TypeError) as e:
-                        print(f"IMAGE DEBUG: Error parsing Scale parameter: {e}")
-            # If you also want to scale the "Scale" param for non-images, uncomment:
-            # elif not is_image_clip:
-            #     scale_param = transform.find(".//ParamRange[@name='Scale']")
-            #     if scale_param is not None:
-            #         old_val = float(scale_param.get("value"))
-            #         new_val = old_val * resolution_factor
-            #         scale_param.set("value", str(new_val))
-
-        # 4c) Process clip durations in Timeline or BPM mode
-        position_param = clip.find(".//ParamRange[@name='Position']")
-        if position_param is not None:
-            duration_source = position_param.find("DurationSource")
-            if duration_source is not None:
-                default_duration = duration_source.get("defaultDuration", "")
-                custom_duration_str = duration_source.get("duration", None)
-
-                if default_duration.endswith("s"):
-                    # TIMELINE MODE: Preserve any custom duration that was set 
-                    if custom_duration_str:
-                        custom_durations_preserved += 1
-                    durations_adjusted += 1
-
-                elif default_duration.endswith("b"):
-                    # BPM MODE: multiply defaultMillisecondsDuration by framerate_factor
-                    phase_source = position_param.find("PhaseSourceTransportTimeline")
-                    if phase_source is not None and phase_source.get("defaultMillisecondsDuration"):
-                        try:
-                            old_ms = float(phase_source.get("defaultMillisecondsDuration"))
-                            new_ms = old_ms * framerate_factor
-                            phase_source.set("defaultMillisecondsDuration", str(new_ms))
-                            durations_adjusted += 1
-                        except ValueError:
-                            print("Warning: Could not convert defaultMillisecondsDuration to float.")
-                else:
-                    print(f"Warning: defaultDuration '{default_duration}' is not 's' or 'b'. Skipping.")
-            else:
-                # No DurationSource, but maybe there's a PhaseSourceTransportTimeline
-                phase_source = position_param.find("PhaseSourceTransportTimeline")
-                if phase_source is not None and phase_source.get("defaultMillisecondsDuration"):
-                    try:
-                        old_ms = float(phase_source.get("defaultMillisecondsDuration"))
-                        new_ms = old_ms * framerate_factor
-                        phase_source.set("defaultMillisecondsDuration", str(new_ms))
-                        durations_adjusted += 1
-                    except ValueError:
-                        print("Warning: Could not convert defaultMillisecondsDuration to float.")
-
-        # 4d) Update the Clip's own <VideoTrack><Params> (Width/Height)
-        clip_video_params = clip.find(".//VideoTrack/Params")
-        if clip_video_params is not None:
-            clip_width = clip_video_params.find(".//ParamRange[@name='Width']")
-            clip_height = clip_video_params.find(".//ParamRange[@name='Height']")
-            if clip_width is not None:
-                old_val = float(clip_width.get("value"))
-                new_val = old_val * resolution_factor
-                clip_width.set("value", str(int(new_val)))
-            if clip_height is not None:
-                old_val = float(clip_height.get("value"))
-                new_val = old_val * resolution_factor
-                clip_height.set("value", str(int(new_val)))
-
-        # 4e) Update the PrimarySource resolution based on source type
-        primary_source = clip.find(".//PrimarySource/VideoSource")
-        if primary_source is not None:
-            source_type = primary_source.get("type", "")
-            if source_type == "VideoFormatReaderSource":
-                # Check if this is an image file by examining the file extension
-                is_image = False
-                video_source = clip.find(".//VideoFormatReaderSource")
-                if video_source is not None:
-                    file_path = video_source.get("fileName", "")
-                    if file_path.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp')):
-                        is_image = True
-                        print(f"Detected image file: {file_path}")
-                
-                if is_image:
-                    # For images, preserve the original aspect ratio by scaling both dimensions
-                    try:
-                        current_width = int(primary_source.get("width"))
-                        current_height = int(primary_source.get("height"))
-                        
-                        # Log image details for debugging
-                        print(f"IMAGE DEBUG: Processing image with dimensions {current_width}x{current_height}")
-                        print(f"IMAGE DEBUG: Aspect ratio: {current_width/current_height:.2f}")
-                        
-                        # Check if the image has an unusual aspect ratio
-                        aspect_ratio = current_width / current_height
-                        if aspect_ratio > 2.0 or aspect_ratio < 0.5:
-                            print(f"IMAGE DEBUG: Unusual aspect ratio detected: {aspect_ratio:.2f}")
-                        
-                        # Scale dimensions
-                        new_width = int(current_width * resolution_factor)
-                        new_height = int(current_height * resolution_factor)
-                        primary_source.set("width", str(new_width))
-                        primary_source.set("height", str(new_height))
-                        
-                        print(f"Preserving image aspect ratio: {current_width}x{current_height} -> {new_width}x{new_height}")
-                    except (ValueError, TypeError) as e:
-                        # If we can't parse the values, use default scaling
-                        print(f"IMAGE DEBUG: Error parsing image dimensions: {e}")
-                        fallback_w = orig_comp_w if orig_comp_w is not None else 1920
-                        fallback_h = orig_comp_h if orig_comp_h is not None else 1080
-                        primary_source.set("width", str(int(fallback_w * resolution_factor)))
-                        primary_source.set("height", str(int(fallback_h * resolution_factor)))
-                else:
-                    # For videos, scale existing dimensions when available
-                    try:
-                        if "width" in primary_source.attrib and "height" in primary_source.attrib:
-                            current_width = int(primary_source.get("width"))
-                            current_height = int(primary_source.get("height"))
-                            primary_source.set("width", str(int(current_width * resolution_factor)))
-                            primary_source.set("height", str(int(current_height * resolution_factor)))
-                        else:
-                            raise ValueError("Missing width/height")
-                    except (ValueError, TypeError):
-                        fallback_w = orig_comp_w if orig_comp_w is not None else 1920
-                        fallback_h = orig_comp_h if orig_comp_h is not None else 1080
-                        primary_source.set("width", str(int(fallback_w * resolution_factor)))
-                        primary_source.set("height", str(int(fallback_h * resolution_factor)))
-            else:
-                # For generator/router clips, we still want to scale the resolution
-                # but we need to be careful about how we do it
-                if "width" in primary_source.attrib and "height" in primary_source.attrib:
-                    try:
-                        current_width = int(primary_source.get("width"))
-                        current_height = int(primary_source.get("height"))
-                        primary_source.set("width", str(int(current_width * resolution_factor)))
-                        primary_source.set("height", str(int(current_height * resolution_factor)))
-                    except (ValueError, TypeError):
-                        # If we can't parse the values, leave them as is
-                        pass
-
-    # --- 5) Final check for any missed transforms ---
-    # Find all transforms in the composition using a general pattern
-    all_transforms = root.findall(".//RenderPass[@type='TransformEffect']")
-    print(f"Final check: Found {len(all_transforms)} total transforms in the composition")
-    
-    # Report how many transforms we've already processed
-    print(f"Processed {transforms_processed} transforms so far")
-    
-    # Process any transforms that might have been missed
-    for transform in all_transforms:
-        # Check if this transform has already been processed
-        transform_id = transform.get("uniqueId", None)
-        if transform_id and transform_id in processed_transform_ids:
-            print(f"Skipping already processed transform {transform_id}")
-            continue
-        
-        # Add this transform to the set of processed transforms
-        if transform_id:
-            processed_transform_ids.add(transform_id)
-            transforms_processed += 1
-            print(f"Processing additional transform {transform_id}")
-        
-        # Get all parameters for this transform
-        params = transform.findall(".//ParamRange")
-        
-        # Process each parameter
-        for param in params:
-            param_name = param.get("name")
-            
-            # Only process position and anchor parameters
-            if param_name in ["Position X", "Position Y", "Anchor X", "Anchor Y", "Anchor Z"]:
-                old_val = float(param.get("value"))
-                new_val = old_val * resolution_factor
-                param.set("value", str(new_val))
-                transforms_adjusted += 1
-                print(f"  Adjusted {param_name} from {old_val} to {new_val}")
-
-    # --- 6) Update file paths (single deterministic pass) ---
-    if old_path and new_path:
-        paths_updated += update_file_paths(root, old_path, new_path, ignore_extensions)
-
-    # --- 7) Write the updated XML to the *new* .avc file ---
-    tree.write(output_file, encoding="utf-8", xml_declaration=True)
-
-    # --- 7) Return a summary ---
-    extension_note = ""
-    if ignore_extensions and paths_updated > 0:
-        extension_note = "\nNote: File extensions were ignored during replacement, allowing format conversion."
-        # Add more details about the extension changes
-        extension_note += "\nIMPORTANT: If you're replacing MP4 files with MOV files, make sure both old and new paths are correct."
-        extension_note += "\nThe application will match files with the same base name but different extensions."
-    
-    summary = (
-        f"Modifications Summary:\n"
-        f"Clips modified: {clips_modified}\n"
-        f"Transforms adjusted: {transforms_adjusted}\n"
-        f"Additional effect position/range adjustments: {position_ranges_adjusted}\n"
-        f"Durations adjusted: {durations_adjusted}\n"
-        f"Custom durations preserved: {custom_durations_preserved}\n"
-        f"File paths updated: {paths_updated}\n"
-        f"Text components found: {text_components_found}{extension_note}\n\n"
-        f"Adjusted composition saved to: {output_file}"
-    )
-    return summary
-
 # ----------------------
 #    TKINTER GUI CODE
 # ----------------------
@@ -908,6 +100,8 @@ class ResolumeConverterApp:
         self.old_path = tk.StringVar()
         self.new_path = tk.StringVar()
         self.ignore_extensions = tk.BooleanVar(value=False)  # New variable for ignore extensions checkbox
+        self.search_subfolders = tk.BooleanVar(value=False)  # Find moved media anywhere under the new path
+        self.verbose_log = tk.BooleanVar(value=False)  # Log every changed value to the console
         
         # Defaults: 1080p(25fps) -> 4K(60fps)
         self.original_width = tk.StringVar(value="1920")
@@ -923,6 +117,29 @@ class ResolumeConverterApp:
         # Check for updates on startup (non-blocking, after a delay)
         self.root.after(2000, self.check_for_updates_silently)
         self.effect_position_policy = load_effect_position_policy()
+        
+        # Events from the conversion thread, shown by _poll_conversion
+        self.conversion_events = queue.Queue()
+        
+        # Hidden support option: Ctrl+Shift+P profiles the next conversions
+        self.profile_conversions = False
+        self.root.bind_all("<Control-P>", self.toggle_profiling)
+        if platform.system() == "Darwin":
+            self.root.bind_all("<Command-P>", self.toggle_profiling)
+    
+    def toggle_profiling(self, event=None):
+        """Turn conversion profiling on or off (for bug reports)."""
+        self.profile_conversions = not self.profile_conversions
+        if self.profile_conversions:
+            messagebox.showinfo(
+                "Profiling Enabled",
+                "Conversions are now profiled.\n\n"
+                "A .pstats file and a .collapsed.txt file are written next to each "
+                "converted composition. Please attach both to your bug report.\n\n"
+                "Press the same keys again to turn profiling off."
+            )
+        else:
+            messagebox.showinfo("Profiling Disabled", "Conversions are no longer profiled.")
     
     def create_widgets(self):
         # Create a main frame to hold everything
@@ -1104,6 +321,28 @@ class ResolumeConverterApp:
             
         ignore_ext_checkbox.bind("<Enter>", show_tooltip)
         
+        # Search subfolders checkbox
+        subfolders_frame = ttk.Frame(file_section, style='TFrame')
+        subfolders_frame.pack(fill=tk.X, pady=(0, 8))
+        subfolders_checkbox = ttk.Checkbutton(
+            subfolders_frame,
+            text="Search subfolders of the new media path for files that moved (indexed once, then reused)",
+            variable=self.search_subfolders,
+            style='TCheckbutton'
+        )
+        subfolders_checkbox.pack(side=tk.LEFT, padx=(12, 0))
+        
+        # Verbose log checkbox
+        verbose_frame = ttk.Frame(file_section, style='TFrame')
+        verbose_frame.pack(fill=tk.X, pady=(0, 8))
+        verbose_checkbox = ttk.Checkbutton(
+            verbose_frame,
+            text="Verbose conversion log (prints every changed value to the console; slower)",
+            variable=self.verbose_log,
+            style='TCheckbutton'
+        )
+        verbose_checkbox.pack(side=tk.LEFT, padx=(12, 0))
+        
         # Resolution & Frame Rate Section
         self.create_section_title(content_frame, "Resolution & Frame Rate", pady=(20, 10))
         
@@ -1175,14 +414,20 @@ class ResolumeConverterApp:
         button_container = ttk.Frame(footer_frame, style='TFrame')
         button_container.pack(anchor='center')
         
-        convert_button = ttk.Button(
+        self.convert_button = ttk.Button(
             button_container,
             text="Convert Composition",
             command=self.convert_composition,
             style='TButton',
             padding=(20, 10)
         )
-        convert_button.pack(pady=10)
+        self.convert_button.pack(pady=10)
+        
+        # Progress of the running conversion
+        self.progress_bar = ttk.Progressbar(button_container, length=400, mode='determinate', maximum=100)
+        self.progress_bar.pack(pady=(0, 5))
+        self.progress_label = ttk.Label(button_container, text="", style='TLabel')
+        self.progress_label.pack()
     
     def on_scroll(self, *args):
         """Handle scroll events and update scrollbar"""
@@ -1304,17 +549,77 @@ class ResolumeConverterApp:
         if self.ignore_extensions.get() and (not old_path or not new_path):
             messagebox.showerror("Error", "When 'Ignore file extensions' is checked, you must provide both old and new media paths.")
             return
+        elif self.search_subfolders.get() and (not old_path or not new_path):
+            messagebox.showerror("Error", "When 'Search subfolders' is checked, you must provide both old and new media paths.")
+            return
         elif (old_path and not new_path) or (new_path and not old_path):
             messagebox.showerror("Error", "Both old path and new path must be provided together.")
             return
             return
         
+        configure_logging(2 if self.verbose_log.get() else 1)
+        profiler = ConversionProfiler() if self.profile_conversions else None
+        profiling = profiler or nullcontext()
+        metrics = PhaseMetrics()
+        progress = ProgressReporter(lambda event: self.conversion_events.put(("progress", event, None)))
+        cancel = self.cancel_token = CancellationToken()
+        memory_limit = memory_limit_from_env()
+        memory_budget = MemoryBudget(memory_limit) if memory_limit else None
+        search_subfolders = self.search_subfolders.get()
+
+        # Parsed once for the scan and the conversion; the cache lets go of
+        # the document right after the scan, so it is freed when the
+        # conversion is done instead of staying in memory. Past the memory
+        # limit (RCC_MEMORY_LIMIT) the file is scanned and converted while
+        # it is read instead.
+        def load():
+            if search_subfolders:
+                # Listed up front so the conversion only looks files up
+                with metrics.phase("library"), progress.phase("library"), MediaLibrary() as library:
+                    library.refresh(new_path, cancel=cancel)
+            streaming = False
+            if memory_budget is None:
+                with profiling, metrics.phase("parse"), progress.phase("parse"):
+                    composition = load_composition(input_file, progress=progress, cancel=cancel)
+            else:
+                memory_budget.start()
+                streaming = memory_budget.plan(input_file) == "streaming"
+                if not streaming:
+                    try:
+                        with profiling, metrics.phase("parse"), progress.phase("parse"), memory_budget.enforce():
+                            composition = load_composition(input_file, progress=progress,
+                                                           cancel=memory_budget.guard(cancel))
+                    except MemoryBudgetExceeded as e:
+                        memory_budget.switch_to_streaming(str(e))
+                        streaming = True
+                if streaming:
+                    composition = input_file
+            with profiling, metrics.phase("scan"), progress.phase("scan"):
+                unknown_effects = scan_unknown_position_effects(composition, self.effect_position_policy,
+                                                                streaming=streaming)
+            return composition, unknown_effects
+
+        def loaded(result):
+            composition, unknown_effects = result
+            forget_composition(input_file)
+            self._continue_conversion(
+                composition, unknown_effects, output_file, old_path, new_path,
+                resolution_factor, framerate_factor, profiler, metrics, progress, cancel,
+                memory_budget, search_subfolders)
+
+        self._start_conversion()
+        self._run_in_background(load, loaded, profiler, output_file)
+
+    def _continue_conversion(self, composition, unknown_effects, output_file, old_path, new_path,
+                             resolution_factor, framerate_factor, profiler, metrics, progress, cancel,
+                             memory_budget=None, search_subfolders=False):
+        """Ask about unknown effects, then convert the loaded composition in the background."""
+        profiling = profiler or nullcontext()
         try:
             # Extract the output filename without extension to use as the composition name
             output_basename = os.path.basename(output_file)
             output_name = os.path.splitext(output_basename)[0]
 
-            unknown_effects = scan_unknown_position_effects(input_file, self.effect_position_policy)
             if unknown_effects:
                 for effect_type, info in sorted(unknown_effects.items()):
                     result = messagebox.askyesnocancel(
@@ -1326,15 +631,16 @@ class ResolumeConverterApp:
                         f"\n\nYour choice will be remembered for future conversions."
                     )
                     if result is None:
+                        self._finish_conversion()
                         return
                     self.effect_position_policy[effect_type] = "convert" if result else "skip"
                 save_effect_position_policy(self.effect_position_policy)
             
             # Check if ignore_extensions is checked
             if self.ignore_extensions.get():
-                print("INFO: 'Ignore file extensions' option is enabled.")
-                print(f"INFO: Will look for files with the same base name in {new_path}")
-                print("INFO: This allows replacing files with different extensions (e.g., .MP4 with .MOV)")
+                logger.info("'Ignore file extensions' option is enabled.")
+                logger.info("Will look for files with the same base name in %s", new_path)
+                logger.info("This allows replacing files with different extensions (e.g., .MP4 with .MOV)")
                 
                 # Show a message to the user
                 messagebox.showinfo(
@@ -1344,21 +650,140 @@ class ResolumeConverterApp:
                     f"For example, 'video1.mp4' can be replaced with 'video1.mov'."
                 )
             
-            # Standard case - use the provided paths
-            summary = adjust_composition(
-                input_file,
-                output_file,
-                old_path,
-                new_path,
-                resolution_factor,
-                framerate_factor,
-                new_name=output_name,
-                ignore_extensions=self.ignore_extensions.get(),  # Pass the checkbox value
-                effect_position_policy=self.effect_position_policy
-            )
-            messagebox.showinfo("Processing Complete", summary)
+            ignore_extensions = self.ignore_extensions.get()
         except Exception as e:
-            messagebox.showerror("Error", f"An error occurred during processing: {str(e)}")
+            self._finish_conversion()
+            messagebox.showerror("Error", f"An error occurred during processing: {str(e)}"
+                                 + self._save_profile(profiler, output_file))
+            return
+
+        # Standard case - use the provided paths
+        def convert():
+            with profiling:
+                summary = adjust_composition(
+                    composition,
+                    output_file,
+                    old_path,
+                    new_path,
+                    resolution_factor,
+                    framerate_factor,
+                    new_name=output_name,
+                    ignore_extensions=ignore_extensions,  # Pass the checkbox value
+                    effect_position_policy=self.effect_position_policy,
+                    metrics=metrics,
+                    progress=progress,
+                    cancel=cancel,
+                    streaming=memory_budget is not None and memory_budget.strategy == "streaming",
+                    memory_budget=memory_budget,
+                    search_subfolders=search_subfolders
+                )
+                if old_path and new_path:
+                    # Report media the remapped paths do not point at
+                    with metrics.phase("audit"), progress.phase("audit"):
+                        audit = audit_composition(output_file, cancel=cancel, progress=progress)
+                    summary += "\n\n" + format_audit(audit, GUI_LISTED_ISSUES)
+                return summary
+
+        def converted(summary):
+            self._finish_conversion()
+            messagebox.showinfo("Processing Complete", summary + self._save_profile(profiler, output_file))
+
+        self._run_in_background(convert, converted, profiler, output_file)
+
+    def _start_conversion(self):
+        """Turn the Convert button into a Cancel button and reset the progress display."""
+        self.convert_button.config(text="Cancel Conversion", command=self.cancel_conversion)
+        self.progress_bar['value'] = 0
+        self.progress_label.config(text="Starting...")
+
+    def _finish_conversion(self):
+        self.convert_button.config(text="Convert Composition", command=self.convert_composition)
+        self.convert_button.state(['!disabled'])
+        self.progress_bar['value'] = 0
+        self.progress_label.config(text="")
+
+    def cancel_conversion(self):
+        """Stop the running conversion; the worker removes any partial output."""
+        self.cancel_token.cancel()
+        self.convert_button.state(['disabled'])
+        self.progress_label.config(text="Cancelling...")
+
+    def _run_in_background(self, work, on_done, profiler, output_file):
+        """
+        Run work() in a worker thread so the window stays responsive, then
+        call on_done(result) on the Tk thread. Errors are shown in a dialog.
+        Progress events reach the window through self.conversion_events.
+        """
+        def run():
+            try:
+                self.conversion_events.put(("done", on_done, work()))
+            except Exception as e:
+                self.conversion_events.put(("error", e, None))
+
+        def on_error(e):
+            self._finish_conversion()
+            if isinstance(e, ConversionCancelled):
+                messagebox.showinfo("Conversion Cancelled",
+                                    "The conversion was cancelled. No output file was written."
+                                    + self._save_profile(profiler, output_file))
+                return
+            messagebox.showerror("Error", f"An error occurred during processing: {str(e)}"
+                                 + self._save_profile(profiler, output_file))
+
+        self._on_conversion_error = on_error
+        threading.Thread(target=run, name="conversion", daemon=True).start()
+        self.root.after(50, self._poll_conversion)
+
+    def _poll_conversion(self):
+        """Show queued progress events; hand the result over when the worker is done."""
+        while True:
+            try:
+                kind, value, result = self.conversion_events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                self._show_progress(value)
+            elif kind == "done":
+                value(result)
+                return
+            else:
+                self._on_conversion_error(value)
+                return
+        self.root.after(50, self._poll_conversion)
+
+    def _show_progress(self, event):
+        if self.cancel_token.cancelled:
+            return
+        label = PHASE_LABELS.get(event["phase"], event["phase"])
+        if event["event"] == "start":
+            self.progress_bar['value'] = 0
+            self.progress_label.config(text=f"{label}...")
+            return
+        if event["event"] == "finish":
+            self.progress_bar['value'] = 100
+            return
+        if not event["total"]:
+            return
+        self.progress_bar['value'] = 100 * event["done"] / event["total"]
+        text = f"{label}: {event['done'] * 100 // event['total']}%"
+        item = event["item"]
+        if item:
+            where = format_location(item)
+            if where:
+                text += f" ({where})"
+        if event["eta"] is not None:
+            text += f" - about {event['eta']:.0f}s left"
+        self.progress_label.config(text=text)
+    
+    def _save_profile(self, profiler, output_file):
+        """Write the profile files of a conversion; returns a note for the dialog."""
+        if profiler is None:
+            return ""
+        try:
+            pstats_file, stacks_file = profiler.save(output_file)
+        except OSError as e:
+            return f"\n\nCould not write the profile: {e}"
+        return f"\n\nProfile written to:\n{pstats_file}\n{stacks_file}"
 
     def open_manual_pdf(self):
         """Open the PDF manual"""
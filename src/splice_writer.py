@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# splice_writer.py - Format-preserving output for converted compositions
+
+import mmap
+import re
+
+# Everything that can start with "<" in a document. Only the last alternative
+# (an element start tag) is counted; comments, CDATA sections, processing
+# instructions and declarations are skipped so a "<" inside them is ignored.
+_MARKUP_RE = re.compile(
+    rb'<!--.*?-->|<!\[CDATA\[.*?\]\]>|<[?!][^>]*>|<(?=[^/])', re.S)
+_TAG_NAME_RE = re.compile(rb'<[^\s/>]+')
+_TAG_CLOSE_RE = re.compile(rb'\s*/?>')
+_ATTRIBUTE_RE = re.compile(
+    rb'\s+([^\s=/>]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+_DECLARED_ENCODING_RE = re.compile(
+    rb'(?:\xef\xbb\xbf)?<\?xml[^>]*?encoding\s*=\s*["\']([A-Za-z0-9._-]+)["\']')
+
+SPLICE_ENCODINGS = ("utf-8", "utf8", "us-ascii", "ascii")
+
+
+def _escape_attribute(value, quote):
+    value = value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    value = value.replace("\n", "&#10;").replace("\r", "&#13;").replace("\t", "&#09;")
+    if quote == b'"':
+        value = value.replace('"', "&quot;")
+    else:
+        value = value.replace("'", "&apos;")
+    return value.encode("utf-8")
+
+
+def can_splice(input_file):
+    """True when input_file is UTF-8 (or ASCII) and can be patched in place."""
+    with open(input_file, "rb") as f:
+        head = f.read(256)
+    if head.startswith((b"\xff\xfe", b"\xfe\xff")):
+        return False
+    match = _DECLARED_ENCODING_RE.match(head)
+    if match is None:
+        return True
+    return match.group(1).decode("ascii").lower() in SPLICE_ENCODINGS
+
+
+def _start_tag_offsets(data, indexes):
+    """Map document-order element indexes to the byte offset of their '<'."""
+    offsets = {}
+    wanted = sorted(indexes)
+    if not wanted:
+        return offsets
+    position = 0
+    count = -1
+    for match in _MARKUP_RE.finditer(data):
+        if match.end() - match.start() != 1:
+            continue
+        count += 1
+        if count == wanted[position]:
+            offsets[count] = match.start()
+            position += 1
+            if position == len(wanted):
+                break
+    return offsets
+
+
+def _tag_edits(data, offset, changes):
+    """Build (start, end, replacement) edits for the changed attributes of one tag."""
+    tag_name = _TAG_NAME_RE.match(data, offset)
+    if tag_name is None:
+        raise ValueError(f"Could not parse start tag at byte {offset}")
+
+    # Walk the attributes only as far as needed; the attribute list is read
+    # to its end only when an attribute has to be added
+    remaining = {name for name, _value in changes}
+    spans = {}
+    position = tag_name.end()
+    while remaining:
+        attribute = _ATTRIBUTE_RE.match(data, position)
+        if attribute is None:
+            if _TAG_CLOSE_RE.match(data, position) is None:
+                raise ValueError(f"Could not parse start tag at byte {offset}")
+            break
+        name = attribute.group(1).decode("utf-8")
+        group = 2 if attribute.group(2) is not None else 3
+        quote = data[attribute.start(group) - 1:attribute.start(group)]
+        spans[name] = (attribute, group, quote)
+        remaining.discard(name)
+        position = attribute.end()
+
+    edits = []
+    for name, value in changes:
+        span = spans.get(name)
+        if span is None:
+            if value is not None:
+                text = b' ' + name.encode("utf-8") + b'="' + _escape_attribute(value, b'"') + b'"'
+                edits.append((position, position, text))
+            continue
+        attribute, group, quote = span
+        if value is None:
+            edits.append((attribute.start(), attribute.end(), b""))
+        else:
+            edits.append((attribute.start(group), attribute.end(group),
+                          _escape_attribute(value, quote)))
+    return edits
+
+
+def write_spliced(input_file, output_file, root, journal):
+    """
+    Write output_file as a copy of input_file with only the attributes in
+    journal (a ChangeJournal) replaced.
+
+    Tabs, quoting, entity escaping and the XML declaration of the original
+    stay as they were. The input is memory-mapped, the start tags of changed
+    elements are located by counting start tags in document order, and the
+    result is written with a single write call. Returns the number of
+    attributes spliced.
+    """
+    changed = {}
+    for elem, name, _original, current in journal.changes():
+        changed.setdefault(elem, []).append((name, current))
+
+    indexes = {}
+    if changed:
+        for index, elem in enumerate(root.iter()):
+            if elem in changed:
+                indexes[index] = elem
+                if len(indexes) == len(changed):
+                    break
+
+    with open(input_file, "rb") as f:
+        if f.seek(0, 2) == 0:
+            data = b""
+        else:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            offsets = _start_tag_offsets(data, indexes)
+            edits = []
+            for index, elem in indexes.items():
+                edits.extend(_tag_edits(data, offsets[index], changed[elem]))
+            edits.sort(key=lambda edit: edit[0])
+
+            view = memoryview(data)
+            pieces = []
+            position = 0
+            for start, end, replacement in edits:
+                pieces.append(view[position:start])
+                pieces.append(replacement)
+                position = end
+            pieces.append(view[position:])
+            output = b"".join(pieces)
+            pieces.clear()
+            view.release()
+        finally:
+            if not isinstance(data, bytes):
+                data.close()
+
+    with open(output_file, "wb") as out:
+        out.write(output)
+    return sum(len(names) for names in changed.values())
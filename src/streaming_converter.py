@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# streaming_converter.py - Bounded-memory conversion for very large compositions
+
+import os
+import xml.etree.ElementTree as ET
+
+from conversion_progress import ProgressReader
+
+XML_DECLARATION = "<?xml version='1.0' encoding='utf-8'?>\n"
+
+
+def _escape_text(text):
+    """Escape character data the same way ElementTree's serializer does."""
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+
+
+def _start_tag(elem):
+    """Serialize the start tag and leading text of elem, without its children."""
+    shell = ET.Element(elem.tag, elem.attrib)
+    shell.text = elem.text
+    markup = ET.tostring(shell, encoding="unicode", short_empty_elements=False)
+    return markup[:-len(f"</{elem.tag}>")]
+
+
+class CompositionStream:
+    """
+    Convert a composition while it is being parsed.
+
+    The document is split into sections: every direct child of the
+    Composition, except Decks, which are split further into their Clips and
+    Columns. Each section is converted as soon as its end tag has been read,
+    written out and removed from the tree, so only the section being parsed
+    is ever held in memory.
+
+    Sections are held back until the CompositionInfo has been read, because
+    clip rules fall back to the original composition size and the root
+    element's name comes from it. Resolume writes CompositionInfo near the top
+    of the file, so in practice nothing waits.
+
+    Writing a section is deferred until the next parser event: ElementTree
+    only assigns an element's tail (the whitespace after its end tag) once it
+    has seen what follows.
+    """
+
+    def __init__(self, converter, out):
+        self.converter = converter
+        self.out = out
+        self.root = None
+        self._opened = set()
+        self._comp_info_seen = False
+        self._waiting = []
+        self._ready = []
+
+    def run(self, input_file):
+        self.out.write(XML_DECLARATION)
+        stack = []
+        for event, elem in ET.iterparse(input_file, events=("start", "end")):
+            self._flush()
+            if event == "start":
+                if self.root is None:
+                    self.root = elem
+                stack.append(elem)
+                continue
+
+            stack.pop()
+            if elem.tag == "CompositionInfo":
+                self._comp_info_seen = True
+
+            if elem is self.root:
+                self._waiting.append(("close", elem, ()))
+                self._release()
+            elif len(stack) == 1 and elem.tag == "Deck":
+                self._waiting.append(("close", elem, (self.root,)))
+                self._release()
+            elif len(stack) == 1 or (len(stack) == 2 and stack[-1].tag == "Deck"):
+                self._waiting.append(("section", elem, tuple(stack)))
+                self._release()
+
+        # The root has no following event; flush it with whatever tail it has
+        self._comp_info_seen = True
+        self._release()
+        self._flush()
+
+    def _release(self):
+        """Convert waiting sections once the composition info is known."""
+        if not self._comp_info_seen or not self._waiting:
+            return
+        sections = [(elem, ancestors) for kind, elem, ancestors in self._waiting
+                    if kind == "section"]
+        if sections:
+            self.converter.convert_subtrees(self.root, sections)
+        self._ready.extend(self._waiting)
+        self._waiting = []
+
+    def _open(self, ancestors):
+        for elem in ancestors:
+            if elem not in self._opened:
+                self.out.write(_start_tag(elem))
+                self._opened.add(elem)
+
+    def _flush(self):
+        write = self.out.write
+        for kind, elem, ancestors in self._ready:
+            if kind == "section":
+                self._open(ancestors)
+                write(ET.tostring(elem, encoding="unicode"))
+                ancestors[-1].remove(elem)
+            elif elem in self._opened:
+                write(f"</{elem.tag}>")
+                if elem.tail:
+                    write(_escape_text(elem.tail))
+                self._opened.discard(elem)
+                if ancestors:
+                    ancestors[-1].remove(elem)
+            else:
+                # Nothing inside this element was streamed; write it whole
+                self._open(ancestors)
+                write(ET.tostring(elem, encoding="unicode"))
+                if ancestors:
+                    ancestors[-1].remove(elem)
+        self._ready.clear()
+
+
+def stream_composition(input_file, output_file, converter):
+    """
+    Convert input_file into output_file with converter (a
+    CompositionConverter) without loading the whole document. Returns the
+    converter's stats counters. A partially written output file is removed if
+    the conversion fails.
+    """
+    try:
+        # Opened the way ElementTree.write opens files, so both paths
+        # produce the same bytes on every platform
+        with open(output_file, "w", encoding="utf-8",
+                  errors="xmlcharrefreplace") as out:
+            if converter.progress is None and converter.cancel is None:
+                CompositionStream(converter, out).run(input_file)
+            else:
+                with open(input_file, "rb") as f:
+                    CompositionStream(converter, out).run(
+                        ProgressReader(f, converter.progress, cancel=converter.cancel))
+    except BaseException:
+        try:
+            os.remove(output_file)
+        except OSError:
+            pass
+        raise
+    return converter.stats
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# xml_backend.py - XML parsing and writing with lxml when available, ElementTree otherwise
+
+import io
+import os
+import xml.etree.ElementTree as ET
+
+from conversion_log import get_logger
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+logger = get_logger("xml_backend")
+
+XML_DECLARATION = "<?xml version='1.0' encoding='utf-8'?>\n"
+
+# Override the automatic choice, e.g. RCC_XML_BACKEND=etree
+BACKEND_ENV_VAR = "RCC_XML_BACKEND"
+
+
+def available_backends():
+    """Backends that can be used in this installation, fastest first."""
+    return ("lxml", "etree") if lxml_etree is not None else ("etree",)
+
+
+def resolve_backend(backend=None):
+    """
+    Pick the backend to use. None means automatic: lxml when installed,
+    otherwise ElementTree. Asking for lxml when it is not installed falls
+    back to ElementTree.
+    """
+    backend = backend or os.environ.get(BACKEND_ENV_VAR) or available_backends()[0]
+    if backend not in ("lxml", "etree"):
+        raise ValueError(f"Unknown XML backend: {backend}")
+    if backend == "lxml" and lxml_etree is None:
+        logger.warning("lxml is not installed; using ElementTree instead.")
+        return "etree"
+    return backend
+
+
+def parse_xml(source, backend=None):
+    """Parse source (a path or file object) into an ElementTree-compatible tree."""
+    if resolve_backend(backend) == "etree":
+        return ET.parse(source)
+    # Drop comments and processing instructions like ElementTree does, so the
+    # element children and the written output match across backends
+    parser = lxml_etree.XMLParser(remove_comments=True, remove_pis=True, huge_tree=True)
+    return lxml_etree.parse(source, parser)
+
+
+def is_lxml_tree(tree):
+    return lxml_etree is not None and isinstance(tree, lxml_etree._ElementTree)
+
+
+class _CheckedFile(io.RawIOBase):
+    """Binary file that calls check() before every chunk it writes."""
+
+    def __init__(self, f, check):
+        self._file = f
+        self._check = check
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._check()
+        return self._file.write(data)
+
+
+def _write_checked(tree, output_file, cancel):
+    """
+    write_xml with cancel.check() between the buffered chunks of output. A
+    partially written file is removed when the check (or anything else) fails.
+    """
+    try:
+        with open(output_file, "wb") as raw:
+            # Encoded and newline-translated like open(output_file, "w", ...)
+            out = io.TextIOWrapper(io.BufferedWriter(_CheckedFile(raw, cancel.check)),
+                                   encoding="utf-8", errors="xmlcharrefreplace")
+            try:
+                out.write(XML_DECLARATION)
+                if is_lxml_tree(tree):
+                    out.write(_lxml_markup(tree))
+                else:
+                    tree.write(out, encoding="unicode")
+            finally:
+                out.close()
+    except BaseException:
+        try:
+            os.remove(output_file)
+        except OSError:
+            pass
+        raise
+
+
+def _lxml_markup(tree):
+    """An lxml tree serialized the way ElementTree serializes it."""
+    markup = lxml_etree.tostring(tree.getroot(), encoding="utf-8")
+    # lxml writes "<a/>" and "&#9;" where ElementTree writes "<a />" and
+    # "&#09;". ">" is always escaped in text and attributes, so "/>" only
+    # occurs at the end of empty elements.
+    markup = markup.replace(b"/>", b" />").replace(b"&#9;", b"&#09;")
+    return markup.decode("utf-8")
+
+
+def write_xml(tree, output_file, cancel=None):
+    """
+    Write tree to output_file exactly the way ElementTree.write(encoding="utf-8",
+    xml_declaration=True) would, whichever backend parsed it. With cancel (a
+    CancellationToken) the write stops, and the file is removed, once the
+    token is cancelled.
+    """
+    if cancel is not None:
+        _write_checked(tree, output_file, cancel)
+        return
+    if not is_lxml_tree(tree):
+        tree.write(output_file, encoding="utf-8", xml_declaration=True)
+        return
+
+    # Opened the way ElementTree.write opens files, including newline handling
+    with open(output_file, "w", encoding="utf-8", errors="xmlcharrefreplace") as out:
+        out.write(XML_DECLARATION)
+        out.write(_lxml_markup(tree))